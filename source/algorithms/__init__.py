@@ -3,5 +3,7 @@ This package provides various algorithms for landmark removal in SLAM.
 """
 
 from .landmark_removal import LandmarkRemoval
+from .lazy_greedy import lazy_greedy_removal
+from .scheduler import RemovalScheduler
 
-__all__ = ['LandmarkRemoval']
+__all__ = ['LandmarkRemoval', 'lazy_greedy_removal', 'RemovalScheduler']
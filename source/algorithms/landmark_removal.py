@@ -3,32 +3,44 @@ This module defines the LandmarkRemoval class,
  which contains various algorithms for removing landmarks.
 """
 
+import time
+
 import numpy as np
 
 from source.info_theoretic import (
     compute_degree,
     compute_uncertainty,
     k_cover_algorithm,
-    compute_mutual_information,
-    compute_reprojection_error
+    compute_reprojection_error,
+    make_information_scorer
 )
+from source.algorithms.lazy_greedy import lazy_greedy_removal
 from source.landmarks.landmark import Landmark
+from source.utils.profiling import profiled
 
 class LandmarkRemoval:
     """
     LandmarkRemoval class contains various algorithms for removing landmarks.
     """
 
-    def __init__(self, landmarks, poses):
+    def __init__(self, landmarks, poses, graph=None, values=None, observations=None):
         """
         Initialize the LandmarkRemoval with landmarks and poses.
 
         Args:
             landmarks (list): List of Landmark objects.
             poses (list): List of poses.
+            graph (NonlinearFactorGraph): SLAM factor graph, required by the information-based removal.
+            values (Values): Linearization point of the graph.
+            observations (ObservationIncidence): Pose-landmark incidence, required by the
+             degree and coverage based removals.
         """
         self._landmarks = {lm.identifier: lm for lm in landmarks}
         self._poses = poses
+        self.graph = graph
+        self.values = values
+        self.observations = observations
+        self.removal_gains = []
 
     @property
     def landmarks(self):
@@ -54,15 +66,17 @@ class LandmarkRemoval:
             raise ValueError("Poses must be a list.")
         self._poses = new_poses
 
+    @profiled('removal.least_degree_removal')
     def least_degree_removal(self):
         """
         Remove landmarks based on the least degree.
         """
-        degrees = compute_degree(self.landmarks, self.poses)
+        degrees = compute_degree(self.landmarks, self.observations)
         sorted_landmarks = sorted(self.landmarks, key=lambda lm: degrees[lm.identifier])
         self._landmarks = {lm.identifier: lm for lm in sorted_landmarks}
         return self.landmarks
 
+    @profiled('removal.max_uncertainty_removal')
     def max_uncertainty_removal(self):
         """
         Remove landmarks based on maximum uncertainty.
@@ -74,6 +88,7 @@ class LandmarkRemoval:
         self._landmarks = {lm.identifier: lm for lm in sorted_landmarks}
         return self.landmarks
 
+    @profiled('removal.k_cover_removal')
     def k_cover_removal(self, k=1):
         """
         Remove landmarks based on the K-Cover algorithm.
@@ -81,26 +96,58 @@ class LandmarkRemoval:
         Args:
             k (int): Number of covers.
         """
-        k_cover_landmarks = k_cover_algorithm(self.landmarks, self.poses, k)
+        k_cover_landmarks = k_cover_algorithm(self.landmarks, self.observations, k)
         sorted_landmarks = list(reversed(k_cover_landmarks))
         self._landmarks = {lm.identifier: lm for lm in sorted_landmarks}
         return self.landmarks
 
-    def least_informative_removal(self):
+    @profiled('removal.least_informative_removal')
+    def least_informative_removal(self, max_removals=None, max_information_loss=None, time_budget=None,
+                                  scoring='exact', scoring_options=None):
         """
-        Remove landmarks based on the least informative criterion.
+        Remove landmarks based on the least informative criterion, using the lazy-greedy engine.
+
+        The landmarks selected by the greedy search come first, in removal order, and the gain of
+        each of them, at the time it was removed, is stored in removal_gains. The landmarks it did
+        not select follow in their previous order, so the stopping rules only bound how far the
+        ranking is refined.
+
+        Args:
+            max_removals (int): Maximum number of landmarks to remove.
+            max_information_loss (float): Maximum total information, in nats, that may be removed.
+            time_budget (float): Maximum running time in seconds. With stochastic scoring, drawing
+             the samples takes at most half of it unless scoring_options sets its own time_budget.
+            scoring (str): 'exact', or 'stochastic' to rank maps too large for dense marginals.
+            scoring_options (dict): Keyword arguments of the stochastic scorer, such as num_samples.
+
+        Returns:
+            list: All landmarks in removal order.
         """
-        while len(self.landmarks) > 0:
-            infos = compute_mutual_information(self.landmarks, self.poses)
-            least_informative_landmark = min(infos, key=infos.get)
-            del self._landmarks[least_informative_landmark]
+        if self.graph is None or self.values is None:
+            raise ValueError("The factor graph and its values are required for information-based removal.")
+        start = time.perf_counter()
+        options = dict(scoring_options or {})
+        if scoring == 'stochastic' and time_budget is not None:
+            options.setdefault('time_budget', 0.5 * time_budget)
+        scorer = make_information_scorer(self.graph, self.values, scoring, **options)
+        if scoring == 'stochastic' and time_budget is not None:
+            time_budget = max(time_budget - (time.perf_counter() - start), 0.0)
+        scored = set(scorer.landmark_ids)
+        removals = lazy_greedy_removal(scorer, [lm_id for lm_id in self._landmarks if lm_id in scored],
+                                       max_removals=max_removals,
+                                       max_information_loss=max_information_loss,
+                                       time_budget=time_budget)
+        removed = [self._landmarks[lm_id] for lm_id, _ in removals]
+        self.removal_gains = [gain for _, gain in removals]
+        self._landmarks = {lm.identifier: lm for lm in removed + self.landmarks}
         return self.landmarks
 
+    @profiled('removal.least_reprojection_error_removal')
     def least_reprojection_error_removal(self):
         """
         Remove landmarks based on the least reprojection error.
         """
-        reprojection_errors = compute_reprojection_error(self.landmarks, self.poses)
+        reprojection_errors = compute_reprojection_error(self.landmarks, self.poses, self.observations)
         sorted_landmarks = sorted(self.landmarks,
                                   key=lambda lm: reprojection_errors[lm.identifier])
         self._landmarks = {lm.identifier: lm for lm in sorted_landmarks}
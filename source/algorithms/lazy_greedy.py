@@ -0,0 +1,70 @@
+"""
+This module provides the lazy-greedy (CELF) engine used for least informative landmark removal.
+"""
+
+# source/algorithms/lazy_greedy.py
+
+import heapq
+import time
+
+from source.utils.profiling import profiled
+
+
+@profiled('removal.lazy_greedy')
+def lazy_greedy_removal(scorer, landmark_ids=None, max_removals=None, max_information_loss=None,
+                        time_budget=None, lazy=True):
+    """
+    Greedily remove the landmark with the least information gain until a budget is reached.
+
+    The information of the poses is submodular in the set of landmarks, so the gain of a landmark
+    can only grow as other landmarks are removed. Stale gains are therefore lower bounds, and only
+    the top of a min-heap needs to be re-evaluated: once a freshly evaluated landmark is still on
+    top, no other landmark can have a lower gain.
+
+    Args:
+        scorer (InformationScorer): Scorer holding the landmarks to remove.
+        landmark_ids (iterable of int): Candidate landmarks, all landmarks of the scorer if None.
+        max_removals (int): Maximum number of landmarks to remove.
+        max_information_loss (float): Maximum total information gain, in nats, that may be removed.
+        time_budget (float): Maximum running time in seconds.
+        lazy (bool): Re-evaluate only the top candidate; if False, every remaining candidate
+         is re-evaluated after each removal (plain greedy).
+
+    Returns:
+        list of tuple: The removed landmark identifiers and their gains at removal, in removal order.
+    """
+    start_time = time.perf_counter()
+    gains = scorer.gains(landmark_ids)
+    heap = [(gain, lm_id) for lm_id, gain in gains.items()]
+    heapq.heapify(heap)
+    evaluated_at = {lm_id: 0 for lm_id in gains}
+
+    removals = []
+    total_loss = 0.0
+    while heap:
+        if max_removals is not None and len(removals) >= max_removals:
+            break
+        if time_budget is not None and time.perf_counter() - start_time > time_budget:
+            break
+
+        gain, lm_id = heap[0]
+        if evaluated_at[lm_id] < len(removals):
+            heapq.heapreplace(heap, (scorer.gain(lm_id), lm_id))
+            evaluated_at[lm_id] = len(removals)
+            continue
+
+        if max_information_loss is not None and total_loss + gain > max_information_loss:
+            break
+        heapq.heappop(heap)
+        scorer.remove(lm_id)
+        removals.append((lm_id, gain))
+        total_loss += gain
+
+        if not lazy and heap:
+            gains = scorer.gains([candidate for _, candidate in heap])
+            heap = [(gain, candidate) for candidate, gain in gains.items()]
+            heapq.heapify(heap)
+            for candidate in gains:
+                evaluated_at[candidate] = len(removals)
+
+    return removals
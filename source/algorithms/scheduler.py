@@ -0,0 +1,175 @@
+"""
+This module provides the RemovalScheduler class, which runs landmark removal in the background of a SLAM loop.
+"""
+
+# source/algorithms/scheduler.py
+
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import gtsam
+
+from source.algorithms.landmark_removal import LandmarkRemoval
+from source.config import REMOVAL_MODES
+
+# A copy of the SLAM state taken at a step boundary, safe to use from another thread or process;
+# the parts a strategy does not read are None
+Snapshot = namedtuple('Snapshot', ['step', 'landmarks', 'poses', 'graph', 'values', 'observations', 'active_ids'])
+
+# The parts of the SLAM state each removal strategy reads, besides the landmarks
+_STRATEGY_INPUTS = {
+    'least_degree_removal': ('observations',),
+    'max_uncertainty_removal': (),
+    'k_cover_removal': ('observations',),
+    'least_informative_removal': ('graph', 'values'),
+    'least_reprojection_error_removal': ('poses', 'observations'),
+}
+
+# One completed removal: when it was scheduled and applied, what it removed and how long it took
+RemovalRecord = namedtuple('RemovalRecord', ['scheduled_step', 'applied_step', 'removed_ids', 'seconds'])
+
+
+def compute_removals(snapshot, strategy, num_removals, strategy_options=None):
+    """
+    Select landmarks to remove from a snapshot with a LandmarkRemoval strategy.
+
+    Args:
+        snapshot (Snapshot): The SLAM state.
+        strategy (str): One of LandmarkRemoval.get_algorithm_names().
+        num_removals (int): Number of landmarks to select.
+        strategy_options (dict): Keyword arguments of the strategy.
+
+    Returns:
+        tuple: The identifiers of the selected landmarks and the computation time in seconds.
+    """
+    start = time.perf_counter()
+    landmarks = [snapshot.landmarks[lm_id] for lm_id in snapshot.active_ids if lm_id in snapshot.landmarks]
+    remover = LandmarkRemoval(landmarks, snapshot.poses, snapshot.graph, snapshot.values, snapshot.observations)
+    options = dict(strategy_options or {})
+    if strategy == 'least_informative_removal':
+        # The greedy search only needs to refine the ranking up to the removals
+        options.setdefault('max_removals', num_removals)
+    ranked = getattr(remover, strategy)(**options)
+    removed_ids = [lm.identifier for lm in ranked[:num_removals]]
+    return removed_ids, time.perf_counter() - start
+
+
+class RemovalScheduler:
+    """
+    RemovalScheduler keeps the number of active landmarks of a SLAM system within a budget.
+
+    Every interval steps, a snapshot of the SLAM state is handed to a worker that ranks the
+    active landmarks with the configured strategy, while SLAM keeps processing steps. The
+    selected landmarks are removed at the first step boundary after the worker finishes, so
+    the solver is never modified in the middle of a step. Landmarks are active while they have
+    observation factors in the solver.
+
+    With the 'thread' executor, the worker shares the GIL with the SLAM loop during gtsam
+    calls; the 'process' executor pickles the snapshot and runs fully in parallel.
+    """
+
+    def __init__(self, slam, strategy='least_degree_removal', budget=100, interval=None, executor='thread',
+                 strategy_options=None, removal_mode='delete'):
+        """
+        Attach a scheduler to a SLAM system.
+
+        Args:
+            slam (SLAM): The SLAM system.
+            strategy (str): One of LandmarkRemoval.get_algorithm_names().
+            budget (int): Maximum number of active landmarks.
+            interval (int): Number of steps between removals, slam.minimization_interval if None.
+            executor (str): 'thread' or 'process'.
+            strategy_options (dict): Keyword arguments of the strategy.
+            removal_mode (str): How SLAM.remove_landmarks takes the landmarks out, 'delete' or 'sparsify'.
+        """
+        if strategy not in LandmarkRemoval.get_algorithm_names():
+            raise ValueError(f"Unknown removal strategy '{strategy}'.")
+        if executor not in ('thread', 'process'):
+            raise ValueError("Executor must be 'thread' or 'process'.")
+        if removal_mode not in REMOVAL_MODES:
+            raise ValueError(f"Unknown removal mode '{removal_mode}'.")
+        self.slam = slam
+        self.strategy = strategy
+        self.budget = budget
+        self.interval = interval or slam.minimization_interval
+        self.strategy_options = strategy_options
+        self.executor = executor
+        self.removal_mode = removal_mode
+        self.history = []
+        self.reports = []
+        self._executor = ThreadPoolExecutor(max_workers=1) if executor == 'thread' else ProcessPoolExecutor(1)
+        self._pending = None
+        slam.scheduler = self
+
+    @property
+    def busy(self):
+        """Check whether a removal is being computed."""
+        return self._pending is not None
+
+    def snapshot(self):
+        """
+        Copy the parts of the SLAM state read by the removal strategy.
+
+        Only the inputs of the strategy are copied. The poses of a sliding-window backend are
+        frozen without reading their archive, which the worker reads when it needs to. The
+        factor graph and its values, read by the information-based strategy only, are copied
+        here: the solver is modified by the next step, and gtsam objects cannot be copied from
+        another thread consistently.
+
+        Returns:
+            Snapshot: The copy.
+        """
+        slam = self.slam
+        inputs = _STRATEGY_INPUTS[self.strategy]
+        poses = None
+        if 'poses' in inputs:
+            poses = slam.poses.frozen() if hasattr(slam.poses, 'frozen') else list(slam.poses)
+        return Snapshot(
+            step=slam.step_count,
+            landmarks=slam.landmarks.copy(),
+            poses=poses,
+            graph=gtsam.NonlinearFactorGraph(slam.graph) if 'graph' in inputs else None,
+            values=gtsam.Values(slam.initial_estimate) if 'values' in inputs else None,
+            observations=slam.observations.copy() if 'observations' in inputs else None,
+            active_ids=slam.active_landmark_ids(),
+        )
+
+    def on_step_start(self):
+        """Apply a finished removal. Called by SLAM at the start of every step."""
+        if self._pending is None or not self._pending[1].done():
+            return
+        scheduled_step, future = self._pending
+        self._pending = None
+        try:
+            removed_ids, seconds = future.result()
+        except Exception as e:
+            print(f"Error computing landmark removal: {e}")
+            return
+        self.reports.extend(self.slam.remove_landmarks(removed_ids, self.removal_mode))
+        self.history.append(RemovalRecord(scheduled_step, self.slam.step_count, removed_ids, seconds))
+
+    def on_step_end(self):
+        """Start a removal if one is due. Called by SLAM at the end of every step."""
+        if self._pending is not None or self.slam.step_count % self.interval:
+            return
+        excess = len(self.slam.active_landmark_ids()) - self.budget
+        if excess <= 0:
+            return
+        future = self._executor.submit(compute_removals, self.snapshot(), self.strategy, excess,
+                                       self.strategy_options)
+        self._pending = (self.slam.step_count, future)
+
+    def wait(self):
+        """Block until the pending removal, if any, is computed and apply it."""
+        if self._pending is not None:
+            wait([self._pending[1]])
+            self.on_step_start()
+
+    def close(self):
+        """Apply the pending removal and stop the worker."""
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown()
+            self.slam.scheduler = None
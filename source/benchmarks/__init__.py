@@ -0,0 +1,5 @@
+"""
+This package provides the benchmark suite of the SLAM system and the landmark removal algorithms.
+
+The suite lives in source.benchmarks.suite and is run with python -m source.benchmarks.suite.
+"""
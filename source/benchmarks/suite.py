@@ -0,0 +1,355 @@
+"""
+This module provides the benchmark suite for SLAM step latency, information scoring, landmark removal
+and CLI startup time.
+
+Run it with:
+    python -m source.benchmarks.suite --suite quick --output bench.json [--baseline baseline.json]
+"""
+
+# source/benchmarks/suite.py
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+
+# A benchmark: the kind of work measured and the scenario size
+BenchmarkCase = namedtuple('BenchmarkCase', ['kind', 'num_steps', 'num_landmarks', 'observations_per_step'])
+
+SUITES = {
+    'quick': [
+        BenchmarkCase('startup', 0, 0, 0),
+        BenchmarkCase('slam_step', 100, 50, 10),
+        BenchmarkCase('slam_step', 200, 100, 20),
+        BenchmarkCase('information', 50, 50, 10),
+        BenchmarkCase('removal', 50, 50, 10),
+        BenchmarkCase('multi_agent', 50, 50, 10),
+    ],
+    'full': [
+        BenchmarkCase('startup', 0, 0, 0),
+        BenchmarkCase('slam_step', 1000, 100, 10),
+        BenchmarkCase('slam_step', 1000, 500, 50),
+        BenchmarkCase('slam_step', 5000, 1000, 20),
+        BenchmarkCase('information', 100, 200, 20),
+        BenchmarkCase('information', 200, 1000, 50),
+        BenchmarkCase('removal', 100, 200, 20),
+        BenchmarkCase('removal', 200, 500, 20),
+        BenchmarkCase('multi_agent', 500, 200, 20),
+    ],
+}
+
+# Whether a larger value of a metric is better; metrics not listed are not compared
+HIGHER_IS_BETTER = {
+    'step_p50_ms': False,
+    'step_p95_ms': False,
+    'log_det_ms': False,
+    'gains_per_second': True,
+    'stochastic_log_det_ms': False,
+    'stochastic_gains_per_second': True,
+    'stochastic_rank_correlation': True,
+    'landmarks_per_second': True,
+    'peak_traced_mb': False,
+    'startup_ms': False,
+    'startup_heavy_modules': False,
+    'agent_steps_per_second': True,
+    'parallel_efficiency': True,
+}
+
+# Number of agents of the multi-agent case, compared with a single agent
+_NUM_AGENTS = 4
+
+# Number of probes and samples of the stochastic information measures
+_STOCHASTIC_SAMPLES = 32
+
+# Number of timed CLI startups, of which the median is reported
+_STARTUP_REPEATS = 5
+
+# Imports the CLI and builds its parser, then prints the heavy modules that were loaded
+_STARTUP_CHECK = ("import sys, source.cli as cli; cli.build_parser(); "
+                  "print(','.join(name for name in cli.HEAVY_MODULES if name in sys.modules))")
+
+
+def case_name(case):
+    """Get a stable name of a benchmark case."""
+    return f"{case.kind}-n{case.num_steps}-l{case.num_landmarks}-o{case.observations_per_step}"
+
+
+def run_slam_steps(case, seed=0):
+    """
+    Run SLAM on a scenario where each step observes a random subset of the landmarks.
+
+    Args:
+        case (BenchmarkCase): The scenario size.
+        seed (int): Seed of the scenario and of the observed subsets.
+
+    Returns:
+        tuple: The SLAM system and the latency of every step in seconds.
+    """
+    from source.scenarios.generator import ScenarioGenerator
+    from source.slam.slam import SLAM
+
+    scenario = ScenarioGenerator(case.num_landmarks, case.num_steps, seed=seed)
+    slam_system = SLAM(scenario.initial_pose, scenario.landmarks())
+    rng = np.random.default_rng(seed)
+    latencies = np.empty(case.num_steps)
+    for step, (control_input, measurements) in enumerate(scenario):
+        chosen = rng.choice(len(measurements), min(case.observations_per_step, len(measurements)), replace=False)
+        measurements = measurements[chosen]
+        start = time.perf_counter()
+        slam_system.perform_slam_step(control_input, measurements)
+        latencies[step] = time.perf_counter() - start
+    return slam_system, latencies
+
+
+def _measure_slam_step(case):
+    _, latencies = run_slam_steps(case)
+    return {
+        'step_p50_ms': float(np.percentile(latencies, 50) * 1e3),
+        'step_p95_ms': float(np.percentile(latencies, 95) * 1e3),
+        'total_s': float(latencies.sum()),
+    }
+
+
+def _measure_information(case):
+    from source.info_theoretic.utils import InformationScorer, StochasticInformationScorer, log_det
+    from source.slam.utils import is_pose_key
+
+    slam_system, _ = run_slam_steps(case)
+    graph, values = slam_system.graph, slam_system.initial_estimate
+    pose_keys = [key for key in values.keys() if is_pose_key(key)]
+
+    start = time.perf_counter()
+    log_det(pose_keys, graph, values)
+    log_det_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scorer = InformationScorer(graph, values)
+    gains = scorer.gains(scorer.landmark_ids)
+    gains_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    log_det(pose_keys, graph, values, method='stochastic', num_probes=_STOCHASTIC_SAMPLES, seed=0)
+    stochastic_log_det_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stochastic_scorer = StochasticInformationScorer(graph, values, num_samples=_STOCHASTIC_SAMPLES, seed=0)
+    estimated = stochastic_scorer.gains(stochastic_scorer.landmark_ids)
+    stochastic_gains_seconds = time.perf_counter() - start
+
+    # Spearman correlation of the estimated gains with the exact ones
+    ids = sorted(gains)
+    ranks = [np.argsort(np.argsort([source[lm_id] for lm_id in ids])) for source in (gains, estimated)]
+    return {
+        'log_det_ms': log_det_seconds * 1e3,
+        'gains_per_second': len(gains) / gains_seconds,
+        'stochastic_log_det_ms': stochastic_log_det_seconds * 1e3,
+        'stochastic_gains_per_second': len(estimated) / stochastic_gains_seconds,
+        'stochastic_rank_correlation': float(np.corrcoef(*ranks)[0, 1]) if len(ids) > 1 else 1.0,
+    }
+
+
+def _measure_removal(case):
+    from source.algorithms.landmark_removal import LandmarkRemoval
+
+    slam_system, _ = run_slam_steps(case)
+    metrics = {}
+    for algorithm in LandmarkRemoval.get_algorithm_names():
+        remover = LandmarkRemoval(slam_system.landmarks.values(), slam_system.poses, slam_system.graph,
+                                  slam_system.initial_estimate, slam_system.observations)
+        start = time.perf_counter()
+        ranked = getattr(remover, algorithm)()
+        seconds = time.perf_counter() - start
+        metrics[f'{algorithm}.landmarks_per_second'] = len(ranked) / seconds
+    return metrics
+
+
+def _measure_startup(case):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    durations = []
+    for _ in range(_STARTUP_REPEATS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'source.cli', '--help'], cwd=root, env=environment,
+                       stdout=subprocess.DEVNULL, check=True)
+        durations.append(time.perf_counter() - start)
+    loaded = subprocess.run([sys.executable, '-c', _STARTUP_CHECK], cwd=root, env=environment,
+                            capture_output=True, text=True, check=True).stdout.strip()
+    if loaded:
+        print(f"Heavy modules imported at CLI startup: {loaded}")
+    return {
+        'startup_ms': float(np.median(durations) * 1e3),
+        'startup_heavy_modules': len(loaded.split(',')) if loaded else 0,
+    }
+
+
+def _multi_agent_throughput(case, num_agents, seed=0):
+    from source.scenarios.generator import multi_agent_scenarios
+    from source.slam.multi_agent import MultiAgentSLAM
+
+    scenarios = multi_agent_scenarios(num_agents, case.num_landmarks, case.num_steps, seed=seed)
+    rng = np.random.default_rng(seed)
+    streams = [iter(scenario) for scenario in scenarios]
+    with MultiAgentSLAM([scenario.initial_pose for scenario in scenarios], scenarios[0].landmarks(),
+                        merge_interval=max(case.num_steps // 5, 1)) as system:
+        start = time.perf_counter()
+        for _ in range(case.num_steps):
+            control_inputs, measurements = [], []
+            for control_input, observed in (next(stream) for stream in streams):
+                chosen = rng.choice(len(observed), min(case.observations_per_step, len(observed)), replace=False)
+                control_inputs.append(control_input)
+                measurements.append(observed[chosen])
+            system.step(control_inputs, measurements)
+        seconds = time.perf_counter() - start
+    return num_agents * case.num_steps / seconds
+
+
+def _measure_multi_agent(case):
+    single = _multi_agent_throughput(case, 1)
+    several = _multi_agent_throughput(case, _NUM_AGENTS)
+    return {
+        'agent_steps_per_second': several,
+        'parallel_efficiency': several / (_NUM_AGENTS * single),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+_MEASURES = {
+    'startup': _measure_startup,
+    'slam_step': _measure_slam_step,
+    'information': _measure_information,
+    'removal': _measure_removal,
+    'multi_agent': _measure_multi_agent,
+}
+
+
+def run_case(case, memory=True):
+    """
+    Run one benchmark case.
+
+    Timings come from an untraced run. With memory, the case is run a second time under
+    tracemalloc to record the peak of the memory allocated through Python, including NumPy arrays.
+
+    Args:
+        case (BenchmarkCase): The case to run.
+        memory (bool): Whether to measure the peak traced memory.
+
+    Returns:
+        dict: The metrics of the case.
+    """
+    metrics = _MEASURES[case.kind](case)
+    # The startup and multi-agent cases run in subprocesses, whose memory is not traced here
+    if memory and case.kind not in ('startup', 'multi_agent'):
+        tracemalloc.start()
+        try:
+            _MEASURES[case.kind](case)
+            metrics['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    metrics['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+    return metrics
+
+
+def run_suite(cases, memory=True):
+    """
+    Run benchmark cases and collect their results with the environment they ran in.
+
+    Args:
+        cases (iterable of BenchmarkCase): The cases to run.
+        memory (bool): Whether to measure the peak traced memory.
+
+    Returns:
+        dict: The machine-readable results, with 'metadata' and one entry per case in 'results'.
+    """
+    import gtsam
+
+    results = {}
+    for case in cases:
+        name = case_name(case)
+        print(f"Running {name}...")
+        results[name] = {'case': case._asdict(), 'metrics': run_case(case, memory)}
+    return {
+        'metadata': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'gtsam': getattr(gtsam, '__version__', 'unknown'),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=0.2):
+    """
+    Find the metrics that regressed against a baseline.
+
+    Args:
+        current (dict): Results of run_suite.
+        baseline (dict): Saved results of an earlier run.
+        tolerance (float): Relative change allowed before a metric counts as a regression.
+
+    Returns:
+        list of str: One description per regression.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        baseline_metrics = baseline['results'][name]['metrics']
+        for metric, value in result['metrics'].items():
+            higher_is_better = HIGHER_IS_BETTER.get(metric.rsplit('.', 1)[-1])
+            reference = baseline_metrics.get(metric)
+            if higher_is_better is None or reference is None:
+                continue
+            # A metric whose baseline is zero, such as a count of unwanted imports, regresses on any increase
+            worse = reference - value if higher_is_better else value - reference
+            if worse > tolerance * abs(reference) and worse > 0:
+                change = f" ({(value - reference) / reference:+.0%})" if reference else ""
+                regressions.append(f"{name} {metric}: {reference:.4g} -> {value:.4g}{change}")
+    return regressions
+
+
+def print_results(results):
+    """Print the results as a table."""
+    for name, result in results['results'].items():
+        print(name)
+        for metric, value in result['metrics'].items():
+            print(f"    {metric:<50} {value:12.4f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SLAM steps, information scoring, landmark removal "
+                                                 "and CLI startup.")
+    parser.add_argument('--suite', choices=sorted(SUITES), default='quick')
+    parser.add_argument('--output', help="Path of the JSON results to write.")
+    parser.add_argument('--baseline', help="Path of saved JSON results to compare against.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression.")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the traced memory runs.")
+    args = parser.parse_args(argv)
+
+    results = run_suite(SUITES[args.suite], memory=not args.no_memory)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
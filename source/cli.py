@@ -0,0 +1,256 @@
+"""
+This module provides the command-line entry point of the project.
+
+    python -m source.cli run --landmarks 100 --steps 500 [--live | --record frames]
+    python -m source.cli run --landmarks 100 --steps 5000 --checkpoint-dir ckpt [--resume]
+    python -m source.cli sweep --algorithms least_degree_removal k_cover_removal --budgets 0 5 10 --seeds 0 1
+    python -m source.cli bench --suite quick [--baseline bench.json]
+    python -m source.cli plot results/sweep [--output figures]
+
+Only the standard library is imported at startup. Each subcommand imports the modules it needs
+when it runs, so that `--help` and light subcommands do not pay for gtsam or matplotlib.
+"""
+
+# source/cli.py
+
+import argparse
+import os
+import random
+import sys
+
+from source.config import BACKEND_NAMES, REMOVAL_MODES, SCORING_METHODS
+
+# Modules that must not be imported by the CLI before a subcommand runs
+HEAVY_MODULES = ('numpy', 'gtsam', 'matplotlib', 'seaborn', 'pandas')
+
+# Arguments of run that generate the scenario, saved with checkpoints so that a resumed run sees the same data
+SCENARIO_PARAMETERS = ('seed', 'landmarks', 'steps', 'trajectory', 'sensor_range', 'measurement_noise',
+                       'odometry_noise')
+
+
+def _scenario_parameters(args):
+    """Get the arguments that define the scenario of a run, as recorded with its checkpoints."""
+    return {name: getattr(args, name) for name in SCENARIO_PARAMETERS}
+
+
+def _resume_scenario(args):
+    """
+    Take the scenario of a resumed run from its checkpoints.
+
+    Arguments left at their defaults take the checkpointed values. Returns an error message if
+    the checkpoints do not record their scenario or the arguments given contradict it.
+    """
+    from source.slam.checkpoint import checkpoint_metadata
+
+    saved = checkpoint_metadata(args.checkpoint_dir).get('scenario')
+    if saved is None:
+        return f"the checkpoints in {args.checkpoint_dir} do not record their scenario."
+    defaults = build_parser().parse_args(['run'])
+    conflicts = [name for name, value in saved.items() if getattr(args, name) not in (value, getattr(defaults, name))]
+    if conflicts:
+        return ("--resume arguments differ from the checkpointed run: "
+                + ', '.join(f"{name} {getattr(args, name)} (checkpointed {saved[name]})" for name in conflicts))
+    for name, value in saved.items():
+        setattr(args, name, value)
+    return None
+
+
+def _scenario_options(args):
+    return {
+        'trajectory': args.trajectory,
+        'sensor_range': args.sensor_range,
+        'measurement_noise': args.measurement_noise,
+        'odometry_noise': args.odometry_noise,
+    }
+
+
+def run(args):
+    """Run SLAM on a generated scenario and print the final errors."""
+    from source.run import run_slam
+    from source.scenarios.generator import ScenarioGenerator
+    from source.slam.slam import SLAM
+    from source.utils.profiling import enable_profiling
+
+    if args.resume and not args.checkpoint_dir:
+        print("Error: --resume requires --checkpoint-dir.")
+        return 2
+    if args.lag is not None and args.backend != 'fixed_lag':
+        print("Error: --lag requires --backend fixed_lag.")
+        return 2
+    if args.resume:
+        error = _resume_scenario(args)
+        if error is not None:
+            print(f"Error: {error}")
+            return 2
+    elif args.checkpoint_dir and args.seed is None:
+        # A resumed run regenerates the scenario, so it must not depend on fresh randomness
+        args.seed = random.SystemRandom().randrange(2 ** 32)
+    scenario = ScenarioGenerator(args.landmarks, args.steps, seed=args.seed, **_scenario_options(args))
+    checkpointer = None
+    if args.resume:
+        from source.slam.checkpoint import restore_slam
+        # The backend, the scheduler and the landmarks come from the checkpoint
+        slam_system = restore_slam(args.checkpoint_dir)
+        scheduler = slam_system.scheduler
+        print(f"Resuming from step {slam_system.step_count}")
+    else:
+        from source.slam.backends import make_backend
+        backend = make_backend(args.backend, **({} if args.lag is None else {'lag': args.lag}))
+        slam_system = SLAM(scenario.initial_pose, scenario.landmarks(), backend=backend)
+        scheduler = None
+        if args.budget is not None:
+            from source.algorithms.scheduler import RemovalScheduler
+            strategy_options = None
+            if args.strategy == 'least_informative_removal':
+                strategy_options = {'scoring': args.scoring}
+            scheduler = RemovalScheduler(slam_system, args.strategy, args.budget, strategy_options=strategy_options,
+                                         removal_mode=args.removal_mode)
+    if args.checkpoint_dir:
+        from source.slam.checkpoint import Checkpointer
+        checkpointer = Checkpointer(slam_system, args.checkpoint_dir, interval=args.checkpoint_interval,
+                                    metadata={'scenario': _scenario_parameters(args)})
+
+    callback = None
+    if args.live or args.record:
+        from source.maps.visualization import MapVisualizer
+        visualizer = MapVisualizer(plot_3d=args.plot_3d, output_dir=args.record,
+                                   min_interval=0.0 if args.record else 1.0 / args.fps)
+
+        def callback(slam):
+            visualizer.update_from_slam(slam, every=args.every)
+
+    profiler = enable_profiling() if args.profile else None
+    try:
+        results = run_slam(slam_system, scenario.control_inputs, scenario.measurements(),
+                           scenario.ground_truth_poses, args.steps, args.results_dir, final_recompute=True,
+                           callback=callback, resume=args.resume)
+    finally:
+        if scheduler is not None:
+            scheduler.close()
+        if checkpointer is not None:
+            checkpointer.close()
+        slam_system.close()
+
+    print(f"Final ATE: {results['final_ate']:.4f} m, ARE: {results['final_are']:.4f} deg "
+          f"({len(slam_system.poses)} poses, results in {args.results_dir})")
+    if profiler is not None:
+        print(profiler.summary_table())
+        profiler.export_chrome_trace(args.profile)
+    return 0
+
+
+def sweep(args):
+    """Run a grid of removal experiments in parallel, resuming from earlier runs."""
+    from source.experiments.runner import ExperimentRunner, expand_grid
+
+    sizes = [tuple(int(value) for value in size.split('x')) for size in args.sizes]
+    cells = expand_grid(args.algorithms, args.budgets, args.seeds, sizes, args.removal_modes)
+    runner = ExperimentRunner(args.results_dir, args.workers, _scenario_options(args), keep_runs=args.keep_runs)
+    results = runner.run(cells, resume=not args.no_resume)
+
+    records = runner.records()
+    failed = sum(record['status'] != 'ok' for record in records.values())
+    print(f"{len(cells)} cells, {failed} failed, records in {runner.records_path}")
+    if args.plot:
+        from source.utils.graphs import plot_metrics
+        plot_metrics(results, output_dir=args.plot)
+    return 1 if failed else 0
+
+
+def bench(args, extra):
+    """Run the benchmark suite, forwarding the remaining options to it."""
+    from source.benchmarks.suite import main as bench_main
+
+    return bench_main(extra)
+
+
+def plot(args):
+    """Plot the metrics of a sweep directory or of a single run directory."""
+    from source.utils.graphs import plot_metrics
+
+    if os.path.exists(os.path.join(args.path, 'records.jsonl')):
+        from source.experiments.runner import ExperimentRunner, merge_results
+        results = merge_results(ExperimentRunner(args.path).records().values())
+    else:
+        from source.utils.results_store import ResultsStore
+        with ResultsStore.open(args.path) as store:
+            results = {os.path.basename(os.path.normpath(args.path)): store.as_results()}
+    plot_metrics(results, output_dir=args.output)
+    return 0
+
+
+def _add_scenario_arguments(parser):
+    parser.add_argument('--trajectory', default='random_walk', help="Trajectory shape of the scenarios.")
+    parser.add_argument('--sensor-range', type=float, default=float('inf'))
+    parser.add_argument('--measurement-noise', type=float, default=0.0)
+    parser.add_argument('--odometry-noise', type=float, default=0.0)
+
+
+def build_parser():
+    """Build the argument parser of the CLI."""
+    parser = argparse.ArgumentParser(prog='python -m source.cli', description="Focused Inference experiments.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run SLAM on a generated scenario.")
+    run_parser.add_argument('--landmarks', type=int, default=10)
+    run_parser.add_argument('--steps', type=int, default=100)
+    run_parser.add_argument('--seed', type=int, default=None)
+    run_parser.add_argument('--backend', choices=BACKEND_NAMES, default='isam2')
+    run_parser.add_argument('--lag', type=int, help="Length of the window of the fixed_lag backend, in steps.")
+    run_parser.add_argument('--results-dir', default='results/run')
+    run_parser.add_argument('--budget', type=int, help="Keep at most this many active landmarks.")
+    run_parser.add_argument('--strategy', default='least_degree_removal', help="Removal strategy of --budget.")
+    run_parser.add_argument('--scoring', choices=SCORING_METHODS, default='exact',
+                            help="Information scoring of least_informative_removal.")
+    run_parser.add_argument('--removal-mode', choices=REMOVAL_MODES, default='delete',
+                            help="Drop removed landmarks, or sparsify them into pose factors.")
+    run_parser.add_argument('--live', action='store_true', help="Watch the run in a window.")
+    run_parser.add_argument('--record', metavar='DIR', help="Render frames of the run into a directory.")
+    run_parser.add_argument('--fps', type=float, default=20.0, help="Maximum frame rate of --live.")
+    run_parser.add_argument('--every', type=int, default=1, help="Draw one frame every n steps.")
+    run_parser.add_argument('--plot-3d', action='store_true')
+    run_parser.add_argument('--profile', metavar='TRACE', help="Profile the run and write a Chrome trace.")
+    run_parser.add_argument('--checkpoint-dir', metavar='DIR', help="Checkpoint the SLAM state into a directory.")
+    run_parser.add_argument('--checkpoint-interval', type=int, default=1000, help="Steps between checkpoints.")
+    run_parser.add_argument('--resume', action='store_true',
+                            help="Resume from the latest checkpoint of --checkpoint-dir and the results of --results-dir, "
+                                 "on the scenario recorded with the checkpoints.")
+    _add_scenario_arguments(run_parser)
+    run_parser.set_defaults(handler=run)
+
+    sweep_parser = subparsers.add_parser('sweep', help="Run a grid of landmark removal experiments.")
+    sweep_parser.add_argument('--algorithms', nargs='+', help="Removal algorithms, all if omitted.")
+    sweep_parser.add_argument('--budgets', type=int, nargs='+', default=[0])
+    sweep_parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    sweep_parser.add_argument('--sizes', nargs='+', default=['10x100'], help="Sizes as LANDMARKSxSTEPS.")
+    sweep_parser.add_argument('--removal-modes', nargs='+', choices=REMOVAL_MODES, default=['delete'])
+    sweep_parser.add_argument('--results-dir', default='results/sweep')
+    sweep_parser.add_argument('--workers', type=int, help="Number of worker processes.")
+    sweep_parser.add_argument('--no-resume', action='store_true', help="Rerun the cells already recorded.")
+    sweep_parser.add_argument('--keep-runs', action='store_true', help="Keep the per-step results of every cell.")
+    sweep_parser.add_argument('--plot', metavar='DIR', help="Save the metric plots into a directory.")
+    _add_scenario_arguments(sweep_parser)
+    sweep_parser.set_defaults(handler=sweep)
+
+    bench_parser = subparsers.add_parser('bench', help="Run the benchmark suite (options as source.benchmarks.suite).",
+                                         add_help=False)
+    bench_parser.set_defaults(handler=bench)
+
+    plot_parser = subparsers.add_parser('plot', help="Plot the metrics of a sweep or run directory.")
+    plot_parser.add_argument('path', help="Directory of a sweep (with records.jsonl) or of a run.")
+    plot_parser.add_argument('--output', metavar='DIR', help="Save the plots into a directory instead of showing them.")
+    plot_parser.set_defaults(handler=plot)
+    return parser
+
+
+def main(argv=None):
+    args, extra = build_parser().parse_known_args(argv)
+    if args.handler is bench:
+        return bench(args, extra)
+    if extra:
+        build_parser().error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,15 @@
+"""
+This module provides the names of the configurable choices of the project. It imports nothing, so
+that the command line can offer them without loading gtsam.
+"""
+
+# source/config.py
+
+# Inference backends of SLAM, registered in source.slam.backends.BACKENDS
+BACKEND_NAMES = ('isam2', 'batch', 'fixed_lag')
+
+# Ways of computing log-determinants and gains: exact marginals, or randomized estimates on the sparse information
+SCORING_METHODS = ('exact', 'stochastic')
+
+# Ways of removing a landmark: dropping its information, or summarizing it with sparse pose factors
+REMOVAL_MODES = ('delete', 'sparsify')
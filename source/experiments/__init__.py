@@ -0,0 +1,7 @@
+"""
+This package provides the runner of parallel landmark removal experiments.
+"""
+
+from .runner import Cell, ExperimentRunner, expand_grid, merge_results, run_cell
+
+__all__ = ['Cell', 'ExperimentRunner', 'expand_grid', 'merge_results', 'run_cell']
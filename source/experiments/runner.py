@@ -0,0 +1,241 @@
+"""
+This module provides the ExperimentRunner class, which runs grids of landmark removal experiments in parallel.
+"""
+
+# source/experiments/runner.py
+
+import itertools
+import json
+import os
+import time
+import traceback
+import zlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from source.utils.results_store import METRIC_COLUMNS
+
+# One experiment: a removal algorithm, budget and removal mode applied to the scenario of a seed and size
+Cell = namedtuple('Cell', ['algorithm', 'budget', 'seed', 'num_landmarks', 'num_steps', 'removal_mode'],
+                  defaults=('delete',))
+
+
+def cell_key(cell):
+    """Get a stable, filesystem-safe name of a cell."""
+    key = f"{cell.algorithm}-b{cell.budget}-s{cell.seed}-l{cell.num_landmarks}-n{cell.num_steps}"
+    # Cells of the default mode keep the names they had before removal modes existed
+    return key if cell.removal_mode == 'delete' else f"{key}-{cell.removal_mode}"
+
+
+def expand_grid(algorithms=None, budgets=(0,), seeds=(0,), sizes=((10, 100),), removal_modes=('delete',)):
+    """
+    Expand the cartesian product of the experiment parameters into cells.
+
+    Args:
+        algorithms (list of str): Removal algorithms, all of LandmarkRemoval.get_algorithm_names() if None.
+        budgets (iterable of int): Numbers of landmarks to remove.
+        seeds (iterable of int): Scenario seeds.
+        sizes (iterable of tuple): Scenario sizes as (num_landmarks, num_steps) pairs.
+        removal_modes (iterable of str): Modes of SLAM.remove_landmarks.
+
+    Returns:
+        list of Cell: The cells, in grid order.
+    """
+    if algorithms is None:
+        from source.algorithms.landmark_removal import LandmarkRemoval
+        algorithms = LandmarkRemoval.get_algorithm_names()
+    return [Cell(algorithm, int(budget), int(seed), int(num_landmarks), int(num_steps), removal_mode)
+            for algorithm, budget, seed, (num_landmarks, num_steps), removal_mode
+            in itertools.product(algorithms, budgets, seeds, sizes, removal_modes)]
+
+
+def run_cell(cell, results_dir=None, scenario_options=None):
+    """
+    Run SLAM on the scenario of a cell, remove landmarks with its algorithm and evaluate the result.
+
+    Cells sharing a seed and size run on the same scenario, so algorithms and budgets are
+    compared on identical data. The global NumPy random state is also seeded from the cell.
+
+    Args:
+        cell (Cell): The experiment to run.
+        results_dir (str): Directory of the per-step ResultsStore of the run, or None for a temporary one.
+        scenario_options (dict): Further options of the ScenarioGenerator.
+
+    Returns:
+        dict: The record of the cell, with the number of landmarks removed, the final ATE, ARE and
+         UD, and, when sparsifying, the information lost and the fill-in avoided by the summaries.
+    """
+    import tempfile
+
+    from source.algorithms.landmark_removal import LandmarkRemoval
+    from source.info_theoretic.evals import MetricAccumulator, compute_ud
+    from source.run import run_slam
+    from source.scenarios.generator import ScenarioGenerator
+    from source.slam.slam import SLAM
+    from source.slam.utils import pose_key
+
+    start = time.perf_counter()
+    np.random.seed(zlib.crc32(cell_key(cell).encode()))
+    scenario = ScenarioGenerator(cell.num_landmarks, cell.num_steps, seed=cell.seed, **(scenario_options or {}))
+    slam_system = SLAM(scenario.initial_pose, scenario.landmarks())
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        run_slam(slam_system, scenario.control_inputs, scenario.measurements(), scenario.ground_truth_poses,
+                 cell.num_steps, results_dir or temporary_dir)
+
+    last_pose = pose_key(len(slam_system.poses) - 1)
+    covariance_before = slam_system.covariances.position_covariance(last_pose)
+
+    removed, reports = [], []
+    if cell.budget > 0:
+        remover = LandmarkRemoval(slam_system.landmarks.values(), slam_system.poses, slam_system.graph,
+                                  slam_system.initial_estimate, slam_system.observations)
+        # The greedy search only needs to refine the ranking up to the budget
+        options = {'max_removals': cell.budget} if cell.algorithm == 'least_informative_removal' else {}
+        ordered = getattr(remover, cell.algorithm)(**options)
+        removed = [lm.identifier for lm in ordered[:cell.budget]]
+        reports = slam_system.remove_landmarks(removed, cell.removal_mode)
+
+    slam_system.refresh_poses()
+    estimated_poses = slam_system.poses
+    ate, are = MetricAccumulator().recompute(estimated_poses, scenario.ground_truth_poses[:len(estimated_poses)])
+    covariance_after = slam_system.covariances.position_covariance(last_pose)
+    return {
+        'landmarks_removed': len(removed),
+        'ate': float(ate),
+        'are': float(are),
+        'ud': float(compute_ud(covariance_after, covariance_before)),
+        'information_lost': float(sum(report.information_lost for report in reports)),
+        'fill_in_avoided': int(sum(report.fill_in_avoided for report in reports)),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def merge_results(records):
+    """
+    Merge cell records into the format used by plot_metrics.
+
+    Every successful cell contributes one point per metric, so repeated seeds appear as repeated
+    budgets and are aggregated by the plot. When the records cover several scenario sizes or
+    removal modes, the size or mode is appended to the algorithm name.
+
+    Args:
+        records (iterable of dict): Records written by ExperimentRunner.
+
+    Returns:
+        dict: Mapping from algorithm name to a dict of metric lists.
+    """
+    records = [record for record in records if record['status'] == 'ok']
+    sizes = {(record['cell']['num_landmarks'], record['cell']['num_steps']) for record in records}
+    modes = {record['cell'].get('removal_mode', 'delete') for record in records}
+    results = {}
+    for record in sorted(records, key=lambda record: tuple(record['cell'].values())):
+        cell = record['cell']
+        name = cell['algorithm']
+        if len(sizes) > 1:
+            name = f"{name} ({cell['num_landmarks']} landmarks, {cell['num_steps']} steps)"
+        if len(modes) > 1:
+            name = f"{name} [{cell.get('removal_mode', 'delete')}]"
+        metrics = results.setdefault(name, {column: [] for column in METRIC_COLUMNS})
+        metrics['landmarks_removed'].append(record['landmarks_removed'])
+        metrics['ate_values'].append(record['ate'])
+        metrics['are_values'].append(record['are'])
+        metrics['ud_values'].append(record['ud'])
+    return results
+
+
+def _initialize_worker():
+    # Import gtsam and the SLAM stack once per worker process rather than once per cell
+    import gtsam  # noqa: F401
+    import source.slam.slam  # noqa: F401
+    import source.algorithms.landmark_removal  # noqa: F401
+
+
+class ExperimentRunner:
+    """
+    ExperimentRunner runs experiment cells in a process pool and records their results.
+
+    Each finished or failed cell is appended as one JSON line to records.jsonl in the results
+    directory, written by the parent process only. A later run with resume skips the cells that
+    already succeeded and retries the others.
+    """
+
+    def __init__(self, results_dir, max_workers=None, scenario_options=None, keep_runs=False):
+        """
+        Initialize the runner.
+
+        Args:
+            results_dir (str): Directory of the records, created if needed.
+            max_workers (int): Number of worker processes, the number of CPUs if None.
+            scenario_options (dict): Options of the ScenarioGenerator shared by all cells.
+            keep_runs (bool): Whether to keep the per-step ResultsStore of every cell under results_dir/runs.
+        """
+        self.results_dir = results_dir
+        self.max_workers = max_workers
+        self.scenario_options = scenario_options or {}
+        self.keep_runs = keep_runs
+        os.makedirs(results_dir, exist_ok=True)
+
+    @property
+    def records_path(self):
+        """Get the path of the records file."""
+        return os.path.join(self.results_dir, 'records.jsonl')
+
+    def records(self):
+        """
+        Load the latest record of every cell.
+
+        Returns:
+            dict: Mapping from cell key to its latest record.
+        """
+        latest = {}
+        if os.path.exists(self.records_path):
+            with open(self.records_path) as file:
+                for line in file:
+                    if line.strip():
+                        record = json.loads(line)
+                        latest[cell_key(Cell(**record['cell']))] = record
+        return latest
+
+    def run(self, cells, resume=True):
+        """
+        Run the cells that have not succeeded yet.
+
+        Args:
+            cells (iterable of Cell): The cells to run.
+            resume (bool): Whether to skip the cells already recorded as successful.
+
+        Returns:
+            dict: The merged results of all requested cells, in the format used by plot_metrics.
+        """
+        cells = list(cells)
+        done = self.records() if resume else {}
+        pending = [cell for cell in cells
+                   if cell_key(cell) not in done or done[cell_key(cell)]['status'] != 'ok']
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_initialize_worker) as executor:
+                futures = {executor.submit(run_cell, cell, self._run_dir(cell), self.scenario_options): cell
+                           for cell in pending}
+                for future in as_completed(futures):
+                    cell = futures[future]
+                    try:
+                        record = {'status': 'ok', **future.result()}
+                    except Exception as e:
+                        record = {'status': 'failed', 'error': traceback.format_exc()}
+                        print(f"Error running cell {cell_key(cell)}: {e}")
+                    self._append_record({'cell': cell._asdict(), **record})
+
+        latest = self.records()
+        return merge_results(latest[cell_key(cell)] for cell in cells if cell_key(cell) in latest)
+
+    def _run_dir(self, cell):
+        return os.path.join(self.results_dir, 'runs', cell_key(cell)) if self.keep_runs else None
+
+    def _append_record(self, record):
+        with open(self.records_path, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
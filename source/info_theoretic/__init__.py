@@ -3,21 +3,56 @@ This package provides utility functions for computing various metrics,
  used in landmark removal algorithms.
 """
 
-from source.info_theoretic.utils import (
-    log_det,
-    compute_information_gain
+from source.info_theoretic.scores import (
+    compute_degree,
+    compute_uncertainty,
+    compute_reprojection_error
 )
 
+from source.info_theoretic.coverage import k_cover_algorithm
+
 from source.info_theoretic.evals import (
     compute_ate,
     compute_are,
-    compute_ud
+    compute_ud,
+    evaluate_trajectories,
+    align_trajectories,
+    MetricAccumulator
 )
 
 __all__ = [
     'compute_information_gain',
+    'compute_information_gains',
+    'InformationScorer',
+    'StochasticInformationScorer',
+    'make_information_scorer',
+    'estimate_log_det',
+    'Estimate',
+    'SCORING_METHODS',
+    'compute_degree',
+    'compute_uncertainty',
+    'k_cover_algorithm',
+    'compute_reprojection_error',
     'log_det',
     'compute_ate',
     'compute_are',
-    'compute_ud'
+    'compute_ud',
+    'evaluate_trajectories',
+    'align_trajectories',
+    'MetricAccumulator'
 ]
+
+# The information measures pull in gtsam, so their module is imported on first use
+_LAZY_UTILS = ('log_det', 'compute_information_gain', 'compute_information_gains', 'InformationScorer',
+               'make_information_scorer', 'SCORING_METHODS')
+_LAZY_STOCHASTIC = ('StochasticInformationScorer', 'estimate_log_det', 'Estimate')
+
+
+def __getattr__(name):
+    if name in _LAZY_UTILS:
+        from source.info_theoretic import utils
+        return getattr(utils, name)
+    if name in _LAZY_STOCHASTIC:
+        from source.info_theoretic import stochastic
+        return getattr(stochastic, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
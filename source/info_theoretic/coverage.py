@@ -0,0 +1,108 @@
+"""
+This module provides the greedy k-cover algorithm used by the K-Cover based landmark removal.
+"""
+
+import heapq
+
+import numpy as np
+
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """
+    Count the set bits of packed uint64 bitsets along the last axis.
+
+    Args:
+        words (numpy.ndarray): Array of uint64 words.
+
+    Returns:
+        numpy.ndarray: The number of set bits, summed over the last axis.
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    as_bytes = words.view(np.uint8).reshape(words.shape[:-1] + (-1,))
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def pack_bitsets(row_pointers, indices, num_bits):
+    """
+    Pack CSR rows into one uint64 bitset per row.
+
+    Args:
+        row_pointers (numpy.ndarray): Row pointers of the CSR matrix (R + 1,).
+        indices (numpy.ndarray): Column index of each entry.
+        num_bits (int): Number of columns.
+
+    Returns:
+        numpy.ndarray: The (R, ceil(num_bits / 64)) bitsets.
+    """
+    num_words = max(1, -(-num_bits // 64))
+    bitsets = np.zeros((len(row_pointers) - 1, num_words), dtype=np.uint64)
+    if len(indices) == 0:
+        return bitsets
+    rows = np.repeat(np.arange(len(row_pointers) - 1), np.diff(row_pointers))
+    slots = rows * num_words + indices // 64
+    bits = np.left_shift(np.uint64(1), (indices % 64).astype(np.uint64))
+    order = np.argsort(slots, kind='stable')
+    slots, bits = slots[order], bits[order]
+    starts = np.flatnonzero(np.r_[True, slots[1:] != slots[:-1]])
+    bitsets.reshape(-1)[slots[starts]] = np.bitwise_or.reduceat(bits, starts)
+    return bitsets
+
+
+def k_cover_algorithm(landmarks, observations, k=1):
+    """
+    Greedily select landmarks until every pose is observed by k selected landmarks.
+
+    Each landmark's observing poses are packed into a uint64 bitset, and the poses still covered
+    fewer than k times form a deficit bitset. The marginal coverage of a landmark is the popcount
+    of its bitset and the deficit. Marginal coverage only shrinks as landmarks are selected, so
+    stale values in a max-heap are upper bounds and only the top candidate is re-evaluated.
+
+    Landmarks that add no coverage follow the selected ones, by decreasing degree.
+
+    Args:
+        landmarks (list of Landmark): The candidate landmarks.
+        observations (ObservationIncidence): The pose-landmark incidence recorded by SLAM.
+        k (int): Number of times each pose should be covered.
+
+    Returns:
+        list of Landmark: All landmarks in selection order.
+    """
+    landmarks = list(landmarks)
+    landmark_ids = [lm.identifier for lm in landmarks]
+    num_poses = observations.num_poses
+    row_pointers, poses = observations.landmark_csr(landmark_ids)
+    bitsets = pack_bitsets(row_pointers, poses, num_poses)
+
+    coverage = np.zeros(num_poses, dtype=np.int64)
+    deficit = pack_bitsets(np.array([0, num_poses]), np.arange(num_poses), num_poses)
+
+    gains = popcount(bitsets)
+    heap = [(-gain, row) for row, gain in enumerate(gains.tolist()) if gain > 0]
+    heapq.heapify(heap)
+
+    selected = []
+    while heap:
+        negative_gain, row = heap[0]
+        gain = int(popcount(bitsets[row] & deficit[0]))
+        if gain == 0:
+            heapq.heappop(heap)
+            continue
+        if gain < -negative_gain:
+            heapq.heapreplace(heap, (-gain, row))
+            continue
+
+        heapq.heappop(heap)
+        selected.append(row)
+        covered = np.unique(poses[row_pointers[row]:row_pointers[row + 1]])
+        coverage[covered] += 1
+        full = covered[coverage[covered] == k]
+        if len(full):
+            deficit[0] &= ~pack_bitsets(np.array([0, len(full)]), full, num_poses)[0]
+
+    remaining = np.setdiff1d(np.arange(len(landmarks)), selected, assume_unique=True)
+    degrees = np.diff(row_pointers)[remaining]
+    order = selected + remaining[np.argsort(-degrees, kind='stable')].tolist()
+    return [landmarks[row] for row in order]
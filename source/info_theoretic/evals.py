@@ -3,6 +3,8 @@ This module provides functions to evaluate SLAM performance using different metr
 - Average Trajectory Error (ATE)
 - Average Rotation Error (ARE)
 - Difference in Determinant of Uncertainty (UD)
+The batched evaluate_trajectories scores stacked runs at once, with optional Umeyama alignment.
+It also provides the MetricAccumulator class, which maintains these metrics incrementally.
 """
 
 import numpy as np
@@ -12,17 +14,18 @@ def compute_ate(estimated_poses, ground_truth_poses):
     Compute the Average Trajectory Error (ATE).
 
     Args:
-        estimated_poses (numpy.ndarray): Array of estimated poses (N, 3).
-        ground_truth_poses (numpy.ndarray): Array of ground truth poses (N, 3).
+        estimated_poses (numpy.ndarray): Array of estimated poses (N, 3), or stacked runs (K, N, 3).
+        ground_truth_poses (numpy.ndarray): Array of ground truth poses, with the same shape.
 
     Returns:
-        float: The root mean squared error (RMSE) between estimated and ground truth poses.
+        float: The root mean squared error (RMSE) between estimated and ground truth poses,
+         or a (K,) array of them for stacked runs.
     """
     if estimated_poses.shape != ground_truth_poses.shape:
         raise ValueError("Estimated and ground truth poses must have the same shape.")
 
-    errors = np.linalg.norm(estimated_poses - ground_truth_poses, axis=1)
-    ate = np.sqrt(np.mean(errors ** 2))
+    errors = np.linalg.norm(estimated_poses - ground_truth_poses, axis=-1)
+    ate = np.sqrt(np.mean(errors ** 2, axis=-1))
     return ate
 
 
@@ -30,29 +33,189 @@ def compute_are(estimated_rotations, ground_truth_rotations):
     """
     Compute the Average Rotation Error (ARE).
 
+    The error of a pose is the geodesic distance on SO(3), the angle of the relative rotation.
+
     Args:
-        estimated_rotations (numpy.ndarray): Array of estimated rotations (N, 3).
-        ground_truth_rotations (numpy.ndarray): Array of ground truth rotations (N, 3).
+        estimated_rotations (numpy.ndarray): Array of estimated rotation matrices (N, 3, 3), or of
+         roll-pitch-yaw angles (N, 3); stacked runs (K, N, ...) are accepted.
+        ground_truth_rotations (numpy.ndarray): Array of ground truth rotations, with the same shape.
 
     Returns:
-        float: The average angular difference in degrees between estimated and ground truth rotations.
+        float: The average angular difference in degrees between estimated and ground truth rotations,
+         or a (K,) array of them for stacked runs.
     """
     if estimated_rotations.shape != ground_truth_rotations.shape:
         raise ValueError("Estimated and ground truth rotations must have the same shape.")
 
-    dot_products = np.einsum('ij,ij->i',
-                             estimated_rotations.reshape(-1, 3),
-                             ground_truth_rotations.reshape(-1, 3))
-    dot_products = np.clip(dot_products, -1.0, 1.0)
-    angular_errors = np.arccos(dot_products) * (180.0 / np.pi)
-    are = np.mean(angular_errors)
+    angular_errors = _angular_errors(estimated_rotations, ground_truth_rotations)
+    are = np.mean(angular_errors, axis=-1)
     return are
 
 
+def rpy_to_matrix(rpy):
+    """
+    Convert roll-pitch-yaw angles to rotation matrices, as gtsam's Rot3.RzRyRx.
+
+    Args:
+        rpy (numpy.ndarray): Angles in radians (..., 3).
+
+    Returns:
+        numpy.ndarray: The rotation matrices (..., 3, 3).
+    """
+    rpy = np.asarray(rpy, dtype=float)
+    cr, cp, cy = np.cos(rpy[..., 0]), np.cos(rpy[..., 1]), np.cos(rpy[..., 2])
+    sr, sp, sy = np.sin(rpy[..., 0]), np.sin(rpy[..., 1]), np.sin(rpy[..., 2])
+    return np.stack([
+        np.stack([cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr], axis=-1),
+        np.stack([sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr], axis=-1),
+        np.stack([-sp, cp * sr, cp * cr], axis=-1),
+    ], axis=-2)
+
+
+def rotation_angles(estimated_rotations, ground_truth_rotations):
+    """
+    Compute the geodesic angles between rotation matrices.
+
+    The angle is atan2(|axis|, cos) of the relative rotation, which stays accurate near 0 and
+    180 degrees where arccos of the trace loses precision.
+
+    Args:
+        estimated_rotations (numpy.ndarray): Rotation matrices (..., 3, 3).
+        ground_truth_rotations (numpy.ndarray): Rotation matrices, broadcastable with the estimates.
+
+    Returns:
+        numpy.ndarray: The angles in radians (...).
+    """
+    relative = np.einsum('...ji,...jk->...ik', estimated_rotations, ground_truth_rotations)
+    cosine = (np.trace(relative, axis1=-2, axis2=-1) - 1.0) / 2.0
+    axis = np.stack([relative[..., 2, 1] - relative[..., 1, 2],
+                     relative[..., 0, 2] - relative[..., 2, 0],
+                     relative[..., 1, 0] - relative[..., 0, 1]], axis=-1)
+    return np.arctan2(np.linalg.norm(axis, axis=-1) / 2.0, cosine)
+
+
+def _angular_errors(estimated_rotations, ground_truth_rotations):
+    """Compute the per-pose angular errors, in degrees, used by the ARE."""
+    if estimated_rotations.shape[-2:] != (3, 3):
+        estimated_rotations = rpy_to_matrix(estimated_rotations)
+        ground_truth_rotations = rpy_to_matrix(ground_truth_rotations)
+    return np.degrees(rotation_angles(estimated_rotations, ground_truth_rotations))
+
+
+def pose_arrays(poses):
+    """
+    Convert a trajectory to arrays.
+
+    Args:
+        poses (iterable of Pose3): The poses.
+
+    Returns:
+        tuple: The positions (N, 3) and rotation matrices (N, 3, 3).
+    """
+    matrices = np.array([pose.matrix() for pose in poses]).reshape(-1, 4, 4)
+    return matrices[:, :3, 3], matrices[:, :3, :3]
+
+
+def align_trajectories(estimated_positions, ground_truth_positions, with_scale=False, weights=None):
+    """
+    Find the rigid (or similarity) transforms aligning estimated trajectories to ground truth (Umeyama).
+
+    Args:
+        estimated_positions (numpy.ndarray): Estimated positions (K, N, 3).
+        ground_truth_positions (numpy.ndarray): Ground truth positions (K, N, 3).
+        with_scale (bool): Whether to also estimate a scale (Sim(3) instead of SE(3)).
+        weights (numpy.ndarray): Weight of every position (K, N), e.g. 0 for padding.
+
+    Returns:
+        tuple: The rotations (K, 3, 3), translations (K, 3) and scales (K,) such that
+         scale * rotation @ estimated + translation best fits the ground truth.
+    """
+    if weights is None:
+        weights = np.ones(estimated_positions.shape[:-1])
+    weights = weights / weights.sum(axis=-1, keepdims=True)
+    estimated_mean = np.einsum('kn,kni->ki', weights, estimated_positions)
+    ground_truth_mean = np.einsum('kn,kni->ki', weights, ground_truth_positions)
+    estimated_centered = estimated_positions - estimated_mean[:, None]
+    ground_truth_centered = ground_truth_positions - ground_truth_mean[:, None]
+
+    cross_covariance = np.einsum('kn,kni,knj->kij', weights, ground_truth_centered, estimated_centered)
+    u, singular_values, vt = np.linalg.svd(cross_covariance)
+    # Flip the last axis where needed so that the result is a proper rotation
+    signs = np.ones_like(singular_values)
+    signs[:, -1] = np.sign(np.linalg.det(u) * np.linalg.det(vt))
+    signs[signs == 0] = 1.0
+    rotations = np.einsum('kij,kj,kjl->kil', u, signs, vt)
+
+    scales = np.ones(len(rotations))
+    if with_scale:
+        variances = np.einsum('kn,kni,kni->k', weights, estimated_centered, estimated_centered)
+        scales = np.einsum('kj,kj->k', singular_values, signs) / np.where(variances > 0, variances, 1.0)
+    translations = ground_truth_mean - scales[:, None] * np.einsum('kij,kj->ki', rotations, estimated_mean)
+    return rotations, translations, scales
+
+
+def evaluate_trajectories(estimated_positions, ground_truth_positions, estimated_rotations=None,
+                          ground_truth_rotations=None, align=None, lengths=None):
+    """
+    Score many runs at once.
+
+    Args:
+        estimated_positions (numpy.ndarray): Estimated positions of K runs (K, N, 3).
+        ground_truth_positions (numpy.ndarray): Ground truth positions (K, N, 3), or (N, 3) shared by all runs.
+        estimated_rotations (numpy.ndarray): Estimated rotation matrices (K, N, 3, 3), optional.
+        ground_truth_rotations (numpy.ndarray): Ground truth rotation matrices (K, N, 3, 3) or (N, 3, 3).
+        align (str): None, 'se3' for a rigid alignment or 'sim3' to also fit a scale, applied per run.
+        lengths (numpy.ndarray): Number of valid steps of each run (K,); later steps are padding.
+
+    Returns:
+        dict: Per-run 'ate' and 'are' (degrees) of shape (K,), per-step 'translation_errors' and
+         'rotation_errors' (degrees) of shape (K, N), NaN on padding, and the 'alignment'
+         (rotations, translations, scales) when align is set.
+    """
+    estimated_positions = np.asarray(estimated_positions, dtype=float)
+    num_runs, num_steps = estimated_positions.shape[:2]
+    ground_truth_positions = np.broadcast_to(ground_truth_positions, estimated_positions.shape)
+    valid = np.ones((num_runs, num_steps), dtype=bool)
+    if lengths is not None:
+        valid = np.arange(num_steps) < np.asarray(lengths)[:, None]
+    # Padding is replaced by the ground truth so that it adds no error and no alignment weight
+    estimated_positions = np.where(valid[..., None], estimated_positions, ground_truth_positions)
+
+    results = {}
+    if align is not None:
+        if align not in ('se3', 'sim3'):
+            raise ValueError("Alignment must be None, 'se3' or 'sim3'.")
+        rotations, translations, scales = align_trajectories(estimated_positions, ground_truth_positions,
+                                                             with_scale=align == 'sim3', weights=valid)
+        estimated_positions = (scales[:, None, None] * np.einsum('kij,knj->kni', rotations, estimated_positions)
+                               + translations[:, None])
+        if estimated_rotations is not None:
+            estimated_rotations = np.einsum('kij,knjl->knil', rotations, estimated_rotations)
+        results['alignment'] = (rotations, translations, scales)
+
+    counts = valid.sum(axis=1)
+    translation_errors = np.linalg.norm(estimated_positions - ground_truth_positions, axis=-1)
+    translation_errors = np.where(valid, translation_errors, np.nan)
+    results['translation_errors'] = translation_errors
+    results['ate'] = np.sqrt(np.nansum(translation_errors ** 2, axis=1) / counts)
+
+    if estimated_rotations is not None and ground_truth_rotations is not None:
+        ground_truth_rotations = np.broadcast_to(ground_truth_rotations, estimated_rotations.shape)
+        rotation_errors = np.where(valid, np.degrees(rotation_angles(estimated_rotations, ground_truth_rotations)),
+                                   np.nan)
+        results['rotation_errors'] = rotation_errors
+        results['are'] = np.nansum(rotation_errors, axis=1) / counts
+    return results
+
+
 def compute_ud(estimated_covariance, ground_truth_covariance):
     """
     Compute the Difference in Determinant of Uncertainty (UD).
 
+    The determinants are taken from slogdet, and the difference of two positive determinants is
+    evaluated as det(G) * expm1(logdet(E) - logdet(G)), which keeps its precision when the
+    covariances are small or close to each other.
+
     Args:
         estimated_covariance (numpy.ndarray): Covariance matrix of the estimated pose (3, 3).
         ground_truth_covariance (numpy.ndarray): Covariance matrix of the ground truth pose (3, 3).
@@ -63,7 +226,105 @@ def compute_ud(estimated_covariance, ground_truth_covariance):
     if estimated_covariance.shape != (3, 3) or ground_truth_covariance.shape != (3, 3):
         raise ValueError("Covariance matrices must be of shape (3, 3).")
 
-    det_estimated = np.linalg.det(estimated_covariance)
-    det_ground_truth = np.linalg.det(ground_truth_covariance)
-    ud = det_estimated - det_ground_truth
-    return ud
+    sign_estimated, log_det_estimated = np.linalg.slogdet(estimated_covariance)
+    sign_ground_truth, log_det_ground_truth = np.linalg.slogdet(ground_truth_covariance)
+    if sign_estimated > 0 and sign_ground_truth > 0:
+        return float(np.exp(log_det_ground_truth) * np.expm1(log_det_estimated - log_det_ground_truth))
+    ud = sign_estimated * np.exp(log_det_estimated) - sign_ground_truth * np.exp(log_det_ground_truth)
+    return float(ud)
+
+
+class MetricAccumulator:
+    """
+    MetricAccumulator keeps running ATE, ARE and UD values over a growing trajectory.
+
+    The per-pose errors are stored in growable arrays next to their running sums, so adding a
+    new pose or replacing the estimate of a pose the solver changed costs O(1), and the metrics
+    are read without touching the rest of the trajectory.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        Initialize an empty accumulator.
+
+        Args:
+            capacity (int): Number of poses to preallocate.
+        """
+        self._squared_errors = np.zeros(max(int(capacity), 1))
+        self._angular_errors = np.zeros(max(int(capacity), 1))
+        self._size = 0
+        self._squared_sum = 0.0
+        self._angular_sum = 0.0
+        self.ud = 0.0
+
+    @property
+    def ate(self):
+        """Get the current Average Trajectory Error."""
+        return np.sqrt(self._squared_sum / self._size) if self._size else 0.0
+
+    @property
+    def are(self):
+        """Get the current Average Rotation Error in degrees."""
+        return self._angular_sum / self._size if self._size else 0.0
+
+    def __len__(self):
+        return self._size
+
+    def update(self, index, estimated_pose, ground_truth_pose):
+        """
+        Add the errors of a new pose, or replace those of a pose already accumulated.
+
+        Args:
+            index (int): Index of the pose, at most the number of accumulated poses.
+            estimated_pose (Pose3): Estimated pose.
+            ground_truth_pose (Pose3): Ground truth pose.
+        """
+        if index > self._size:
+            raise ValueError("Poses must be accumulated in order.")
+        if index == self._size:
+            if self._size == len(self._squared_errors):
+                self._squared_errors = np.resize(self._squared_errors, max(2 * self._size, 1))
+                self._angular_errors = np.resize(self._angular_errors, max(2 * self._size, 1))
+            self._squared_errors[index] = 0.0
+            self._angular_errors[index] = 0.0
+            self._size += 1
+
+        squared_error = float(np.sum((estimated_pose.translation() - ground_truth_pose.translation()) ** 2))
+        angular_error = float(np.degrees(rotation_angles(estimated_pose.rotation().matrix(),
+                                                         ground_truth_pose.rotation().matrix())))
+        self._squared_sum += squared_error - self._squared_errors[index]
+        self._angular_sum += angular_error - self._angular_errors[index]
+        self._squared_errors[index] = squared_error
+        self._angular_errors[index] = angular_error
+
+    def update_ud(self, estimated_covariance, ground_truth_covariance):
+        """
+        Update the UD from the covariances of the latest pose.
+
+        Args:
+            estimated_covariance (numpy.ndarray): Covariance matrix of the estimated pose (3, 3).
+            ground_truth_covariance (numpy.ndarray): Covariance matrix of the ground truth pose (3, 3).
+        """
+        self.ud = compute_ud(estimated_covariance, ground_truth_covariance)
+
+    def recompute(self, estimated_poses, ground_truth_poses):
+        """
+        Recompute the metrics exactly from full trajectories, discarding the running sums.
+
+        Args:
+            estimated_poses (list of Pose3): Estimated poses.
+            ground_truth_poses (list of Pose3): Ground truth poses, aligned with the estimates.
+
+        Returns:
+            tuple: The exact ATE and ARE.
+        """
+        estimated_positions, estimated_rotations = pose_arrays(estimated_poses)
+        ground_truth_positions, ground_truth_rotations = pose_arrays(ground_truth_poses)
+
+        self._squared_errors = np.sum((estimated_positions - ground_truth_positions) ** 2, axis=1)
+        self._angular_errors = _angular_errors(estimated_rotations, ground_truth_rotations)
+        self._size = len(self._squared_errors)
+        self._squared_sum = float(np.sum(self._squared_errors))
+        self._angular_sum = float(np.sum(self._angular_errors))
+        return (float(compute_ate(estimated_positions, ground_truth_positions)),
+                float(np.mean(self._angular_errors)))
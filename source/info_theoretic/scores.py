@@ -0,0 +1,103 @@
+"""
+This module provides per-landmark scores used to order landmarks for removal.
+"""
+
+import numpy as np
+
+
+def compute_degree(landmarks, observations):
+    """
+    Compute the degree of each landmark, i.e. the number of times it was observed.
+
+    Args:
+        landmarks (list of Landmark): The landmarks to score.
+        observations (ObservationIncidence): The pose-landmark incidence recorded by SLAM.
+
+    Returns:
+        dict: Mapping from landmark identifier to its degree.
+    """
+    landmark_ids = [lm.identifier for lm in landmarks]
+    return dict(zip(landmark_ids, observations.degrees(landmark_ids).tolist()))
+
+
+def compute_uncertainty(landmarks):
+    """
+    Compute the uncertainty of each landmark as the log-determinant of its position covariance.
+
+    Args:
+        landmarks (list of Landmark): The landmarks to score.
+
+    Returns:
+        dict: Mapping from landmark identifier to its uncertainty.
+    """
+    if not landmarks:
+        return {}
+    covariances = np.array([lm.covariance for lm in landmarks])
+    _, log_dets = np.linalg.slogdet(covariances)
+    return dict(zip((lm.identifier for lm in landmarks), log_dets.tolist()))
+
+
+def stack_poses(poses):
+    """
+    Stack the rotations and translations of a list of poses.
+
+    Args:
+        poses (list of Pose3): The poses.
+
+    Returns:
+        tuple: The rotation matrices (P, 3, 3) and the translations (P, 3).
+    """
+    rotations = np.array([pose.rotation().matrix() for pose in poses]).reshape(-1, 3, 3)
+    translations = np.array([pose.translation() for pose in poses]).reshape(-1, 3)
+    return rotations, translations
+
+
+def compute_reprojection_error(landmarks, poses, observations, chunk_size=None):
+    """
+    Compute the mean reprojection error of each landmark over the poses that observed it.
+
+    Every observed (pose, landmark) pair in the incidence is projected into the pose frame at once,
+    R_p^T (x_l - t_p), compared with the recorded measurement, and the errors are reduced per
+    landmark with bincount. With chunk_size set, the pairs are processed in chunks of that size,
+    so memory stays bounded on long runs.
+
+    Args:
+        landmarks (list of Landmark): The landmarks to score.
+        poses (list of Pose3): The current pose estimates, indexed like the incidence.
+        observations (ObservationIncidence): The pose-landmark incidence recorded by SLAM.
+        chunk_size (int): Maximum number of pairs projected at once, all at once if None.
+
+    Returns:
+        dict: Mapping from landmark identifier to its mean reprojection error; zero if unobserved.
+    """
+    if not landmarks:
+        return {}
+    landmark_ids = np.array([lm.identifier for lm in landmarks])
+    positions = np.array([lm.mean for lm in landmarks]).reshape(-1, 3)
+    rotations, translations = stack_poses(poses)
+
+    # Map the landmark of every observation to its position in the landmark list
+    sorter = np.argsort(landmark_ids)
+    observed_ids = observations.landmark_ids
+    slots = np.minimum(np.searchsorted(landmark_ids, observed_ids, sorter=sorter), len(landmark_ids) - 1)
+    rows = sorter[slots]
+    valid = landmark_ids[rows] == observed_ids
+
+    pose_indices = observations.pose_indices
+    measurements = observations.measurements
+    error_sums = np.zeros(len(landmarks))
+    counts = np.zeros(len(landmarks))
+    chunk_size = chunk_size or max(len(pose_indices), 1)
+    for start in range(0, len(pose_indices), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        keep = valid[chunk]
+        chunk_rows = rows[chunk][keep]
+        chunk_poses = pose_indices[chunk][keep]
+        predicted = np.einsum('nji,nj->ni', rotations[chunk_poses],
+                              positions[chunk_rows] - translations[chunk_poses])
+        errors = np.linalg.norm(predicted - measurements[chunk][keep], axis=1)
+        error_sums += np.bincount(chunk_rows, weights=errors, minlength=len(landmarks))
+        counts += np.bincount(chunk_rows, minlength=len(landmarks))
+
+    mean_errors = np.divide(error_sums, counts, out=np.zeros_like(error_sums), where=counts > 0)
+    return dict(zip(landmark_ids.tolist(), mean_errors.tolist()))
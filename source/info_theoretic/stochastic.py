@@ -0,0 +1,579 @@
+"""
+This module provides randomized estimators of log-determinants and information gains, computed on
+the sparse information matrix of a linearized factor graph without forming marginals.
+"""
+
+# source/info_theoretic/stochastic.py
+
+import time
+from collections import namedtuple
+
+import numpy as np
+import gtsam
+
+from source.slam.utils import POSE_DIM, LANDMARK_DIM, is_pose_key, is_landmark_key
+from source.utils.profiling import profiled
+
+# A randomized estimate: its value, the standard error of the value and the number of random vectors used
+Estimate = namedtuple('Estimate', ['value', 'standard_error', 'num_samples'])
+
+# Number of random vectors drawn at once; the stopping rules are checked between batches
+_SAMPLE_BATCH = 16
+
+# Upper bound on the number of float64 elements gathered at once by the gain estimator (64 MB)
+_CHUNK_ELEMENTS = 2 ** 23
+
+
+def _key_dim(key):
+    if is_pose_key(key):
+        return POSE_DIM
+    if is_landmark_key(key):
+        return LANDMARK_DIM
+    raise ValueError(f"Unsupported variable {gtsam.DefaultKeyFormatter(key)}.")
+
+
+class SparseInformation:
+    """
+    SparseInformation holds the information matrix H = J^T J of a linearized factor graph as its
+    whitened Jacobian J, and applies H to blocks of vectors in O(nnz(J)) per vector. J is stored as
+    dense blocks, one per factor and variable, stacked by shape so that products are batched.
+
+    The variables are those of the factors, ordered poses first, by key. Removing a landmark drops the rows of its factors
+    and decouples its variable, so the matrix stays invertible.
+    """
+
+    def __init__(self, graph, values):
+        """
+        Linearize the graph and assemble its Jacobian.
+
+        Args:
+            graph (NonlinearFactorGraph): The factor graph.
+            values (Values): The linearization point of the graph.
+        """
+        linearized_graph = graph.linearize(values)
+        self.keys = sorted(linearized_graph.keyVector(), key=lambda key: (not is_pose_key(key), key))
+        dims = np.array([_key_dim(key) for key in self.keys], dtype=np.int64)
+        starts = np.concatenate(([0], np.cumsum(dims)))
+        self.offsets = dict(zip(self.keys, starts[:-1].tolist()))
+        self.size = int(starts[-1])
+        self.pose_size = POSE_DIM * sum(1 for key in self.keys if is_pose_key(key))
+
+        groups = {}
+        diagonal = {key: np.zeros((_key_dim(key), _key_dim(key))) for key in self.keys}
+        self.landmark_factors = {}
+        num_rows = 0
+        for i in range(linearized_graph.size()):
+            factor = linearized_graph.at(i)
+            if factor is None:
+                continue
+            keys = factor.keys()
+            A, _ = factor.jacobian()
+            factor_rows = np.arange(num_rows, num_rows + A.shape[0])
+            column = 0
+            for position, key in enumerate(keys):
+                dim = _key_dim(key)
+                block = A[:, column:column + dim]
+                column += dim
+                # Blocks at the same position of factors of the same shape never share rows
+                group = groups.setdefault((A.shape[0], dim, position), ([], [], []))
+                group[0].append(factor_rows)
+                group[1].append(self.offsets[key])
+                group[2].append(block)
+                diagonal[key] += block.T @ block
+                if is_landmark_key(key):
+                    self.landmark_factors.setdefault(gtsam.symbolIndex(key), []).append(
+                        (factor_rows, block, len(keys)))
+            num_rows += A.shape[0]
+        self.num_rows = num_rows
+
+        self._blocks = []
+        for (_, dim, _), (rows, offsets, blocks) in groups.items():
+            columns = np.array(offsets)[:, None] + np.arange(dim)
+            order = np.argsort(offsets, kind='stable')
+            variables, starts = np.unique(np.array(offsets)[order], return_index=True)
+            self._blocks.append((np.array(rows), columns, np.array(blocks), order,
+                                 variables[:, None] + np.arange(dim), starts))
+        self._row_weights = np.ones(num_rows)
+        self._decoupled = np.zeros(self.size)
+        self._diagonal = diagonal
+
+    def jacobian_product(self, X):
+        """Compute J X for a block of vectors X (size, k)."""
+        out = np.zeros((self.num_rows, X.shape[1]))
+        for rows, columns, blocks, _, _, _ in self._blocks:
+            out[rows] += blocks @ X[columns]
+        return out * self._row_weights[:, None]
+
+    def jacobian_transpose_product(self, V):
+        """Compute J^T V for a block of vectors V (num_rows, k)."""
+        V = V * self._row_weights[:, None]
+        out = np.zeros((self.size, V.shape[1]))
+        for rows, _, blocks, order, variables, starts in self._blocks:
+            products = blocks.transpose(0, 2, 1) @ V[rows]
+            out[variables] += np.add.reduceat(products[order], starts, axis=0)
+        return out
+
+    def product(self, X):
+        """Compute H X for a block of vectors X (size, k)."""
+        return self.jacobian_transpose_product(self.jacobian_product(X)) + self._decoupled[:, None] * X
+
+    def remove_landmark(self, landmark_id):
+        """
+        Drop the factors of a landmark and decouple its variable.
+
+        Args:
+            landmark_id (int): Identifier of the landmark.
+        """
+        key = gtsam.symbol('l', landmark_id)
+        for factor_rows, _, _ in self.landmark_factors.pop(landmark_id, []):
+            self._row_weights[factor_rows] = 0.0
+        offset = self.offsets[key]
+        self._decoupled[offset:offset + LANDMARK_DIM] = 1.0
+        self._diagonal[key] = np.eye(LANDMARK_DIM)
+
+    def preconditioner(self, active=None):
+        """
+        Get the block-Jacobi preconditioner of H, or of its restriction to some variables.
+
+        Args:
+            active (set of int): Keys of the variables to keep, all variables if None. The blocks
+             of the other variables are the identity.
+
+        Returns:
+            BlockJacobi: The preconditioner.
+        """
+        groups = {}
+        for key in self.keys:
+            block = self._diagonal[key] if active is None or key in active else np.eye(_key_dim(key))
+            indices, blocks = groups.setdefault(block.shape[0], ([], []))
+            indices.append(self.offsets[key])
+            blocks.append(block)
+        return BlockJacobi([(np.array(indices)[:, None] + np.arange(dim), np.array(blocks))
+                            for dim, (indices, blocks) in groups.items()])
+
+    def mask(self, active):
+        """Get the indicator (size,) of the entries of the given variables."""
+        indicator = np.zeros(self.size)
+        for key in active:
+            offset = self.offsets[key]
+            indicator[offset:offset + _key_dim(key)] = 1.0
+        return indicator
+
+
+class BlockJacobi:
+    """
+    BlockJacobi is a block-diagonal approximation M = L L^T of an information matrix, applied
+    through the inverses of its Cholesky factors.
+    """
+
+    def __init__(self, groups):
+        """
+        Factorize the diagonal blocks.
+
+        Args:
+            groups (list of tuple): For every block size d, the indices (B, d) of the blocks and the
+             blocks themselves (B, d, d).
+        """
+        self._groups = []
+        self.log_det = 0.0
+        for indices, blocks in groups:
+            # Unobserved variables have zero blocks; they are left unscaled
+            singular = np.linalg.eigvalsh(blocks)[:, 0] <= 1e-12 * np.abs(blocks).max(initial=1.0)
+            blocks = np.where(singular[:, None, None], np.eye(blocks.shape[1]), blocks)
+            factors = np.linalg.cholesky(blocks)
+            self.log_det += 2.0 * np.log(np.diagonal(factors, axis1=1, axis2=2)).sum()
+            self._groups.append((indices, np.linalg.inv(factors)))
+
+    def _apply(self, X, transpose):
+        out = np.empty_like(X)
+        for indices, inverses in self._groups:
+            matrices = inverses.transpose(0, 2, 1) if transpose else inverses
+            out[indices] = np.einsum('bij,bjk->bik', matrices, X[indices])
+        return out
+
+    def lower_solve(self, X):
+        """Compute L^-1 X."""
+        return self._apply(X, transpose=False)
+
+    def upper_solve(self, X):
+        """Compute L^-T X."""
+        return self._apply(X, transpose=True)
+
+    def solve(self, X):
+        """Compute M^-1 X."""
+        return self.upper_solve(self.lower_solve(X))
+
+
+def conjugate_gradient(product, B, preconditioner, tolerance=1e-6, max_iterations=None):
+    """
+    Solve A X = B for a symmetric positive definite A with preconditioned conjugate gradients,
+    iterating on all columns of B at once.
+
+    Args:
+        product (callable): Function computing A X for a block of vectors.
+        B (numpy.ndarray): Right-hand sides (n, k).
+        preconditioner (BlockJacobi): Preconditioner of A.
+        tolerance (float): Relative residual norm at which a column has converged.
+        max_iterations (int): Maximum number of iterations, n if None.
+
+    Returns:
+        numpy.ndarray: The solutions (n, k).
+    """
+    X = np.zeros_like(B)
+    R = B.copy()
+    Z = preconditioner.solve(R)
+    P = Z.copy()
+    rz = np.einsum('ij,ij->j', R, Z)
+    thresholds = tolerance * np.linalg.norm(B, axis=0)
+    for _ in range(max_iterations or B.shape[0]):
+        active = np.linalg.norm(R, axis=0) > thresholds
+        if not active.any():
+            break
+        AP = product(P)
+        pap = np.einsum('ij,ij->j', P, AP)
+        alpha = np.where(active, rz / np.where(active, pap, 1.0), 0.0)
+        X += alpha * P
+        R -= alpha * AP
+        Z = preconditioner.solve(R)
+        rz_new = np.einsum('ij,ij->j', R, Z)
+        P = Z + np.where(active, rz_new / np.where(active, rz, 1.0), 0.0) * P
+        rz = rz_new
+    return X
+
+
+def lanczos_log_quadrature(product, probes, steps):
+    """
+    Estimate z^T log(A) z for every probe vector z, by Gauss quadrature on the tridiagonal
+    matrix of a Lanczos run started from z.
+
+    Args:
+        product (callable): Function computing A X for a block of vectors, A symmetric positive definite.
+        probes (numpy.ndarray): Probe vectors (n, k).
+        steps (int): Number of Lanczos steps.
+
+    Returns:
+        numpy.ndarray: The quadratic forms (k,).
+    """
+    norms = np.linalg.norm(probes, axis=0)
+    Q = probes / np.where(norms > 0, norms, 1.0)
+    Q_previous = np.zeros_like(Q)
+    alphas = np.zeros((steps, Q.shape[1]))
+    betas = np.zeros((steps, Q.shape[1]))
+    lengths = np.full(Q.shape[1], steps)
+    beta = np.zeros(Q.shape[1])
+    for step in range(steps):
+        W = product(Q) - beta * Q_previous
+        alpha = np.einsum('ij,ij->j', Q, W)
+        W -= alpha * Q
+        beta = np.linalg.norm(W, axis=0)
+        alphas[step], betas[step] = alpha, beta
+        # A column breaks down once its Krylov space is invariant; its quadrature is then exact
+        lengths[(beta <= 1e-10 * np.abs(alpha)) & (lengths == steps)] = step + 1
+        if (lengths <= step + 1).all():
+            break
+        Q_previous, Q = Q, W / np.where(beta > 0, beta, 1.0)
+
+    quadratic_forms = np.empty(Q.shape[1])
+    for column, length in enumerate(lengths):
+        off_diagonal = betas[:length - 1, column]
+        T = np.diag(alphas[:length, column]) + np.diag(off_diagonal, 1) + np.diag(off_diagonal, -1)
+        nodes, vectors = np.linalg.eigh(T)
+        weights = vectors[0] ** 2
+        quadratic_forms[column] = norms[column] ** 2 * weights @ np.log(np.maximum(nodes, 1e-300))
+    return quadratic_forms
+
+
+def _stop_sampling(samples, num_samples, tolerance, deadline):
+    if len(samples) >= num_samples:
+        return True
+    if deadline is not None and time.perf_counter() > deadline and len(samples) >= 2:
+        return True
+    return (tolerance is not None and len(samples) >= 2
+            and np.std(samples, ddof=1) / np.sqrt(len(samples)) <= tolerance)
+
+
+@profiled('info.estimate_log_det')
+def estimate_log_det(X, g_theta, theta_star, num_probes=64, lanczos_steps=30, tolerance=None, time_budget=None,
+                     seed=None):
+    """
+    Estimate the log-determinant of the joint marginal information of a set of variables with
+    stochastic Lanczos quadrature.
+
+    The marginal information of X is the Schur complement of the other variables R in H, so
+    log det = log det H - log det H_RR. Both terms are traces of matrix logarithms of the
+    block-Jacobi preconditioned matrices, estimated with the same Rademacher probes so that their
+    errors cancel in part; the log-determinant of the preconditioner is exact. More probes
+    lower the standard error as 1/sqrt(num_probes), more Lanczos steps lower the quadrature bias.
+
+    Args:
+        X (list of int): Keys of the variables.
+        g_theta (NonlinearFactorGraph): The factor graph.
+        theta_star (Values): The linearization point of the graph.
+        num_probes (int): Maximum number of probe vectors.
+        lanczos_steps (int): Number of Lanczos steps per probe.
+        tolerance (float): Stop once the standard error is below this value.
+        time_budget (float): Stop drawing probes after this many seconds.
+        seed (int): Seed of the probes.
+
+    Returns:
+        Estimate: The log-determinant of the joint marginal information matrix and its standard error.
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    rng = np.random.default_rng(seed)
+    information = SparseInformation(g_theta, theta_star)
+    rest = set(information.keys) - set(X)
+
+    terms = [(information.preconditioner(), None, 1.0)]
+    if rest:
+        terms.append((information.preconditioner(rest), information.mask(rest), -1.0))
+    samples = []
+    while not _stop_sampling(samples, num_probes, tolerance, deadline):
+        probes = rng.choice((-1.0, 1.0), size=(information.size, min(_SAMPLE_BATCH, num_probes - len(samples))))
+        difference = np.zeros(probes.shape[1])
+        for preconditioner, mask, sign in terms:
+            if mask is None:
+                product = lambda V, M=preconditioner: M.lower_solve(information.product(M.upper_solve(V)))
+                difference += sign * lanczos_log_quadrature(product, probes, lanczos_steps)
+            else:
+                product = lambda V, M=preconditioner, m=mask[:, None]: M.lower_solve(
+                    m * information.product(m * M.upper_solve(V)) + (1.0 - m) * M.upper_solve(V))
+                difference += sign * lanczos_log_quadrature(product, mask[:, None] * probes, lanczos_steps)
+        samples.extend(difference.tolist())
+
+    exact_part = sum(sign * preconditioner.log_det for preconditioner, _, sign in terms)
+    return Estimate(float(exact_part + np.mean(samples)), float(np.std(samples, ddof=1) / np.sqrt(len(samples))),
+                    len(samples))
+
+
+def _half_integer_polygammas(count):
+    """Get the digamma and trigamma functions at 1/2, 1, 3/2, ..., count/2."""
+    digamma, trigamma = np.empty(count), np.empty(count)
+    for first, psi, psi1 in ((0.5, -np.euler_gamma - 2 * np.log(2), np.pi ** 2 / 2),
+                             (1.0, -np.euler_gamma, np.pi ** 2 / 6)):
+        points = np.arange(first, count / 2 + 0.25, 1.0)
+        index = (2 * points - 1).astype(int)
+        digamma[index] = psi + np.concatenate(([0.0], np.cumsum(1 / points[:-1])))
+        trigamma[index] = psi1 - np.concatenate(([0.0], np.cumsum(1 / points[:-1] ** 2)))
+    return digamma, trigamma
+
+
+def _covariance_form_gains(projections):
+    """
+    Estimate -0.5 log det(I - M) from samples (g, r, k) with covariance M, with a second-order
+    bias correction and a delta-method standard error. Accurate when M is small.
+    """
+    num_samples, rank = projections.shape[2], projections.shape[1]
+    moments = projections @ projections.transpose(0, 2, 1) / num_samples
+    complement = np.eye(rank) - moments
+    sign, logdet = np.linalg.slogdet(complement)
+    inverses = np.linalg.inv(np.where(sign[:, None, None] > 0, complement, np.eye(rank)))
+    weighted = inverses @ moments
+    bias = 0.25 * (np.trace(weighted, axis1=1, axis2=2) ** 2
+                   + np.einsum('gij,gji->g', weighted, weighted)) / num_samples
+    quadratic_forms = 0.5 * np.einsum('grk,grs,gsk->gk', projections, inverses, projections)
+    errors = quadratic_forms.std(axis=1, ddof=1) / np.sqrt(num_samples)
+    return np.where(sign > 0, -0.5 * logdet - bias, np.inf), np.where(sign > 0, errors, np.inf)
+
+
+def _complement_form_gains(differences):
+    """
+    Estimate -0.5 log det K from samples (g, r, k) with covariance K, k >= r. The sample
+    covariance is K^1/2 W K^1/2 / k with W Wishart, so the error of its log-determinant does not
+    depend on K, and its mean and variance are exact. Accurate when K is nearly singular.
+    """
+    num_samples, rank = differences.shape[2], differences.shape[1]
+    sign, logdet = np.linalg.slogdet(differences @ differences.transpose(0, 2, 1) / num_samples)
+    digamma, trigamma = _half_integer_polygammas(num_samples)
+    # log det W = sum of the logs of chi-square variables with k, k - 1, ..., k - r + 1 degrees of freedom
+    degrees = np.arange(num_samples - rank + 1, num_samples + 1) - 1
+    mean = np.sum(digamma[degrees] + np.log(2.0 / num_samples))
+    error = 0.5 * np.sqrt(np.sum(trigamma[degrees]))
+    values = np.where(sign > 0, -0.5 * (logdet - mean), np.inf)
+    return values, np.full(len(values), error)
+
+
+class StochasticInformationScorer:
+    """
+    StochasticInformationScorer estimates the information landmarks provide about the poses from
+    random samples of the pose marginal, drawn with sparse solves on the information matrix.
+
+    With the notation of InformationScorer, the gain of a landmark is -0.5 log det(I - U^T S^-1 U),
+    where U = A_pose^T N spans the information the landmark adds to the poses and N is an
+    orthonormal basis of the complement of its own Jacobian. The samples y = H^-1 J^T e, with e
+    standard normal, are distributed as N(0, H^-1), so w = U^T y has covariance M = U^T S^-1 U
+    for every landmark at once. Moreover w - N^T e, with the noise of the landmark's own rows,
+    has covariance I - M and is independent of y. Each gain is estimated from whichever of the
+    two sample covariances gives the smaller standard error: the first is accurate for weak
+    landmarks, the second, whose error is known exactly, for landmarks that dominate the
+    information of their poses and needs more samples than the landmark has projected rows.
+
+    Removing a landmark updates the samples exactly, using the noise of its factors and a few
+    solves with the columns of its U, so gains can be re-evaluated against the remaining landmarks.
+    Nothing of the size of the dense pose covariance is ever formed.
+    """
+
+    @profiled('info.stochastic_scorer_init')
+    def __init__(self, graph, values, num_samples=64, tolerance=None, time_budget=None, cg_tolerance=1e-6,
+                 max_iterations=None, seed=None):
+        """
+        Linearize the graph and draw the samples.
+
+        Args:
+            graph (NonlinearFactorGraph): The SLAM factor graph.
+            values (Values): The linearization point of the graph.
+            num_samples (int): Maximum number of samples.
+            tolerance (float): Stop sampling once the largest standard error of a gain, in nats,
+             is below this value.
+            time_budget (float): Stop sampling after this many seconds.
+            cg_tolerance (float): Relative residual of the conjugate gradient solves.
+            max_iterations (int): Maximum number of conjugate gradient iterations per solve.
+            seed (int): Seed of the samples.
+        """
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        rng = np.random.default_rng(seed)
+        self._information = SparseInformation(graph, values)
+        self._preconditioner = self._information.preconditioner()
+        self._cg_options = {'tolerance': cg_tolerance, 'max_iterations': max_iterations}
+
+        # Every landmark needs the rows of its factors and a basis of the complement of its Jacobian
+        self._landmarks = {}
+        for lm_id, factors in self._information.landmark_factors.items():
+            if any(num_keys != 2 for _, _, num_keys in factors):
+                raise ValueError("Landmark factors must connect exactly one pose and one landmark.")
+            rows = np.concatenate([factor_rows for factor_rows, _, _ in factors])
+            basis, _ = np.linalg.qr(np.vstack([block for _, block, _ in factors]), mode='complete')
+            self._landmarks[lm_id] = (rows, basis[:, LANDMARK_DIM:])
+
+        pose_size = self._information.pose_size
+        self._samples = np.empty((pose_size, 0))
+        self._residuals = None
+        self._noise = {lm_id: np.empty((null_space.shape[1], 0))
+                       for lm_id, (_, null_space) in self._landmarks.items()}
+        while True:
+            batch = min(_SAMPLE_BATCH, num_samples - self._samples.shape[1])
+            noise = rng.standard_normal((self._information.num_rows, batch))
+            samples = conjugate_gradient(self._information.product,
+                                         self._information.jacobian_transpose_product(noise),
+                                         self._preconditioner, **self._cg_options)
+            self._samples = np.hstack([self._samples, samples[:pose_size]])
+            self._residuals = None
+            for lm_id, (rows, null_space) in self._landmarks.items():
+                self._noise[lm_id] = np.hstack([self._noise[lm_id], null_space.T @ noise[rows]])
+
+            count = self._samples.shape[1]
+            if count >= num_samples or (count >= 2 and deadline is not None and time.perf_counter() > deadline):
+                break
+            if tolerance is not None and count >= 2 and max(
+                    (estimate.standard_error for estimate in self.estimates().values()), default=0.0) <= tolerance:
+                break
+
+    @property
+    def landmark_ids(self):
+        """Get the identifiers of the landmarks that are still scored."""
+        return list(self._landmarks)
+
+    @property
+    def num_samples(self):
+        """Get the number of samples of the pose marginal."""
+        return self._samples.shape[1]
+
+    @profiled('info.stochastic_estimates')
+    def estimates(self, landmark_ids=None):
+        """
+        Estimate the gains of several landmarks with respect to the remaining landmarks.
+
+        Args:
+            landmark_ids (iterable of int): Landmarks to score, all remaining landmarks if None.
+
+        Returns:
+            dict: Mapping from landmark identifier to the Estimate of its information gain in nats.
+        """
+        if landmark_ids is None:
+            landmark_ids = self.landmark_ids
+        groups = {}
+        for lm_id in landmark_ids:
+            if lm_id in self._landmarks:
+                groups.setdefault(self._landmarks[lm_id][1].shape, []).append(lm_id)
+
+        if self._residuals is None:
+            samples = np.zeros((self._information.size, self.num_samples))
+            samples[:self._information.pose_size] = self._samples
+            self._residuals = self._information.jacobian_product(samples)
+
+        estimates = {}
+        for (num_rows, rank), ids in groups.items():
+            chunk = max(1, _CHUNK_ELEMENTS // ((num_rows + 3 * rank) * self.num_samples + 3 * rank ** 2))
+            for start in range(0, len(ids), chunk):
+                part = ids[start:start + chunk]
+                rows = np.array([self._landmarks[lm_id][0] for lm_id in part])
+                null_spaces = np.array([self._landmarks[lm_id][1] for lm_id in part])
+                projections = np.einsum('gmr,gmk->grk', null_spaces, self._residuals[rows])
+                noise = np.array([self._noise[lm_id] for lm_id in part])
+                values, errors = _covariance_form_gains(projections)
+                if self.num_samples >= rank:
+                    values_k, errors_k = _complement_form_gains(projections - noise)
+                    better = errors_k < errors
+                    values, errors = np.where(better, values_k, values), np.where(better, errors_k, errors)
+                for lm_id, value, error in zip(part, values, errors):
+                    estimates[lm_id] = Estimate(float(value), float(error), self.num_samples)
+        return estimates
+
+    def gains(self, landmark_ids=None):
+        """
+        Estimate the gains of several landmarks with respect to the remaining landmarks.
+
+        Args:
+            landmark_ids (iterable of int): Landmarks to score, all remaining landmarks if None.
+
+        Returns:
+            dict: Mapping from landmark identifier to its estimated information gain in nats.
+        """
+        return {lm_id: estimate.value for lm_id, estimate in self.estimates(landmark_ids).items()}
+
+    def gain(self, landmark_id):
+        """
+        Estimate the gain of a single landmark with respect to the remaining landmarks.
+
+        Args:
+            landmark_id (int): Identifier of the landmark.
+
+        Returns:
+            float: The estimated information gain in nats.
+        """
+        return self.gains([landmark_id])[landmark_id]
+
+    @profiled('info.stochastic_remove')
+    def remove(self, landmark_id):
+        """
+        Remove a landmark and update the samples to the marginal without it.
+
+        With S' = S - U U^T and K = I - U^T S^-1 U, the samples become
+        y' = y + S^-1 U K^-1 (U^T y - N^T e), where e is the noise that was drawn for the rows of
+        the landmark, which is exactly how y' = S'^-1 J'^T e' would have been drawn.
+
+        Args:
+            landmark_id (int): Identifier of the landmark.
+
+        Returns:
+            float: The exact information gain of the landmark at removal, in nats, up to the
+             tolerance of the solves.
+        """
+        information = self._information
+        rows, null_space = self._landmarks.pop(landmark_id)
+        noise = self._noise.pop(landmark_id)
+
+        embedded = np.zeros((information.num_rows, null_space.shape[1]))
+        embedded[rows] = null_space
+        U = information.jacobian_transpose_product(embedded)
+        U[information.pose_size:] = 0.0
+        solutions = conjugate_gradient(information.product, U, self._preconditioner, **self._cg_options)
+        sigma_U = solutions[:information.pose_size]
+        U = U[:information.pose_size]
+
+        capacitance = np.eye(U.shape[1]) - U.T @ sigma_U
+        self._samples += sigma_U @ np.linalg.solve(capacitance, U.T @ self._samples - noise)
+        self._residuals = None
+        information.remove_landmark(landmark_id)
+        self._preconditioner = information.preconditioner()
+        sign, logdet = np.linalg.slogdet(capacitance)
+        return float(-0.5 * logdet) if sign > 0 else np.inf
@@ -5,39 +5,307 @@ This module provides utility functions for information-theoretic computations.
 import numpy as np
 import gtsam
 
-def compute_information_gain(agent, landmark, poses):
+from source.config import SCORING_METHODS
+from source.info_theoretic.stochastic import StochasticInformationScorer, estimate_log_det
+from source.slam.utils import POSE_DIM, LANDMARK_DIM, is_pose_key, is_landmark_key, landmark_key
+from source.utils.profiling import profiled
+
+# Upper bound on the number of float64 elements gathered at once by the batched scorer (64 MB)
+_CHUNK_ELEMENTS = 2 ** 23
+
+# Number of poses up to which landmarks share a joint covariance query even when they observed
+# different poses; the cost of a query grows about cubically with its number of poses
+_BATCH_POSES = 32
+
+
+def _check_method(method):
+    if method not in SCORING_METHODS:
+        raise ValueError(f"Unknown scoring method '{method}', expected one of {SCORING_METHODS}.")
+
+
+@profiled('info.compute_information_gain')
+def compute_information_gain(graph, values, landmark_id, method='exact', **options):
+    """
+    Compute the information a single landmark provides about the poses, by solving the
+    problem with and without it. This is the exact reference for compute_information_gains.
+
+    Args:
+        graph (NonlinearFactorGraph): The SLAM factor graph.
+        values (Values): The linearization point of the graph.
+        landmark_id (int): Identifier of the landmark.
+        method (str): 'exact', or 'stochastic' to estimate the gain with a StochasticInformationScorer.
+        **options: Keyword arguments of StochasticInformationScorer, such as num_samples and seed.
+
+    Returns:
+        float: The information gain in nats.
+    """
+    _check_method(method)
+    if method == 'stochastic':
+        return compute_information_gains(graph, values, [landmark_id], method, **options).get(landmark_id, 0)
     try:
-        # Assuming `agent.position` returns a numpy array
-        agent_position = agent.position
-        agent_covariance = agent.position_covariance
-
-        # Compute mutual information between the agent's position and the landmark
-        X = [0]  # Placeholder, replace with the actual variable indices in the factor graph
-        g_theta = gtsam.NonlinearFactorGraph()  # Placeholder, replace with the actual factor graph
-        theta_star = gtsam.Values()  # Placeholder, replace with the actual values
-
-        log_det_theta = log_det(X + [landmark.identifier], g_theta, theta_star)
-        reduced_graph = gtsam.NonlinearFactorGraph(g_theta)
-        reduced_graph.remove(landmark.identifier)
-        reduced_theta_star = gtsam.Values(theta_star)
-        reduced_theta_star.erase(landmark.identifier)
+        lm_key = landmark_key(landmark_id)
+        X = [key for key in values.keys() if is_pose_key(key)]
+
+        reduced_graph = gtsam.NonlinearFactorGraph()
+        for i in range(graph.size()):
+            factor = graph.at(i)
+            if factor is not None and lm_key not in factor.keys():
+                reduced_graph.push_back(factor)
+        reduced_theta_star = gtsam.Values(values)
+        reduced_theta_star.erase(lm_key)
+
+        log_det_theta = log_det(X, graph, values)
         log_det_theta_reduced = log_det(X, reduced_graph, reduced_theta_star)
 
-        return 0.5 * (log_det_theta_reduced - log_det_theta)
+        return 0.5 * (log_det_theta - log_det_theta_reduced)
     except Exception as e:
         print(f"Error computing information gain: {e}")
         return 0
 
-def log_det(X, g_theta, theta_star):
+
+class InformationScorer:
+    """
+    InformationScorer scores the information landmarks provide about the poses, from a single
+    linearization of the SLAM factor graph.
+
+    Eliminating the landmarks from the linearized problem gives the information matrix S of the
+    poses. Each landmark contributes a low-rank term C_l to S, supported on the poses that
+    observed it, so its gain follows from the determinant lemma on a small block:
+
+        0.5 * (log det S - log det (S - C_l)) = -0.5 * log det (I - Q_l A_l S^-1 A_l^T)
+
+    where A_l holds the pose Jacobians of the landmark's factors and Q_l projects out the
+    landmark's own Jacobian, and its prior if it has one. Only the blocks of S^-1 on the poses
+    that observed the landmark are needed; they are read from the sparse marginals of the
+    linearized graph for a bounded batch of landmarks at a time, so the pose covariance is never
+    formed whole. Removing a landmark drops
+    its factors, and the marginals are recomputed when gains are next requested, so gains are
+    evaluated against the remaining landmarks.
+
+    Landmarks with factors other than observations from one pose and priors, e.g. factors
+    between landmarks, are not scored; their factors are kept as they are.
+    """
+
+    @profiled('info.scorer_init')
+    def __init__(self, graph, values):
+        """
+        Linearize the graph and sort its factors by landmark.
+
+        Args:
+            graph (NonlinearFactorGraph): The SLAM factor graph.
+            values (Values): The linearization point of the graph.
+        """
+        self._values = values
+        self._marginals = None
+
+        # Tag every linearized factor with the landmark it belongs to, None for the factors that stay
+        self._factors = []
+        observations = {}
+        priors = {}
+        unsupported = set()
+        linearized_graph = graph.linearize(values)
+        for i in range(linearized_graph.size()):
+            factor = linearized_graph.at(i)
+            if factor is None:
+                continue
+            keys = factor.keys()
+            lm_keys = [key for key in keys if is_landmark_key(key)]
+            lm_ids = [gtsam.symbolIndex(key) for key in lm_keys]
+            pose_keys = [key for key in keys if is_pose_key(key)]
+            self._factors.append((lm_ids[0] if len(lm_ids) == 1 else None, factor))
+            if not lm_keys:
+                continue
+            if len(lm_keys) != 1 or len(pose_keys) + 1 != len(keys) or len(pose_keys) > 1:
+                unsupported.update(lm_ids)
+                continue
+            A, _ = factor.jacobian()
+            if not pose_keys:
+                priors[lm_ids[0]] = priors.get(lm_ids[0], 0) + A.T @ A
+            elif is_landmark_key(keys[0]):
+                observations.setdefault(lm_ids[0], []).append((pose_keys[0], A[:, POSE_DIM:], A[:, :LANDMARK_DIM]))
+            else:
+                observations.setdefault(lm_ids[0], []).append((pose_keys[0], A[:, :POSE_DIM], A[:, POSE_DIM:]))
+
+        self._factors = [(None if lm_id in unsupported else lm_id, factor) for lm_id, factor in self._factors]
+        self._observations = {
+            lm_id: (np.array([obs[0] for obs in obs_list]),
+                    np.array([obs[1] for obs in obs_list]),
+                    np.vstack([obs[2] for obs in obs_list]),
+                    priors.get(lm_id, np.zeros((LANDMARK_DIM, LANDMARK_DIM))))
+            for lm_id, obs_list in observations.items() if lm_id not in unsupported
+        }
+
+    @property
+    def landmark_ids(self):
+        """Get the identifiers of the landmarks that are still scored."""
+        return list(self._observations)
+
+    def _pose_covariance(self, keys):
+        """Get the joint covariance (6u, 6u) of a list of u pose keys from the marginals of the remaining factors."""
+        if self._marginals is None:
+            remaining = gtsam.GaussianFactorGraph()
+            for lm_id, factor in self._factors:
+                if lm_id is None or lm_id in self._observations:
+                    remaining.push_back(factor)
+            self._marginals = gtsam.Marginals(remaining, self._values)
+        return self._marginals.jointMarginalCovariance(gtsam.KeyVector(keys)).fullMatrix()
+
+    def _batches(self, landmark_ids):
+        """
+        Split landmarks, ordered by their first observation, into batches sharing a joint covariance query.
+
+        A landmark joins the current batch while the poses of the batch stay few, or while it
+        mostly observed poses of the batch, up to the pose count that fills a chunk.
+        """
+        max_poses = max(1, int(np.sqrt(_CHUNK_ELEMENTS)) // POSE_DIM)
+        batch, poses = [], set()
+        for lm_id in sorted(landmark_ids, key=lambda lm_id: self._observations[lm_id][0].min()):
+            observed = set(self._observations[lm_id][0].tolist())
+            new_poses = len(observed - poses)
+            num_poses = len(poses) + new_poses
+            if batch and (num_poses > max_poses or (num_poses > _BATCH_POSES and 2 * new_poses > len(observed))):
+                yield batch, sorted(poses)
+                batch, poses = [], set()
+            batch.append(lm_id)
+            poses |= observed
+        if batch:
+            yield batch, sorted(poses)
+
+    @profiled('info.gains')
+    def gains(self, landmark_ids=None):
+        """
+        Compute the gains of several landmarks with respect to the remaining landmarks.
+
+        Landmarks are processed in batches, with one joint covariance query over the poses they
+        observed. In a batch, landmarks with equal observation block shapes are stacked and
+        scored in bounded-size chunks.
+
+        Args:
+            landmark_ids (iterable of int): Landmarks to score, all remaining landmarks if None.
+
+        Returns:
+            dict: Mapping from landmark identifier to its information gain in nats.
+        """
+        if landmark_ids is None:
+            landmark_ids = self.landmark_ids
+
+        gains = {}
+        for batch, pose_keys in self._batches([lm_id for lm_id in landmark_ids if lm_id in self._observations]):
+            num_poses = len(pose_keys)
+            covariance = self._pose_covariance(pose_keys).reshape(num_poses, POSE_DIM, num_poses, POSE_DIM)
+            covariance = covariance.transpose(0, 2, 1, 3)
+            pose_index = {key: i for i, key in enumerate(pose_keys)}
+
+            groups = {}
+            for lm_id in batch:
+                groups.setdefault(self._observations[lm_id][1].shape[:2], []).append(lm_id)
+            for (num_observations, rows), ids in groups.items():
+                block = num_observations * rows
+                chunk = max(1, _CHUNK_ELEMENTS // (num_observations ** 2 * POSE_DIM ** 2 + block ** 2))
+                for start in range(0, len(ids), chunk):
+                    part = ids[start:start + chunk]
+                    index = np.array([[pose_index[key] for key in self._observations[lm_id][0].tolist()]
+                                      for lm_id in part])
+                    A_pose = np.array([self._observations[lm_id][1] for lm_id in part])
+                    A_landmark = np.array([self._observations[lm_id][2] for lm_id in part])
+                    prior = np.array([self._observations[lm_id][3] for lm_id in part])
+
+                    sigma = covariance[index[:, :, None], index[:, None, :]]
+                    M = np.einsum('gkra,gklab,glsb->gkrls', A_pose, sigma, A_pose, optimize=True)
+                    M = M.reshape(len(part), block, block)
+                    projection = np.eye(block) - A_landmark @ np.linalg.solve(
+                        np.einsum('gkr,gks->grs', A_landmark, A_landmark) + prior, A_landmark.transpose(0, 2, 1))
+                    sign, logdet = np.linalg.slogdet(np.eye(block) - projection @ M)
+                    for lm_id, sign_i, logdet_i in zip(part, sign, logdet):
+                        gains[lm_id] = float(-0.5 * logdet_i) if sign_i > 0 else np.inf
+
+        return gains
+
+    def gain(self, landmark_id):
+        """
+        Compute the gain of a single landmark with respect to the remaining landmarks.
+
+        Args:
+            landmark_id (int): Identifier of the landmark.
+
+        Returns:
+            float: The information gain in nats.
+        """
+        return self.gains([landmark_id])[landmark_id]
+
+    @profiled('info.remove')
+    def remove(self, landmark_id):
+        """
+        Remove a landmark, so that the next gains are computed without its factors.
+
+        Args:
+            landmark_id (int): Identifier of the landmark.
+        """
+        if self._observations.pop(landmark_id, None) is not None:
+            self._marginals = None
+
+
+def make_information_scorer(graph, values, method='exact', **options):
+    """
+    Create the scorer of a scoring method.
+
+    Args:
+        graph (NonlinearFactorGraph): The SLAM factor graph.
+        values (Values): The linearization point of the graph.
+        method (str): 'exact' for an InformationScorer, 'stochastic' for a StochasticInformationScorer.
+        **options: Keyword arguments of StochasticInformationScorer.
+
+    Returns:
+        InformationScorer or StochasticInformationScorer: The scorer.
+    """
+    _check_method(method)
+    if method == 'stochastic':
+        return StochasticInformationScorer(graph, values, **options)
+    if options:
+        raise ValueError(f"Unexpected options for exact scoring: {sorted(options)}.")
+    return InformationScorer(graph, values)
+
+
+def compute_information_gains(graph, values, landmark_ids=None, method='exact', **options):
+    """
+    Compute the information every landmark provides about the poses, from a single linearization.
+
+    Args:
+        graph (NonlinearFactorGraph): The SLAM factor graph.
+        values (Values): The linearization point of the graph.
+        landmark_ids (iterable of int): Landmarks to score, all landmarks in the graph if None.
+        method (str): 'exact' or 'stochastic', see make_information_scorer.
+        **options: Keyword arguments of StochasticInformationScorer.
+
+    Returns:
+        dict: Mapping from landmark identifier to its information gain in nats.
+    """
+    return make_information_scorer(graph, values, method, **options).gains(landmark_ids)
+
+
+@profiled('info.log_det')
+def log_det(X, g_theta, theta_star, method='exact', **options):
+    """
+    Compute the log-determinant of the joint marginal information of a set of variables.
+
+    Args:
+        X (list of int): Keys of the variables.
+        g_theta (NonlinearFactorGraph): The factor graph.
+        theta_star (Values): The linearization point of the graph.
+        method (str): 'exact', or 'stochastic' to estimate it with estimate_log_det, which also
+         reports a standard error.
+        **options: Keyword arguments of estimate_log_det, such as num_probes and time_budget.
+
+    Returns:
+        float: The log-determinant of the joint marginal information matrix.
+    """
+    _check_method(method)
+    if method == 'stochastic':
+        return estimate_log_det(X, g_theta, theta_star, **options).value
     try:
-        ordering = gtsam.Ordering()
-        for var in X:
-            ordering.push_back(var)
-        linearized_graph = g_theta.linearize(theta_star)
-        bayes_net, bayes_tree = linearized_graph.eliminatePartialSequential(ordering)
         marginals = gtsam.Marginals(g_theta, theta_star)
-        r_matrix = marginals.marginalCovariance(ordering.front())
-        log_det = -2 * np.sum(np.log(np.diag(r_matrix)))
+        information = marginals.jointMarginalInformation(gtsam.KeyVector(X)).fullMatrix()
+        _, log_det = np.linalg.slogdet(information)
         return log_det
     except Exception as e:
         print(f"Error computing marginal covariance: {e}")
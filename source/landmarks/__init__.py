@@ -3,5 +3,6 @@ This package provides classes for handling landmarks.
 """
 
 from .landmark import Landmark
+from .table import LandmarkTable
 
-__all__ = ['Landmark']
+__all__ = ['Landmark', 'LandmarkTable']
@@ -4,37 +4,66 @@ This module provides the Landmark class for representing landmarks with position
 
 # source/landmarks/landmark.py
 
-import numpy as np
 from gtsam import Pose3, Rot3
 
 class Landmark:
+    """
+    Landmark is a lightweight view of one row of a LandmarkTable.
+
+    A Landmark created directly owns a single-row table of its own.
+    """
+
+    __slots__ = ('_table', 'identifier')
+
     def __init__(self, position, covariance, identifier: int):
-        if not isinstance(position, Pose3):
-            self._position = Pose3(Rot3(), position.reshape((3, 1)))
-        else:
-            self._position = position
-        self._covariance = covariance
+        from source.landmarks.table import LandmarkTable
+
+        if isinstance(position, Pose3):
+            position = position.translation()
+        self._table = LandmarkTable(capacity=1)
+        self._table.add(identifier, position, covariance)
         self.identifier = identifier
 
+    @classmethod
+    def view(cls, table, identifier):
+        """
+        Create a view of a landmark stored in a table.
+
+        Args:
+            table (LandmarkTable): The table holding the landmark.
+            identifier (int): Identifier of the landmark.
+
+        Returns:
+            Landmark: The view.
+        """
+        landmark = cls.__new__(cls)
+        landmark._table = table
+        landmark.identifier = identifier
+        return landmark
+
+    @property
+    def mean(self):
+        """Get the position of the landmark as a (3,) view of its row."""
+        return self._table.positions[self._table.row(self.identifier)]
+
     @property
     def position(self):
-        return self._position
+        return Pose3(Rot3(), self.mean.reshape((3, 1)))
 
     @position.setter
     def position(self, value):
         if isinstance(value, Pose3):
-            self._position = value
-        else:
-            self._position = Pose3(Rot3(), value.reshape((3, 1)))
+            value = value.translation()
+        self._table.update(self.identifier, value)
 
     @property
     def covariance(self):
-        return self._covariance
+        return self._table.covariances[self._table.row(self.identifier)]
 
     @covariance.setter
     def covariance(self, value):
         if value.shape == (3, 3):
-            self._covariance = value
+            self._table.update(self.identifier, self.mean, value)
         else:
             raise ValueError("Covariance must be a 3x3 NumPy array.")
 
@@ -0,0 +1,247 @@
+"""
+This module provides the LandmarkTable class, a struct-of-arrays store of landmark positions and covariances.
+"""
+
+# source/landmarks/table.py
+
+import numpy as np
+
+from source.landmarks.landmark import Landmark
+
+
+# Determinant, relative to the cube of the largest entry, below which a 3x3 matrix is inverted with a pseudo-inverse
+_SINGULAR_DETERMINANT = 1e-12
+
+
+def _inv3(matrices):
+    """
+    Invert a batch of 3x3 matrices (N, 3, 3) with their adjugates, much faster than LAPACK at this size.
+
+    Singular and near-singular matrices, for which the adjugate formula loses all precision or
+    divides by zero, get their pseudo-inverse instead.
+    """
+    (a, b, c), (d, e, f), (g, h, i) = matrices.transpose(1, 2, 0)
+    adjugate = np.array([[e * i - f * h, c * h - b * i, b * f - c * e],
+                         [f * g - d * i, a * i - c * g, c * d - a * f],
+                         [d * h - e * g, b * g - a * h, a * e - b * d]])
+    determinant = a * adjugate[0, 0] + b * adjugate[1, 0] + c * adjugate[2, 0]
+    scale = np.abs(matrices).max(axis=(1, 2), initial=0.0) ** 3
+    singular = ~(np.abs(determinant) > _SINGULAR_DETERMINANT * scale)
+    if not singular.any():
+        return (adjugate / determinant).transpose(2, 0, 1)
+    inverses = np.empty_like(matrices, dtype=float)
+    regular = ~singular
+    inverses[regular] = (adjugate[:, :, regular] / determinant[regular]).transpose(2, 0, 1)
+    inverses[singular] = np.linalg.pinv(matrices[singular])
+    return inverses
+
+
+class LandmarkTable:
+    """
+    LandmarkTable stores landmark identifiers, positions and covariances in contiguous arrays.
+
+    Rows are addressed through an identifier-to-row index, removal swaps the last row into the
+    freed one, and the arrays grow geometrically, so adding and removing landmarks is O(1).
+    The table behaves like a dict from identifier to Landmark view.
+    """
+
+    def __init__(self, capacity=16):
+        """
+        Initialize an empty table.
+
+        Args:
+            capacity (int): Number of rows to preallocate.
+        """
+        capacity = max(int(capacity), 1)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._positions = np.empty((capacity, 3))
+        self._covariances = np.empty((capacity, 3, 3))
+        self._rows = {}
+        self._size = 0
+
+    @classmethod
+    def from_arrays(cls, identifiers, positions, covariances):
+        """
+        Create a table from arrays of landmarks.
+
+        Args:
+            identifiers (numpy.ndarray): Unique identifiers of the landmarks (N,).
+            positions (numpy.ndarray): Positions of the landmarks (N, 3).
+            covariances (numpy.ndarray): Covariances of the positions (N, 3, 3), or one (3, 3)
+             covariance shared by all landmarks.
+
+        Returns:
+            LandmarkTable: The table, with rows in the order of the arrays.
+        """
+        identifiers = np.asarray(identifiers, dtype=np.int64)
+        size = len(identifiers)
+        table = cls(capacity=size)
+        table._ids[:size] = identifiers
+        table._positions[:size] = positions
+        table._covariances[:size] = covariances
+        table._rows = dict(zip(identifiers.tolist(), range(size)))
+        if len(table._rows) != size:
+            raise ValueError("Landmark identifiers must be unique.")
+        table._size = size
+        return table
+
+    @property
+    def ids(self):
+        """Get the landmark identifiers, as a view ordered by row."""
+        return self._ids[:self._size]
+
+    @property
+    def positions(self):
+        """Get the landmark positions, as an (N, 3) view ordered by row."""
+        return self._positions[:self._size]
+
+    @property
+    def covariances(self):
+        """Get the landmark covariances, as an (N, 3, 3) view ordered by row."""
+        return self._covariances[:self._size]
+
+    def row(self, identifier):
+        """Get the row of a landmark."""
+        return self._rows[identifier]
+
+    def rows(self, identifiers):
+        """Get the rows of several landmarks as an index array."""
+        return np.fromiter((self._rows[identifier] for identifier in identifiers), dtype=np.int64)
+
+    def add(self, identifier, position, covariance):
+        """
+        Add a landmark, or overwrite it if the identifier is already in the table.
+
+        Args:
+            identifier (int): Unique identifier of the landmark.
+            position (numpy.ndarray): Position of the landmark (3,).
+            covariance (numpy.ndarray): Covariance of the position (3, 3).
+
+        Returns:
+            Landmark: A view of the landmark's row.
+        """
+        if identifier not in self._rows:
+            if self._size == len(self._ids):
+                self._grow(2 * len(self._ids))
+            self._rows[identifier] = self._size
+            self._ids[self._size] = identifier
+            self._size += 1
+        self.update(identifier, position, covariance)
+        return self[identifier]
+
+    def update(self, identifier, position, covariance=None):
+        """
+        Overwrite the position, and optionally the covariance, of a landmark.
+
+        Args:
+            identifier (int): Identifier of the landmark.
+            position (numpy.ndarray): New position of the landmark (3,).
+            covariance (numpy.ndarray): New covariance of the position (3, 3).
+        """
+        row = self._rows[identifier]
+        self._positions[row] = np.asarray(position, dtype=float).reshape(3)
+        if covariance is not None:
+            covariance = np.asarray(covariance, dtype=float)
+            if covariance.shape != (3, 3):
+                raise ValueError("Covariance must be a 3x3 NumPy array.")
+            self._covariances[row] = covariance
+
+    def contains(self, identifiers):
+        """Check which of several identifiers are in the table, as a boolean array."""
+        return np.fromiter((identifier in self._rows for identifier in identifiers), dtype=bool)
+
+    def fuse(self, identifiers, positions, covariances):
+        """
+        Fuse position observations into the landmarks, in information form.
+
+        Each landmark's stored position and covariance act as a prior, and every observation
+        adds its information: the new covariance is (P^-1 + sum R_i^-1)^-1 and the new position
+        is that covariance times (P^-1 x + sum R_i^-1 z_i). All observations are fused in one
+        batch of 3x3 inversions, and a landmark may be observed several times.
+
+        Args:
+            identifiers (numpy.ndarray): Identifiers of the observed landmarks (N,).
+            positions (numpy.ndarray): Observed positions in the world frame (N, 3).
+            covariances (numpy.ndarray): Covariances of the observed positions (N, 3, 3).
+        """
+        if len(identifiers) == 0:
+            return
+        rows, observation_rows = np.unique(self.rows(np.asarray(identifiers).tolist()), return_inverse=True)
+        observation_information = _inv3(covariances)
+
+        information = _inv3(self._covariances[rows])
+        information_vector = np.einsum('nij,nj->ni', information, self._positions[rows])
+        np.add.at(information, observation_rows, observation_information)
+        np.add.at(information_vector, observation_rows,
+                  np.einsum('nij,nj->ni', observation_information, positions))
+
+        covariance = _inv3(information)
+        self._covariances[rows] = 0.5 * (covariance + covariance.transpose(0, 2, 1))
+        self._positions[rows] = np.einsum('nij,nj->ni', covariance, information_vector)
+
+    def remove(self, identifier):
+        """
+        Remove a landmark by moving the last row into its place.
+
+        Args:
+            identifier (int): Identifier of the landmark.
+        """
+        row = self._rows.pop(identifier)
+        last = self._size - 1
+        if row != last:
+            moved = int(self._ids[last])
+            self._ids[row] = moved
+            self._positions[row] = self._positions[last]
+            self._covariances[row] = self._covariances[last]
+            self._rows[moved] = row
+        self._size = last
+
+    def get(self, identifier, default=None):
+        """Get a view of a landmark, or the default if it is not in the table."""
+        if identifier in self._rows:
+            return Landmark.view(self, identifier)
+        return default
+
+    def keys(self):
+        """Get the landmark identifiers."""
+        return self._rows.keys()
+
+    def values(self):
+        """Get views of all landmarks, ordered by row."""
+        return [Landmark.view(self, int(identifier)) for identifier in self.ids]
+
+    def items(self):
+        """Get (identifier, view) pairs of all landmarks, ordered by row."""
+        return [(int(identifier), Landmark.view(self, int(identifier))) for identifier in self.ids]
+
+    def copy(self):
+        """Get a deep copy of the table."""
+        table = LandmarkTable(capacity=self._size)
+        table._ids[:self._size] = self.ids
+        table._positions[:self._size] = self.positions
+        table._covariances[:self._size] = self.covariances
+        table._rows = dict(self._rows)
+        table._size = self._size
+        return table
+
+    def _grow(self, capacity):
+        self._ids = np.resize(self._ids, capacity)
+        self._positions = np.resize(self._positions, (capacity, 3))
+        self._covariances = np.resize(self._covariances, (capacity, 3, 3))
+
+    def __getitem__(self, identifier):
+        if identifier not in self._rows:
+            raise KeyError(identifier)
+        return Landmark.view(self, identifier)
+
+    def __delitem__(self, identifier):
+        self.remove(identifier)
+
+    def __contains__(self, identifier):
+        return identifier in self._rows
+
+    def __iter__(self):
+        return iter(list(self._rows))
+
+    def __len__(self):
+        return self._size
@@ -4,74 +4,37 @@ This script demonstrates how to use the SLAM system to estimate the trajectory o
 
 # source/main.py
 
-import os
 import numpy as np
-from gtsam import Pose3, Rot3
 
 from source.slam.slam import SLAM
-from source.landmarks.landmark import Landmark
+from source.scenarios.generator import ScenarioGenerator
 from source.run import run_slam
-from source.maps.visualization import MapVisualizer
 
-# Define paths to save results
-poses_dir = 'results/poses'
-metrics_dir = 'results/metrics'
-os.makedirs(poses_dir, exist_ok=True)
-os.makedirs(metrics_dir, exist_ok=True)
+# Path where the results of the run are saved, created when the run starts
+results_dir = 'results/run'
 
 
-def create_environment(num_landmarks, num_steps):
+def create_environment(num_landmarks, num_steps, seed=None, **scenario_options):
     """
     Create the environment with given number of landmarks and steps.
 
     Args:
         num_landmarks (int): Number of landmarks.
         num_steps (int): Number of steps.
+        seed (int): Seed of the scenario.
+        **scenario_options: Further options of the ScenarioGenerator, such as noise, density,
+         trajectory shape and sensor range.
 
     Returns:
         initial_pose (Pose3): Initial pose of the agent.
-        landmarks (list of Landmark): List of landmarks.
+        landmarks (LandmarkTable): Table of landmarks.
         control_inputs (numpy.ndarray): Control inputs for each step.
-        measurements (list): Measurements for each step.
-        ground_truth_poses (list of Pose3): Ground truth poses.
+        measurements (generator): Lazily generated measurements for each step.
+        ground_truth_poses (PoseSequence): Ground truth poses.
     """
-    initial_pose = Pose3(Rot3(), np.array([0, 0, 0]).reshape((3, 1)))
-
-    # Generate random landmarks
-    landmarks = [
-        {
-            'position': np.random.rand(3) * 10,
-            'covariance': np.eye(3) * 0.1,
-            'id': i
-        }
-        for i in range(num_landmarks)
-    ]
-
-    # Convert landmarks to Landmark objects
-    landmark_objs = [Landmark(Pose3(Rot3(), lm['position'].reshape((3, 1))), lm['covariance'], lm['id']) for lm in
-                     landmarks]
-
-    # Generate random control inputs and ground truth poses
-    control_inputs = np.random.rand(num_steps, 3) - 0.5
-    ground_truth_poses = [initial_pose]
-    for i in range(num_steps):
-        new_pose = ground_truth_poses[-1].compose(Pose3(Rot3(), control_inputs[i].reshape((3, 1))))
-        ground_truth_poses.append(new_pose)
-
-    # Generate measurements for each step
-    measurements = []
-    for step in range(num_steps):
-        measurement = []
-        for lm in landmark_objs:
-            observation = {
-                'mean': lm.position.translation().flatten(),
-                'covariance': lm.covariance,
-                'id': lm.identifier
-            }
-            measurement.append(observation)
-        measurements.append(measurement)
-
-    return initial_pose, landmark_objs, control_inputs, measurements, ground_truth_poses
+    scenario = ScenarioGenerator(num_landmarks, num_steps, seed=seed, **scenario_options)
+    return (scenario.initial_pose, scenario.landmarks(), scenario.control_inputs, scenario.measurements(),
+            scenario.ground_truth_poses)
 
 
 def plot_results(visualizer, landmarks, supposed_trajectory, slam_trajectory):
@@ -80,11 +43,11 @@ def plot_results(visualizer, landmarks, supposed_trajectory, slam_trajectory):
 
     Args:
         visualizer (MapVisualizer): Visualizer for plotting.
-        landmarks (list of Landmark): List of landmarks.
+        landmarks (LandmarkTable): Table of landmarks.
         supposed_trajectory (numpy.ndarray): Supposed trajectory from control inputs.
         slam_trajectory (numpy.ndarray): SLAM estimated trajectory.
     """
-    visualizer.update_landmarks(np.array([lm.position.translation().flatten() for lm in landmarks]))
+    visualizer.update_landmarks(landmarks.positions)
     visualizer.update_agent_position(supposed_trajectory[-1].flatten())
     visualizer.ax.plot(supposed_trajectory[:, 0], supposed_trajectory[:, 1], supposed_trajectory[:, 2], c='blue',
                        label='Supposed Trajectory')
@@ -105,8 +68,7 @@ def main():
     slam_system = SLAM(initial_pose, landmarks)
 
     # Run SLAM
-    results = run_slam(slam_system, control_inputs, measurements, ground_truth_poses, len(control_inputs), poses_dir,
-                       metrics_dir)
+    results = run_slam(slam_system, control_inputs, measurements, ground_truth_poses, len(control_inputs), results_dir)
 
     # Extract supposed trajectory and SLAM trajectory
     supposed_trajectory = np.cumsum(control_inputs, axis=0)
@@ -114,11 +76,12 @@ def main():
 
     slam_trajectory = np.array([pose.translation().flatten() for pose in slam_system.poses])
 
-    # Initialize visualizer
+    # Initialize visualizer, importing matplotlib only now that there is something to draw
+    from source.maps.visualization import MapVisualizer
     visualizer = MapVisualizer(plot_3d=False)
 
     # Plot results
-    plot_results(visualizer, landmarks, supposed_trajectory, slam_trajectory)
+    plot_results(visualizer, slam_system.landmarks, supposed_trajectory, slam_trajectory)
 
 
 if __name__ == '__main__':
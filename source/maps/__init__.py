@@ -3,6 +3,13 @@ This package provides classes for handling maps and visualizing them.
 """
 
 from .map import Map
-from .visualization import MapVisualizer
 
 __all__ = ['Map', 'MapVisualizer']
+
+
+def __getattr__(name):
+    # The visualizer pulls in matplotlib, so it is imported on first use
+    if name == 'MapVisualizer':
+        from .visualization import MapVisualizer
+        return MapVisualizer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,50 +4,72 @@ This module provides the Map class for managing the spatial relationships
 """
 
 from source.landmarks.landmark import Landmark
+from source.landmarks.table import LandmarkTable
 import numpy as np
 
 class Map:
     """
-    Map manages the spatial relationships between an agent and multiple landmarks.
+    Map manages the spatial relationships between one or more agents and multiple landmarks.
+
+    The landmarks are shared by all agents. The first agent is also available as agent.
     """
-    def __init__(self, agent):
+    def __init__(self, agent, *other_agents):
         """
-        Initialize the map with a single agent.
+        Initialize the map with its agents.
 
         Args:
-            agent (Agent): The single agent to be managed by the map.
+            agent (Agent): The first agent to be managed by the map.
+            *other_agents (Agent): Further agents sharing the landmarks.
+        """
+        self.agents = [agent, *other_agents]
+        self.landmarks = LandmarkTable()
+
+    @property
+    def agent(self):
+        """Get the first agent."""
+        return self.agents[0]
+
+    def add_agent(self, agent):
+        """
+        Add an agent to the map.
+
+        Args:
+            agent (Agent): The agent.
+
+        Returns:
+            int: The index of the agent.
         """
-        self.agent = agent
-        self.landmarks = {}
+        self.agents.append(agent)
+        return len(self.agents) - 1
 
     def add_landmark(self, landmark_id, landmark):
         """
         Add a landmark to the map.
 
         Args:
-            landmark_id (str): Unique identifier for the landmark.
+            landmark_id (int): Unique identifier for the landmark.
             landmark (Landmark): The landmark object to be added.
         """
         if not isinstance(landmark, Landmark):
             raise ValueError("Only Landmark instances can be added.")
-        self.landmarks[landmark_id] = landmark
+        self.landmarks.add(landmark_id, landmark.mean, landmark.covariance)
 
     def remove_landmark(self, landmark_id):
         """
         Remove a landmark from the map by its identifier.
 
         Args:
-            landmark_id (str): The identifier of the landmark to remove.
+            landmark_id (int): The identifier of the landmark to remove.
         """
         if landmark_id in self.landmarks:
-            del self.landmarks[landmark_id]
+            self.landmarks.remove(landmark_id)
 
     def update_landmark(self, landmark_id, position_mean, position_covariance):
         """
         Update the position of a landmark.
 
         Args:
-            landmark_id (str): The identifier of the landmark.
+            landmark_id (int): The identifier of the landmark.
             position_mean (numpy.ndarray):
              The new mean position of the landmark.
 
@@ -55,23 +77,20 @@ class Map:
              The new covariance matrix of the landmark's position.
         """
         if landmark_id in self.landmarks:
-            landmark = self.landmarks[landmark_id]
-            landmark.update_position(position_mean, position_covariance)
+            self.landmarks.update(landmark_id, position_mean, position_covariance)
         else:
-            self.add_landmark(landmark_id,
-                              Landmark(landmark_id,
-                                       position_mean,
-                                       position_covariance))
+            self.landmarks.add(landmark_id, position_mean, position_covariance)
 
-    def update_agent_position(self, delta_position, position_covariance):
+    def update_agent_position(self, delta_position, position_covariance, agent_index=0):
         """
-        Update the position of the agent based on a change and new covariance.
+        Update the position of an agent based on a change and new covariance.
 
         Args:
             delta_position (numpy.ndarray): The change in position (x, y, z).
             position_covariance (numpy.ndarray): The new covariance matrix of the agent's position.
+            agent_index (int): Index of the agent.
         """
-        self.agent.move_agent(delta_position, position_covariance)
+        self.agents[agent_index].move_agent(delta_position, position_covariance)
 
     def get_landmark(self, landmark_id):
         """
@@ -4,43 +4,265 @@ Utilizes matplotlib for visualization.
 """
 # source/maps/visualization.py
 
+import os
+import time
+
 import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+def aggregate_points(positions, max_points):
+    """
+    Reduce a point cloud to at most max_points points by averaging the points of a uniform grid.
+
+    The cell size starts at the size giving max_points cells over the extent of the points and
+    grows until few enough cells are occupied.
+
+    Args:
+        positions (numpy.ndarray): The points (N, D).
+        max_points (int): Maximum number of points to return.
+
+    Returns:
+        tuple: The centroids of the occupied cells (M, D) and the number of points in each (M,),
+         or the points themselves and ones if there are at most max_points of them.
+    """
+    positions = np.asarray(positions, dtype=float)
+    if len(positions) <= max_points:
+        return positions, np.ones(len(positions), dtype=np.int64)
+
+    origin = positions.min(axis=0)
+    extent = max(float(np.ptp(positions, axis=0).max()), 1e-12)
+    cell_size = extent / max_points ** (1.0 / positions.shape[1])
+    while True:
+        cells = np.floor((positions - origin) / cell_size).astype(np.int64)
+        _, inverse, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+        if len(counts) <= max_points:
+            break
+        cell_size *= 1.5
+    inverse = inverse.reshape(-1)
+    centroids = np.stack([np.bincount(inverse, weights=positions[:, d], minlength=len(counts))
+                          for d in range(positions.shape[1])], axis=1) / counts[:, None]
+    return centroids, counts
+
 
 class MapVisualizer:
-    def __init__(self, plot_3d=True):
+    """
+    MapVisualizer draws the landmarks, the agent and its trajectory, live on screen or into image files.
+
+    The artists are created once and updated in place. In live mode, the static part of the figure
+    is cached and each frame only redraws the artists onto it (blitting); a full redraw happens
+    only when the data leave the axes limits or the window changes. Beyond max_points, landmarks
+    are replaced by the centroids of the occupied cells of a grid and the trajectory is decimated.
+    All artists are lines of uniform markers, which Agg draws far faster than scatters of varying
+    sizes. Frames requested less than min_interval seconds after the previous one are skipped, so
+    a viewer fed every SLAM step does not slow the run down.
+
+    With output_dir, the figure is rendered off-screen with the Agg canvas and every frame is
+    written to output_dir/frame_000000.png, ..., so no display is needed.
+    """
+
+    def __init__(self, plot_3d=True, max_points=5000, min_interval=0.0, blit=True, output_dir=None, dpi=100):
+        """
+        Create the figure and its artists.
+
+        Args:
+            plot_3d (bool): Whether to draw in 3D, otherwise the x-y plane is drawn.
+            max_points (int): Maximum number of landmarks and of trajectory points drawn.
+            min_interval (float): Minimum time between two frames in seconds.
+            blit (bool): Whether to blit the artists in live mode.
+            output_dir (str): Directory of the rendered frames, or None for a live window.
+            dpi (int): Resolution of the rendered frames.
+        """
         self.plot_3d = plot_3d
-        self.fig = plt.figure()
+        self.max_points = max_points
+        self.min_interval = min_interval
+        self.output_dir = output_dir
+        self.dpi = dpi
+        self.num_frames = 0
+
+        if output_dir is None:
+            self.fig = plt.figure()
+        else:
+            os.makedirs(output_dir, exist_ok=True)
+            self.fig = Figure()
+            FigureCanvasAgg(self.fig)
+        self.blit = blit and output_dir is None and self.fig.canvas.supports_blit
         if self.plot_3d:
             self.ax = self.fig.add_subplot(111, projection='3d')
         else:
             self.ax = self.fig.add_subplot(111)
 
-        self.landmarks = None
-        self.agent = None
+        empty = [[] for _ in range(3 if plot_3d else 2)]
+        (self.landmarks,) = self.ax.plot(*empty, 'o', c='red', markersize=4, linestyle='', label='Landmarks',
+                                         animated=self.blit)
+        (self.trajectory,) = self.ax.plot(*empty, c='blue', label='Trajectory', animated=self.blit)
+        (self.agent,) = self.ax.plot(*empty, 'o', c='green', label='Agent', animated=self.blit)
+        self.ax.legend(loc='upper right')
+
+        self._trajectory = np.empty((1024, 3))
+        self._trajectory_length = 0
+        self._bounds = None
+        self._limits_changed = True
+        self._background = None
+        self._shown = False
+        self._last_frame = -np.inf
+        if self.blit:
+            self.fig.canvas.mpl_connect('draw_event', self._on_draw)
 
     def update_landmarks(self, positions):
-        if self.landmarks:
-            self.landmarks.remove()
-        if self.plot_3d:
-            self.landmarks = self.ax.scatter(positions[:, 0], positions[:, 1], positions[:, 2], c='red', label='Landmarks')
-        else:
-            self.landmarks = self.ax.scatter(positions[:, 0], positions[:, 1], c='red', label='Landmarks')
-        self.ax.legend()
+        """
+        Set the landmark positions (N, 3).
+
+        Args:
+            positions (numpy.ndarray): Positions of the landmarks.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        dims = 3 if self.plot_3d else 2
+        points, _ = aggregate_points(positions[:, :dims], self.max_points)
+        self._set_line(self.landmarks, points)
+        self._include(positions)
 
     def update_agent_position(self, position):
-        if self.agent:
-            self.agent.remove()
-        position = position.reshape((3,))
+        """
+        Set the position of the agent (3,).
+
+        Args:
+            position (numpy.ndarray): Position of the agent.
+        """
+        position = np.asarray(position, dtype=float).reshape(3)
+        self._set_line(self.agent, position.reshape(1, 3))
+        self._include(position.reshape(1, 3))
+
+    def update_trajectory(self, positions):
+        """
+        Set the trajectory of the agent (N, 3), decimated to max_points points.
+
+        Args:
+            positions (numpy.ndarray): Positions of the poses, in order.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        stride = max(1, -(-len(positions) // self.max_points))
+        if stride > 1:
+            positions = np.concatenate((positions[:-1:stride], positions[-1:]))
+        self._set_line(self.trajectory, positions)
+        self._include(positions)
+
+    def update_from_slam(self, slam_system, every=1):
+        """
+        Draw the current state of a SLAM system, e.g. as the callback of run_slam.
+
+        The agent position is appended to the drawn trajectory at each call, so the trajectory
+        is the history of the estimates rather than the smoothed poses.
+
+        Args:
+            slam_system (SLAM): The SLAM system.
+            every (int): Draw only every n-th call, e.g. to record one frame per n steps.
+
+        Returns:
+            bool: Whether a frame was drawn.
+        """
+        position = np.asarray(slam_system.agent.position.translation(), dtype=float).reshape(3)
+        if self._trajectory_length == len(self._trajectory):
+            self._trajectory = np.resize(self._trajectory, (2 * len(self._trajectory), 3))
+        self._trajectory[self._trajectory_length] = position
+        self._trajectory_length += 1
+        if (self._trajectory_length - 1) % every or not self._frame_due():
+            return False
+        self.update_landmarks(slam_system.landmarks.positions)
+        self.update_trajectory(self._trajectory[:self._trajectory_length])
+        self.update_agent_position(position)
+        return self.update()
+
+    def run(self):
+        """Show the figure and block until it is closed, or write the final frame in off-screen mode."""
+        if self.output_dir is None:
+            self._apply_limits()
+            plt.show()
+        else:
+            self.update(force=True)
+
+    def update(self, force=False):
+        """
+        Draw a frame, unless the previous one was drawn less than min_interval seconds ago.
+
+        Args:
+            force (bool): Whether to draw regardless of min_interval.
+
+        Returns:
+            bool: Whether a frame was drawn.
+        """
+        if not force and not self._frame_due():
+            return False
+        self._last_frame = time.perf_counter()
+        self._apply_limits()
+
+        canvas = self.fig.canvas
+        if self.output_dir is not None:
+            self.fig.savefig(os.path.join(self.output_dir, f'frame_{self.num_frames:06d}.png'), dpi=self.dpi)
+        elif not self.blit:
+            canvas.draw_idle()
+            canvas.flush_events()
+            self._show()
+        else:
+            self._show()
+            if self._background is None:
+                # The draw event caches the background and blits the artists
+                canvas.draw()
+            else:
+                canvas.restore_region(self._background)
+                self._draw_artists()
+                canvas.blit(self.fig.bbox)
+            canvas.flush_events()
+        self.num_frames += 1
+        return True
+
+    def _frame_due(self):
+        return time.perf_counter() - self._last_frame >= self.min_interval
+
+    def _show(self):
+        if not self._shown:
+            plt.show(block=False)
+            self._shown = True
+
+    def _set_line(self, line, positions):
         if self.plot_3d:
-            self.agent = self.ax.scatter(position[0], position[1], position[2], c='green', label='Agent')
+            line.set_data_3d(positions[:, 0], positions[:, 1], positions[:, 2])
         else:
-            self.agent = self.ax.scatter(position[0], position[1], c='green', label='Agent')
-        self.ax.legend()
+            line.set_data(positions[:, 0], positions[:, 1])
 
-    def run(self):
-        plt.show()
+    def _include(self, positions):
+        """Grow the bounds of the drawn data, and the axes limits with a margin if the data leave them."""
+        if len(positions) == 0:
+            return
+        low, high = positions.min(axis=0), positions.max(axis=0)
+        if self._bounds is not None and np.all(low >= self._bounds[0]) and np.all(high <= self._bounds[1]):
+            return
+        if self._bounds is not None:
+            low, high = np.minimum(low, self._bounds[0]), np.maximum(high, self._bounds[1])
+        # Leave room to grow, so that the limits and the cached background rarely change
+        margin = 0.1 * np.maximum(high - low, 1.0)
+        self._bounds = (low - margin, high + margin)
+        self._limits_changed = True
+
+    def _apply_limits(self):
+        if not self._limits_changed or self._bounds is None:
+            return
+        low, high = self._bounds
+        self.ax.set_xlim(low[0], high[0])
+        self.ax.set_ylim(low[1], high[1])
+        if self.plot_3d:
+            self.ax.set_zlim(low[2], high[2])
+        self._limits_changed = False
+        self._background = None
+
+    def _draw_artists(self):
+        for artist in (self.landmarks, self.trajectory, self.agent):
+            self.ax.draw_artist(artist)
 
-    def update(self):
-        plt.draw()
-        plt.pause(0.01)
+    def _on_draw(self, event):
+        canvas = self.fig.canvas
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
+        canvas.blit(self.fig.bbox)
@@ -6,51 +6,115 @@ from gtsam import Pose3, Rot3
 
 # source/run.py
 
-import os
+from itertools import islice
+
 import numpy as np
-from source.info_theoretic.evals import compute_ate, compute_are, compute_ud
+from source.info_theoretic.evals import MetricAccumulator
+from source.slam.utils import pose_key
+from source.utils.profiling import phase, profiled
+from source.utils.results_store import ResultsStore
+
+@profiled('run_slam')
+def run_slam(slam_system, control_inputs, measurements, ground_truth_poses, num_steps, results_dir,
+             final_recompute=False, reference_covariances=None, callback=None, resume=False):
+    """
+    Run the SLAM system and track the ATE, ARE and UD of the trajectory after every step.
+
+    The metrics are accumulated incrementally from the pose added by each step. With
+    final_recompute, the whole trajectory is refreshed from the solver at the end and the
+    metrics are recomputed exactly, into 'final_ate' and 'final_are'.
+
+    The UD compares the position covariance of the latest pose, read from the SLAM covariance
+    service, with reference_covariances[pose_index], e.g. from a run without landmark removal.
+    Without references, the UD is the determinant of the position covariance itself.
 
-def run_slam(slam_system, control_inputs, measurements, ground_truth_poses, num_steps, poses_dir, metrics_dir):
+    Control inputs and measurements can be any iterables, such as the lazy measurements of a
+    ScenarioGenerator. The metrics of every step and the positions of the new poses are
+    appended to a ResultsStore in results_dir, which can be reopened with ResultsStore.open.
+
+    The callback, if any, is called with the SLAM system after every step, e.g. the
+    update_from_slam method of a MapVisualizer to watch the run.
+
+    With resume, slam_system is a system restored from a checkpoint, e.g. by restore_slam, and
+    the run continues from its step: the steps of the results store recorded after the
+    checkpoint are dropped, the metrics are rebuilt from the restored trajectory, and the
+    control inputs and measurements of the steps already performed are skipped. With a
+    Checkpointer attached, the results store is flushed at every checkpoint so that both stay
+    consistent on disk.
+    """
     results = {'landmarks_removed': [], 'ate_values': [], 'are_values': [], 'ud_values': []}
+    metrics = MetricAccumulator()
+    if resume:
+        store = ResultsStore(results_dir, mode='a')
+        if store.num_steps < slam_system.step_count:
+            store.close()
+            raise ValueError(f"The results in {results_dir} end before step {slam_system.step_count}.")
+        store.truncate(slam_system.step_count)
+        for name, values in store.as_results().items():
+            results[name] = values.tolist()
+        estimated_poses = slam_system.poses
+        metrics.recompute(estimated_poses, ground_truth_poses[:len(estimated_poses)])
+        if results['ud_values']:
+            metrics.ud = results['ud_values'][-1]
+    else:
+        metrics.update(0, slam_system.poses[0], ground_truth_poses[0])
+        store = ResultsStore(results_dir)
 
-    for step in range(num_steps):
-        control_input = control_inputs[step]
-        measurement = measurements[step]
+    try:
+        _run_steps(slam_system, control_inputs, measurements, ground_truth_poses, num_steps, results, metrics, store,
+                   reference_covariances, callback, resume)
 
-        try:
-            slam_system.perform_slam_step(control_input, measurement)
+        if final_recompute:
+            slam_system.refresh_poses()
             estimated_poses = slam_system.poses
-            ground_truth_subset = ground_truth_poses[:len(estimated_poses)]
+            results['final_ate'], results['final_are'] = metrics.recompute(
+                estimated_poses, ground_truth_poses[:len(estimated_poses)])
+            store.attributes['final_ate'] = results['final_ate']
+            store.attributes['final_are'] = results['final_are']
+    finally:
+        store.close()
 
-            # print(f"Step {step}: Estimated poses shape: ({len(estimated_poses)},), Ground truth poses shape: ({len(ground_truth_subset)}, 3)")
+    return results
 
-            # Extract translation components for metric computation
-            estimated_positions = np.array([pose.translation() for pose in estimated_poses])
-            ground_truth_positions = np.array([pose.translation() for pose in ground_truth_subset])
 
-            # print(f"Step {step}: Estimated positions shape: {estimated_positions.shape}, Ground truth positions shape: {ground_truth_positions.shape}")
+def _run_steps(slam_system, control_inputs, measurements, ground_truth_poses, num_steps, results, metrics, store,
+               reference_covariances, callback, resume):
+    # Measurements may be a lazy generator, so they are consumed in step order
+    start_step = slam_system.step_count if resume else 0
+    for control_input, measurement in islice(zip(control_inputs, measurements), start_step, num_steps):
+        try:
+            slam_system.perform_slam_step(control_input, measurement)
+            estimated_poses = slam_system.poses
+            pose_index = len(estimated_poses) - 1
 
-            # Ensure the shapes are correct
-            if estimated_positions.shape == ground_truth_positions.shape:
-                # Compute metrics
-                ate = compute_ate(estimated_positions, ground_truth_positions)
-                are = compute_are(
-                    np.array([pose.rotation().rpy() for pose in estimated_poses]),  # using rpy() instead of xyz()
-                    np.array([pose.rotation().rpy() for pose in ground_truth_subset])
-                )
-                ud = compute_ud(np.eye(3), np.eye(3))  # Dummy covariances for example
+            # Ensure there is a ground truth pose for the new estimate
+            if pose_index < len(ground_truth_poses):
+                # Accumulate metrics from the new pose only
+                with phase('run_slam.metrics'):
+                    metrics.update(pose_index, estimated_poses[pose_index], ground_truth_poses[pose_index])
+                    reference = (np.zeros((3, 3)) if reference_covariances is None
+                                 else reference_covariances[pose_index])
+                    metrics.update_ud(slam_system.covariances.position_covariance(pose_key(pose_index)), reference)
+                    ate, are, ud = metrics.ate, metrics.are, metrics.ud
 
-                results['landmarks_removed'].append(0)  # Placeholder value
+                # Landmarks removed so far, e.g. by an attached RemovalScheduler
+                removed = slam_system.num_removed_landmarks
+                results['landmarks_removed'].append(removed)
                 results['ate_values'].append(ate)
                 results['are_values'].append(are)
                 results['ud_values'].append(ud)
 
-                # Save poses and metrics to files
-                np.save(os.path.join(poses_dir, f'estimated_poses_step_{step}.npy'), estimated_positions)
-                np.save(os.path.join(metrics_dir, f'metrics_step_{step}.npy'), [ate, are, ud])
+                # Store the metrics and the positions of the poses added since the last step
+                with phase('run_slam.store'):
+                    new_positions = [pose.translation() for pose in estimated_poses[store.num_poses:]]
+                    store.append([removed, ate, are, ud], new_positions)
+                    checkpointer = slam_system.checkpointer
+                    if checkpointer is not None and checkpointer.last_step == slam_system.step_count:
+                        store.flush()
+
+                if callback is not None:
+                    callback(slam_system)
             else:
                 print(f"Error computing metrics: Estimated and ground truth positions must have the same shape.")
         except Exception as e:
             print(f"Error during SLAM step: {e}")
-
-    return results
@@ -0,0 +1,7 @@
+"""
+This package provides generators of simulated SLAM scenarios.
+"""
+
+from .generator import ScenarioGenerator, PoseSequence, TRAJECTORIES, multi_agent_scenarios
+
+__all__ = ['ScenarioGenerator', 'PoseSequence', 'TRAJECTORIES', 'multi_agent_scenarios']
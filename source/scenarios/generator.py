@@ -0,0 +1,300 @@
+"""
+This module provides the ScenarioGenerator class, a seeded generator of SLAM scenarios backed by NumPy arrays.
+"""
+
+# source/scenarios/generator.py
+
+import numpy as np
+from gtsam import Pose3, Rot3
+
+from source.landmarks.table import LandmarkTable
+from source.slam.measurements import empty_measurements
+
+# Upper bound on the number of step-landmark pairs tested for visibility at once (32 MB of float64)
+_CHUNK_ELEMENTS = 2 ** 22
+
+TRAJECTORIES = ('random_walk', 'circle', 'figure_eight')
+
+# Offsets of a grid cell and its 26 neighbours
+_NEIGHBOUR_OFFSETS = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij'), axis=-1).reshape(-1, 3)
+
+
+class PoseSequence:
+    """
+    PoseSequence exposes an (N, 3) array of positions as a read-only sequence of Pose3.
+
+    Poses are created on access, so only the positions are held in memory.
+    """
+
+    def __init__(self, positions):
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PoseSequence(self.positions[index])
+        return Pose3(Rot3(), self.positions[index].reshape((3, 1)))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class ScenarioGenerator:
+    """
+    ScenarioGenerator produces a trajectory, a landmark field and per-step measurements.
+
+    The trajectory and the landmarks are generated once as NumPy arrays. Measurements are yielded
+    lazily, one step at a time, and visibility is tested for blocks of steps at once against a
+    uniform grid of landmarks with cells the size of the sensor range. Memory is linear in the
+    number of steps and landmarks, and independent of the number of visible pairs.
+
+    Random draws come from independent streams derived from the seed, so the same seed yields the
+    same scenario however the measurements are consumed.
+    """
+
+    def __init__(self, num_landmarks=10, num_steps=100, seed=None, trajectory='random_walk', step_size=0.5,
+                 density=None, margin=1.0, sensor_range=np.inf, field_of_view=2 * np.pi,
+                 landmark_variance=0.1, measurement_noise=0.0, odometry_noise=0.0):
+        """
+        Generate the trajectory and the landmarks of a scenario.
+
+        Args:
+            num_landmarks (int): Number of landmarks, ignored if density is given.
+            num_steps (int): Number of steps.
+            seed (int): Seed of the random streams.
+            trajectory (str): Trajectory shape, one of TRAJECTORIES.
+            step_size (float): Length scale of one step.
+            density (float): Number of landmarks per unit volume of the landmark field.
+            margin (float): Padding between the trajectory's bounding box and the landmark field.
+            sensor_range (float): Maximum distance at which landmarks are observed.
+            field_of_view (float): Full angle of the sensor cone around the direction of motion, in radians.
+            landmark_variance (float): Variance of the landmark priors.
+            measurement_noise (float): Standard deviation of the noise added to the measurements.
+            odometry_noise (float): Standard deviation of the noise added to the control inputs.
+        """
+        if trajectory not in TRAJECTORIES:
+            raise ValueError(f"Unknown trajectory '{trajectory}', expected one of {TRAJECTORIES}.")
+        self.num_steps = num_steps
+        self.sensor_range = sensor_range
+        self.field_of_view = field_of_view
+        self.landmark_variance = landmark_variance
+        self.measurement_noise = measurement_noise
+
+        trajectory_seed, landmark_seed, odometry_seed, self._measurement_seed = (
+            np.random.SeedSequence(seed).spawn(4))
+
+        # Ground truth positions of the num_steps + 1 poses and the true motions between them
+        self.positions = _make_trajectory(trajectory, num_steps, step_size, np.random.default_rng(trajectory_seed))
+        self.motions = np.diff(self.positions, axis=0)
+        self.control_inputs = self.motions + odometry_noise * np.random.default_rng(odometry_seed).standard_normal(
+            self.motions.shape)
+
+        # Uniform landmark field around the trajectory
+        low = self.positions.min(axis=0) - margin
+        high = self.positions.max(axis=0) + margin
+        if density is not None:
+            num_landmarks = int(round(density * np.prod(high - low)))
+        self.set_landmarks(np.random.default_rng(landmark_seed).uniform(low, high, size=(num_landmarks, 3)))
+
+    def set_landmarks(self, positions):
+        """
+        Replace the landmark field, e.g. with one shared by several agents.
+
+        Args:
+            positions (numpy.ndarray): Ground truth positions of the landmarks (N, 3).
+        """
+        self.landmark_positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        self._grid = _LandmarkGrid(self.landmark_positions, self.sensor_range)
+
+    @property
+    def num_landmarks(self):
+        """Get the number of landmarks."""
+        return len(self.landmark_positions)
+
+    @property
+    def initial_pose(self):
+        """Get the initial pose of the agent."""
+        return Pose3(Rot3(), self.positions[0].reshape((3, 1)))
+
+    @property
+    def ground_truth_poses(self):
+        """Get the ground truth poses as a sequence of Pose3."""
+        return PoseSequence(self.positions)
+
+    def landmarks(self):
+        """
+        Get the landmark priors.
+
+        Returns:
+            LandmarkTable: Table of the landmarks, with identifiers 0..num_landmarks - 1.
+        """
+        return LandmarkTable.from_arrays(np.arange(self.num_landmarks), self.landmark_positions,
+                                         np.eye(3) * self.landmark_variance)
+
+    def visible_landmarks(self, start, stop):
+        """
+        Find the landmarks visible from the poses reached by a block of steps.
+
+        Args:
+            start (int): First step of the block.
+            stop (int): End of the block, exclusive.
+
+        Returns:
+            tuple: The block-relative step (M,) and the landmark identifier (M,) of every visible
+             pair, sorted by step.
+        """
+        positions = self.positions[start + 1:stop + 1]
+        steps, landmark_ids = self._grid.candidates(positions)
+        offsets = self.landmark_positions[landmark_ids] - positions[steps]
+        distances = np.linalg.norm(offsets, axis=1)
+        visible = distances <= self.sensor_range
+
+        if self.field_of_view < 2 * np.pi:
+            headings = self.motions[start:stop][steps]
+            speeds = np.linalg.norm(headings, axis=1)
+            cosines = np.einsum('ij,ij->i', offsets, headings)
+            # Without motion there is no heading and every landmark in range is visible
+            visible &= (speeds == 0) | (cosines >= np.cos(self.field_of_view / 2) * distances * speeds)
+        return steps[visible], landmark_ids[visible]
+
+    def measurements(self):
+        """
+        Yield the measurements of every step.
+
+        Yields:
+            numpy.ndarray: For each step, the landmarks observed from the pose it reaches, packed as
+             a structured array of MEASUREMENT_DTYPE with the landmark id ('id'), its position in the
+             agent frame ('mean') and the covariance ('covariance').
+        """
+        rng = np.random.default_rng(self._measurement_seed)
+        covariance = np.eye(3) * (self.landmark_variance + self.measurement_noise ** 2)
+        block = max(1, _CHUNK_ELEMENTS // max(self._grid.max_candidates, 1))
+        for start in range(0, self.num_steps, block):
+            stop = min(start + block, self.num_steps)
+            steps, landmark_ids = self.visible_landmarks(start, stop)
+            # Poses keep the identity rotation, so the agent frame is a translation of the world frame
+            means = self.landmark_positions[landmark_ids] - self.positions[start + 1 + steps]
+            if self.measurement_noise:
+                means += self.measurement_noise * rng.standard_normal(means.shape)
+            bounds = np.searchsorted(steps, np.arange(stop - start + 1))
+            for step in range(stop - start):
+                first, last = bounds[step], bounds[step + 1]
+                batch = empty_measurements(last - first)
+                batch['id'] = landmark_ids[first:last]
+                batch['mean'] = means[first:last]
+                batch['covariance'] = covariance
+                yield batch
+
+    def __iter__(self):
+        """Iterate over (control input, measurements) pairs of every step."""
+        return zip(self.control_inputs, self.measurements())
+
+
+def multi_agent_scenarios(num_agents, num_landmarks=10, num_steps=100, seed=None, density=None, margin=1.0,
+                          **options):
+    """
+    Generate scenarios of several agents moving through one shared landmark field.
+
+    Each agent gets its own trajectory, odometry and measurement streams, derived from the seed
+    and its index, and the landmark field covers the trajectories of all agents.
+
+    Args:
+        num_agents (int): Number of agents.
+        num_landmarks (int): Number of landmarks, ignored if density is given.
+        num_steps (int): Number of steps of every agent.
+        seed (int): Seed of the random streams.
+        density (float): Number of landmarks per unit volume of the landmark field.
+        margin (float): Padding between the trajectories' bounding box and the landmark field.
+        **options: Further options of ScenarioGenerator, such as trajectory, sensor_range and noise.
+
+    Returns:
+        list of ScenarioGenerator: One scenario per agent; their landmarks() are the same table.
+    """
+    # Agent i is seeded with [seed, i] and the shared field with [seed, num_agents]
+    seeds = [None if seed is None else [seed, index] for index in range(num_agents + 1)]
+    scenarios = [ScenarioGenerator(num_landmarks, num_steps, seed=seeds[index], margin=margin, **options)
+                 for index in range(num_agents)]
+
+    positions = np.concatenate([scenario.positions for scenario in scenarios])
+    low = positions.min(axis=0) - margin
+    high = positions.max(axis=0) + margin
+    if density is not None:
+        num_landmarks = int(round(density * np.prod(high - low)))
+    field = np.random.default_rng(seeds[-1]).uniform(low, high, size=(num_landmarks, 3))
+    for scenario in scenarios:
+        scenario.set_landmarks(field)
+    return scenarios
+
+
+class _LandmarkGrid:
+    """
+    Uniform grid over the landmarks with cells of the sensor range, stored as a sorted cell index.
+    """
+
+    def __init__(self, positions, cell_size):
+        self._num_landmarks = len(positions)
+        self._bounded = np.isfinite(cell_size) and len(positions) > 0
+        if not self._bounded:
+            self.max_candidates = self._num_landmarks
+            return
+
+        self._origin = positions.min(axis=0)
+        cells = np.floor((positions - self._origin) / cell_size).astype(np.int64)
+        self._cell_size = cell_size
+        self._shape = cells.max(axis=0) + 1
+        keys = np.ravel_multi_index(cells.T, self._shape)
+        self._order = np.argsort(keys, kind='stable')
+        self._keys, self._starts, counts = np.unique(keys[self._order], return_index=True, return_counts=True)
+        self._ends = self._starts + counts
+        self.max_candidates = int(min(self._num_landmarks, 27 * counts.max()))
+
+    def candidates(self, positions):
+        """
+        Get the landmarks in the cells around each position.
+
+        Args:
+            positions (numpy.ndarray): Query positions (P, 3).
+
+        Returns:
+            tuple: The query index (M,) and the landmark identifier (M,) of every candidate pair,
+             sorted by query.
+        """
+        if not self._bounded:
+            return (np.repeat(np.arange(len(positions)), self._num_landmarks),
+                    np.tile(np.arange(self._num_landmarks), len(positions)))
+
+        cells = np.floor((positions - self._origin) / self._cell_size).astype(np.int64)
+        neighbours = (cells[:, None, :] + _NEIGHBOUR_OFFSETS).reshape(-1, 3)
+        inside = np.all((neighbours >= 0) & (neighbours < self._shape), axis=1)
+        queries = np.repeat(np.arange(len(positions)), len(_NEIGHBOUR_OFFSETS))[inside]
+        keys = np.ravel_multi_index(neighbours[inside].T, self._shape)
+
+        slots = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        found = self._keys[slots] == keys
+        queries, slots = queries[found], slots[found]
+        starts, lengths = self._starts[slots], self._ends[slots] - self._starts[slots]
+
+        # Expand the ragged cell ranges into one entry per candidate
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return np.repeat(queries, lengths), self._order[gather]
+
+
+def _make_trajectory(shape, num_steps, step_size, rng):
+    """Get the (num_steps + 1, 3) positions of a trajectory starting at the origin."""
+    if shape == 'random_walk':
+        motions = (rng.random((num_steps, 3)) - 0.5) * 2 * step_size
+    else:
+        # Closed curves in the xy plane, traversed once with a step length close to step_size
+        angles = np.linspace(0.0, 2 * np.pi, num_steps + 1)
+        radius = step_size * max(num_steps, 1) / (2 * np.pi)
+        if shape == 'circle':
+            curve = np.stack((radius * np.sin(angles), radius * (1 - np.cos(angles)), np.zeros_like(angles)), axis=1)
+        else:
+            curve = np.stack((radius * np.sin(angles), radius * np.sin(angles) * np.cos(angles) / 2,
+                              np.zeros_like(angles)), axis=1)
+        motions = np.diff(curve, axis=0)
+    return np.vstack((np.zeros((1, 3)), np.cumsum(motions, axis=0)))
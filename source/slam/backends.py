@@ -0,0 +1,352 @@
+"""
+This module provides the inference backends used by the SLAM class.
+
+Every backend exposes the same small interface: ``update`` feeds the factors and
+values created by the latest SLAM step and drops removed factors,
+``pose_estimate``, ``point_estimate``, ``marginal_covariance`` and
+``joint_marginal_covariance`` query the current solution, and ``graph``/``values``
+give access to the full problem held by the solver. After each update,
+``touched_keys`` holds the variables whose part of the solution was recomputed,
+or None when the whole problem was, and ``marginalized_keys`` the variables the
+solver dropped from its window.
+
+For checkpoints, ``checkpoint_state`` returns the solver state that is not part
+of the graph and values, and ``load`` rebuilds the solver from a graph, values
+and that state. Backends whose factor indices only change through explicit
+removals are ``append_only``, so their checkpoints can be stored as deltas.
+"""
+
+# source/slam/backends.py
+
+import gtsam
+from gtsam import NonlinearFactorGraph, Values, GaussNewtonOptimizer, Marginals
+
+from source.config import BACKEND_NAMES
+from source.slam.utils import is_pose_key
+
+
+class BatchBackend:
+    """
+    Reference backend that re-solves the whole factor graph on every update.
+
+    Each update costs O(N) in the size of the graph, so this backend is meant for
+    validating the incremental backend on small problems.
+    """
+
+    append_only = True
+
+    def __init__(self):
+        self.graph = NonlinearFactorGraph()
+        self.values = Values()
+        self.touched_keys = None
+        self.marginalized_keys = set()
+        self._marginals = None
+
+    def update(self, new_factors, new_values, remove_factor_indices=()):
+        """
+        Add new factors and values to the problem and re-optimize it from scratch.
+
+        Args:
+            new_factors (NonlinearFactorGraph): Factors added by the latest step.
+            new_values (Values): Initial estimates of the variables added by the latest step.
+            remove_factor_indices (iterable of int): Indices of factors to drop from the problem.
+
+        Returns:
+            list of int: The indices assigned to the new factors.
+        """
+        first_index = self.graph.size()
+        self.graph.push_back(new_factors)
+        self.values.insert(new_values)
+
+        if remove_factor_indices:
+            removed_keys = set()
+            for index in remove_factor_indices:
+                removed_keys.update(self.graph.at(index).keys())
+                self.graph.remove(index)
+            used_keys = set(self.graph.keys())
+            for key in removed_keys - used_keys:
+                self.values.erase(key)
+
+        self.values = GaussNewtonOptimizer(self.graph, self.values).optimize()
+        self.touched_keys = None
+        self._marginals = None
+        return list(range(first_index, self.graph.size()))
+
+    def checkpoint_state(self):
+        """Get the solver state that is not part of the graph and values."""
+        return {}
+
+    def load(self, graph, values, state=None):
+        """
+        Load a whole problem into the empty backend.
+
+        Args:
+            graph (NonlinearFactorGraph): The factors, without removed (null) entries.
+            values (Values): Estimates of the variables of the factors.
+            state (dict): Result of checkpoint_state.
+
+        Returns:
+            list of int: The indices assigned to the factors.
+        """
+        return self.update(graph, values)
+
+    def calculate_estimate(self):
+        """Get the current estimate of every variable."""
+        return self.values
+
+    def pose_estimate(self, key):
+        """Get the current estimate of a single pose."""
+        return self.values.atPose3(key)
+
+    def point_estimate(self, key):
+        """Get the current estimate of a single landmark position."""
+        return self.values.atPoint3(key)
+
+    def marginal_covariance(self, key):
+        """Get the marginal covariance of a single variable."""
+        return self._get_marginals().marginalCovariance(key)
+
+    def joint_marginal_covariance(self, keys):
+        """Get the joint marginal covariance of several variables, ordered as keys."""
+        return self._get_marginals().jointMarginalCovariance(gtsam.KeyVector(list(keys))).fullMatrix()
+
+    def _get_marginals(self):
+        if self._marginals is None:
+            self._marginals = Marginals(self.graph, self.values)
+        return self._marginals
+
+
+class ISAM2Backend:
+    """
+    Incremental backend built on gtsam.ISAM2.
+
+    Only the factors and values of the latest step are handed to the solver, which
+    re-eliminates the affected part of the Bayes tree, so the cost of a step does
+    not grow with the length of the trajectory.
+    """
+
+    append_only = True
+
+    def __init__(self, params=None):
+        """
+        Initialize the incremental solver.
+
+        Args:
+            params (gtsam.ISAM2Params): Solver parameters, the gtsam defaults are used if None.
+        """
+        self.isam = gtsam.ISAM2(params if params is not None else gtsam.ISAM2Params())
+        self.touched_keys = set()
+        self.marginalized_keys = set()
+
+    @property
+    def graph(self):
+        """Get the factor graph held by the solver."""
+        return self.isam.getFactorsUnsafe()
+
+    @property
+    def values(self):
+        """Get the current linearization point of the solver."""
+        return self.isam.getLinearizationPoint()
+
+    def update(self, new_factors, new_values, remove_factor_indices=()):
+        """
+        Add new factors and values to the solver.
+
+        Variables left without any factor after the removal are dropped by the solver.
+
+        Args:
+            new_factors (NonlinearFactorGraph): Factors added by the latest step.
+            new_values (Values): Initial estimates of the variables added by the latest step.
+            remove_factor_indices (iterable of int): Indices of factors to drop from the problem.
+
+        Returns:
+            list of int: The indices assigned to the new factors.
+        """
+        result = self.isam.update(new_factors, new_values, list(remove_factor_indices))
+        # Marked keys cover the new, relinearized and removed-factor variables whose cliques were re-eliminated
+        self.touched_keys = set(result.getMarkedKeys()) | set(new_values.keys())
+        return list(result.getNewFactorsIndices())
+
+    def checkpoint_state(self):
+        """Get the solver state that is not part of the graph and values."""
+        return {}
+
+    def load(self, graph, values, state=None):
+        """
+        Load a whole problem into the empty solver with one batch elimination.
+
+        Args:
+            graph (NonlinearFactorGraph): The factors, without removed (null) entries.
+            values (Values): Linearization point of the variables of the factors.
+            state (dict): Result of checkpoint_state.
+
+        Returns:
+            list of int: The indices assigned to the factors.
+        """
+        return self.update(graph, values)
+
+    def calculate_estimate(self):
+        """Get the current estimate of every variable."""
+        return self.isam.calculateEstimate()
+
+    def pose_estimate(self, key):
+        """Get the current estimate of a single pose."""
+        return self.isam.calculateEstimatePose3(key)
+
+    def point_estimate(self, key):
+        """Get the current estimate of a single landmark position."""
+        return self.isam.calculateEstimatePoint3(key)
+
+    def marginal_covariance(self, key):
+        """Get the marginal covariance of a single variable."""
+        return self.isam.marginalCovariance(key)
+
+    def joint_marginal_covariance(self, keys):
+        """Get the joint marginal covariance of several variables, ordered as keys."""
+        return self.isam.jointMarginalCovariance(gtsam.KeyVector(list(keys))).fullMatrix()
+
+
+class FixedLagBackend:
+    """
+    Sliding-window backend built on gtsam.IncrementalFixedLagSmoother.
+
+    Every variable is stamped with the latest pose index whenever a new factor involves it, so a
+    pose is stamped when it is added and a landmark each time it is observed. Variables whose
+    stamp falls more than lag steps behind are marginalized into a prior on the remaining ones,
+    which retires old poses and landmarks that are no longer observed. The solver then holds
+    only the window, so memory and step cost stay bounded on long runs.
+    """
+
+    # Marginalization replaces factors inside the smoother, so checkpoints always store the whole window
+    append_only = False
+
+    def __init__(self, lag=100, params=None):
+        """
+        Initialize the fixed-lag smoother.
+
+        Args:
+            lag (float): Length of the window, in steps.
+            params (gtsam.ISAM2Params): Parameters of the underlying iSAM2 solver.
+        """
+        self.lag = lag
+        self.smoother = gtsam.IncrementalFixedLagSmoother(float(lag),
+                                                          params if params is not None else gtsam.ISAM2Params())
+        self.time = 0
+        self.touched_keys = set()
+        self.marginalized_keys = set()
+        self._keys = set()
+
+    @property
+    def graph(self):
+        """Get the factor graph of the window, including the marginal priors."""
+        return self.smoother.getFactors()
+
+    @property
+    def values(self):
+        """Get the current linearization point of the window."""
+        return self.smoother.getLinearizationPoint()
+
+    def update(self, new_factors, new_values, remove_factor_indices=()):
+        """
+        Add new factors and values to the window and marginalize the variables that left it.
+
+        Factors already removed by marginalization are skipped when removing factors.
+
+        Args:
+            new_factors (NonlinearFactorGraph): Factors added by the latest step.
+            new_values (Values): Initial estimates of the variables added by the latest step.
+            remove_factor_indices (iterable of int): Indices of factors to drop from the problem.
+
+        Returns:
+            list of int: The indices assigned to the new factors.
+        """
+        new_keys = set(new_values.keys())
+        pose_indices = [gtsam.symbolIndex(key) for key in new_keys if is_pose_key(key)]
+        if pose_indices:
+            self.time = max(self.time, max(pose_indices))
+        stamped_keys = new_keys | set(new_factors.keyVector())
+        timestamps = {key: float(self.time) for key in stamped_keys}
+
+        graph = self.smoother.getFactors()
+        remove_factor_indices = [index for index in remove_factor_indices if graph.exists(index)]
+        self.smoother.update(new_factors, new_values, timestamps, remove_factor_indices)
+        result = self.smoother.getISAM2Result()
+
+        keys = self._keys | new_keys
+        self._keys = set(self.smoother.timestamps().keys())
+        self.marginalized_keys = keys - self._keys
+        self.touched_keys = set(result.getMarkedKeys()) | new_keys | self.marginalized_keys
+        return list(result.getNewFactorsIndices())
+
+    def checkpoint_state(self):
+        """Get the lag, the current time and the timestamps of the variables in the window."""
+        return {'lag': self.lag, 'time': self.time, 'timestamps': dict(self.smoother.timestamps())}
+
+    def load(self, graph, values, state=None):
+        """
+        Load a window into the empty smoother, keeping the saved timestamps of its variables.
+
+        Args:
+            graph (NonlinearFactorGraph): The factors of the window, including the marginal priors.
+            values (Values): Linearization point of the variables of the window.
+            state (dict): Result of checkpoint_state.
+
+        Returns:
+            list of int: The indices assigned to the factors.
+        """
+        state = state or {}
+        self.time = state.get('time', self.time)
+        saved = state.get('timestamps', {})
+        timestamps = {key: float(saved.get(key, self.time)) for key in values.keys()}
+        self.smoother.update(graph, values, timestamps, [])
+        self._keys = set(self.smoother.timestamps().keys())
+        self.touched_keys = set(values.keys())
+        self.marginalized_keys = set()
+        return list(self.smoother.getISAM2Result().getNewFactorsIndices())
+
+    def calculate_estimate(self):
+        """Get the current estimate of every variable in the window."""
+        return self.smoother.calculateEstimate()
+
+    def pose_estimate(self, key):
+        """Get the current estimate of a single pose."""
+        return self.smoother.calculateEstimatePose3(key)
+
+    def point_estimate(self, key):
+        """Get the current estimate of a single landmark position."""
+        return self.smoother.calculateEstimatePoint3(key)
+
+    def marginal_covariance(self, key):
+        """Get the marginal covariance of a single variable."""
+        return self.smoother.marginalCovariance(key)
+
+    def joint_marginal_covariance(self, keys):
+        """Get the joint marginal covariance of several variables, ordered as keys."""
+        return self.smoother.getISAM2().jointMarginalCovariance(gtsam.KeyVector(list(keys))).fullMatrix()
+
+
+BACKENDS = dict(zip(BACKEND_NAMES, (ISAM2Backend, BatchBackend, FixedLagBackend)))
+
+
+def backend_name(backend):
+    """Get the name under which a backend's class is registered in BACKENDS."""
+    for name, backend_class in BACKENDS.items():
+        if isinstance(backend, backend_class):
+            return name
+    raise ValueError(f"Backend {type(backend).__name__} is not registered in BACKENDS.")
+
+
+def make_backend(name, **options):
+    """
+    Create an inference backend by name.
+
+    Args:
+        name (str): One of the keys of BACKENDS.
+        **options: Options of the backend, e.g. lag for 'fixed_lag'.
+
+    Returns:
+        The backend instance.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown SLAM backend '{name}', expected one of {list(BACKENDS)}.")
+    return BACKENDS[name](**options)
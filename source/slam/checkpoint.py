@@ -0,0 +1,387 @@
+"""
+This module provides checkpointing of the SLAM state, written in the background as a base plus deltas.
+"""
+
+# source/slam/checkpoint.py
+
+import json
+import os
+import pickle
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+from gtsam import BearingRangeFactor3D, NonlinearFactorGraph, Pose3, Rot3, Values, symbolIndex
+
+from source.slam.backends import backend_name, make_backend
+from source.slam.incidence import ObservationIncidence
+from source.slam.utils import is_landmark_key, is_pose_key
+
+# Number of factors per gtsam archive, which bounds how long the writer holds the GIL at once
+_FACTORS_PER_ARCHIVE = 256
+
+# One written checkpoint: the step it was taken after, 'base' or 'delta', and its file name
+CheckpointEntry = namedtuple('CheckpointEntry', ['step', 'kind', 'file'])
+
+
+def list_checkpoints(directory):
+    """
+    List the checkpoints written to a directory.
+
+    Args:
+        directory (str): Directory of the checkpoints.
+
+    Returns:
+        list of CheckpointEntry: The checkpoints, in the order they were taken.
+    """
+    return [CheckpointEntry(**entry) for entry in _read_manifest(directory).get('checkpoints', [])]
+
+
+def checkpoint_metadata(directory):
+    """
+    Get the metadata a Checkpointer recorded with the checkpoints of a directory.
+
+    Args:
+        directory (str): Directory of the checkpoints.
+
+    Returns:
+        dict: The metadata, e.g. the parameters of the scenario of the run, empty if none was recorded.
+    """
+    return _read_manifest(directory).get('metadata', {})
+
+
+def _read_manifest(directory):
+    path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+class Checkpointer:
+    """
+    Checkpointer periodically saves the state of a SLAM system, so that a run can be resumed.
+
+    Every interval steps, the state is captured at the step boundary and handed to a background
+    thread, which serializes and writes it. The first checkpoint is a base holding the whole
+    factor graph and values; the following ones are deltas holding the factors added and removed
+    since the previous checkpoint and the values of the variables the solver touched. A new base
+    is written every base_interval checkpoints, and at every checkpoint for backends that are not
+    append-only, such as the fixed-lag smoother whose window is small. Poses and observations are
+    append-only and always stored as deltas, while the landmark table, the backend state and the
+    configuration of the removal scheduler are stored whole.
+
+    The capture only keeps references to the factors of the past steps and copies the touched
+    values, and the writer serializes the factors in small archives, so the SLAM loop is not
+    stalled. A removal still being computed by the scheduler is not saved; the restored scheduler
+    computes a new one at its next interval.
+
+    Created on a directory that already holds checkpoints, e.g. after restore_slam, the
+    checkpointer continues them from the step of the SLAM system and drops the later ones.
+    """
+
+    def __init__(self, slam, directory, interval=1000, base_interval=None, max_pending=2, metadata=None):
+        """
+        Attach a checkpointer to a SLAM system.
+
+        Args:
+            slam (SLAM): The SLAM system.
+            directory (str): Directory of the checkpoints, created if needed.
+            interval (int): Number of steps between checkpoints.
+            base_interval (int): Number of deltas after which a new base is written, never if None.
+            max_pending (int): Number of checkpoints that may wait for the writer before a capture blocks.
+            metadata (dict): JSON-serializable description of the run, such as the parameters of its
+             scenario, stored with the checkpoints and read back with checkpoint_metadata. The
+             metadata already in the directory is kept if None.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.slam = slam
+        self.directory = directory
+        self.interval = interval
+        self.base_interval = base_interval
+        self.max_pending = max(int(max_pending), 1)
+        self.last_step = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = []
+        self._factor_batches = []
+        self._removed_factors = []
+        self._touched_keys = set()
+        self._deltas_since_base = None
+        self.metadata = checkpoint_metadata(directory) if metadata is None else dict(metadata)
+
+        # Continue the checkpoints of an earlier run up to the step the SLAM system is at
+        entries = list_checkpoints(directory)
+        self._entries = [entry for entry in entries if entry.step <= slam.step_count]
+        for entry in entries[len(self._entries):]:
+            os.remove(os.path.join(directory, entry.file))
+        self._num_poses = len(slam.poses) if self._entries else 0
+        self._write_manifest()
+        slam.checkpointer = self
+
+    @property
+    def checkpoints(self):
+        """Get the checkpoints written so far."""
+        return list(self._entries)
+
+    def on_update(self, new_factors, factor_indices, removed_factor_indices=()):
+        """Record a backend update. Called by SLAM after every update."""
+        if new_factors is not None and len(factor_indices):
+            self._factor_batches.append((np.asarray(factor_indices, dtype=np.int64), new_factors))
+        self._removed_factors.extend(removed_factor_indices)
+        touched = self.slam.backend.touched_keys
+        if touched is None:
+            self._touched_keys = None
+        elif self._touched_keys is not None:
+            self._touched_keys.update(touched)
+
+    def on_step_end(self):
+        """Take a checkpoint if one is due. Called by SLAM at the end of every step."""
+        if self.slam.step_count % self.interval == 0:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Capture the state of the SLAM system and hand it to the writer."""
+        slam = self.slam
+        backend = slam.backend
+        base = (self._deltas_since_base is None or not backend.append_only
+                or (self.base_interval is not None and self._deltas_since_base >= self.base_interval))
+        if base:
+            # The copy keeps the removed (null) factors, so indices are the positions in the graph
+            factors = [(None, NonlinearFactorGraph(backend.graph))]
+            values = Values(backend.values)
+        else:
+            factors = self._factor_batches
+            values = _values_of(backend.values, self._touched_keys)
+
+        observations = slam.observations
+        start = int(np.searchsorted(observations.pose_indices, self._num_poses))
+        poses = slam.poses
+        state = {
+            'step': slam.step_count,
+            'kind': 'base' if base else 'delta',
+            'factors': factors,
+            'removed_factors': [] if base else list(self._removed_factors),
+            'values': values,
+            'first_pose': self._num_poses,
+            'poses': _pose_rows(poses[self._num_poses:]),
+            'first_window_index': getattr(poses, 'first_window_index', 0),
+            'observations': (observations.pose_indices[start:].copy(), observations.landmark_ids[start:],
+                             observations.measurements[start:].copy()),
+            'landmarks': slam.landmarks.copy(),
+            'minimization_interval': slam.minimization_interval,
+            'num_removed_landmarks': slam.num_removed_landmarks,
+            'backend': backend_name(backend),
+            'backend_state': backend.checkpoint_state(),
+            'scheduler': _scheduler_state(slam.scheduler),
+        }
+
+        self._factor_batches = []
+        self._removed_factors = []
+        self._touched_keys = set()
+        self._num_poses = len(poses)
+        self._deltas_since_base = 0 if base else self._deltas_since_base + 1
+        self.last_step = slam.step_count
+
+        self._wait(self.max_pending - 1)
+        self._pending.append(self._executor.submit(self._write, state))
+
+    def wait(self):
+        """Block until every captured checkpoint is written."""
+        self._wait(0)
+
+    def close(self):
+        """Write the pending checkpoints, stop the writer and detach from the SLAM system."""
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown()
+            self.slam.checkpointer = None
+
+    def _wait(self, max_pending):
+        while len(self._pending) > max_pending:
+            future = self._pending.pop(0)
+            wait([future])
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error writing checkpoint: {e}")
+
+    def _write(self, state):
+        # Runs in the writer thread, the only one touching the files and the entries
+        payload = dict(state, factors=_serialize_factors(state['factors']), values=state['values'].serialize())
+        data = zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        entry = CheckpointEntry(state['step'], state['kind'], f"checkpoint-{state['step']:09d}-{state['kind']}.bin")
+        _write_atomic(os.path.join(self.directory, entry.file), data)
+        self._entries.append(entry)
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {'checkpoints': [entry._asdict() for entry in self._entries], 'metadata': self.metadata}
+        _write_atomic(os.path.join(self.directory, 'manifest.json'), json.dumps(manifest).encode())
+
+
+def restore_slam(directory, step=None, archive_dir=None):
+    """
+    Restore a SLAM system from the checkpoints of a directory.
+
+    The solver is rebuilt from the latest base up to the checkpoint and the deltas after it with a
+    single batch update, so restoring costs about one elimination of the problem rather than a
+    replay of every step. A removal scheduler attached when the checkpoint was taken is attached
+    again with its configuration and history. Pass the restored system to run_slam with resume
+    to continue the run.
+
+    Args:
+        directory (str): Directory of the checkpoints.
+        step (int): Step of the checkpoint to restore, the latest if None.
+        archive_dir (str): Directory where a sliding-window backend archives the poses that left
+         the window, a temporary directory if None.
+
+    Returns:
+        SLAM: The restored SLAM system, whose step_count is the step of the checkpoint.
+    """
+    from source.slam.slam import SLAM
+
+    entries = [entry for entry in list_checkpoints(directory) if step is None or entry.step <= step]
+    if not entries or (step is not None and entries[-1].step != step):
+        raise ValueError(f"No checkpoint of step {step} in {directory}.")
+    last_base = max(i for i, entry in enumerate(entries) if entry.kind == 'base')
+
+    factors = {}
+    values = Values()
+    pose_rows = []
+    observations = []
+    for i, entry in enumerate(entries):
+        with open(os.path.join(directory, entry.file), 'rb') as file:
+            state = pickle.loads(zlib.decompress(file.read()))
+        if state['first_pose'] != sum(len(rows) for rows in pose_rows):
+            raise ValueError(f"Checkpoint {entry.file} does not follow the previous one.")
+        pose_rows.append(state['poses'])
+        observations.append(state['observations'])
+        if i < last_base:
+            continue
+        if entry.kind == 'base':
+            factors = {}
+            values = Values()
+        for indices, archive in state['factors']:
+            graph = NonlinearFactorGraph()
+            graph.deserialize(archive)
+            factors.update(zip(indices.tolist(), (graph.at(j) for j in range(graph.size()))))
+        for index in state['removed_factors']:
+            factors.pop(index, None)
+        delta = Values()
+        delta.deserialize(state['values'])
+        for key in delta.keys():
+            if values.exists(key):
+                values.erase(key)
+        values.insert(delta)
+
+    # Rebuild the solver from the surviving factors, in their original order
+    order = sorted(factors)
+    graph = NonlinearFactorGraph()
+    for index in order:
+        graph.push_back(factors[index])
+    used_keys = set(graph.keyVector())
+    for key in list(values.keys()):
+        if key not in used_keys:
+            values.erase(key)
+    backend_state = state['backend_state']
+    backend = make_backend(state['backend'], **({'lag': backend_state['lag']} if 'lag' in backend_state else {}))
+    new_indices = backend.load(graph, values, backend_state)
+
+    landmark_factors = {}
+    for index, new_index in zip(order, new_indices):
+        factor = factors[index]
+        if isinstance(factor, BearingRangeFactor3D):
+            lm_id = next(symbolIndex(key) for key in factor.keys() if is_landmark_key(key))
+            landmark_factors.setdefault(lm_id, []).append(new_index)
+
+    rows = np.concatenate(pose_rows)
+    poses = [Pose3(Rot3(row[:9].reshape(3, 3)), row[9:].reshape((3, 1))) for row in rows]
+    landmarks = state['landmarks']
+    incidence = ObservationIncidence(capacity=sum(len(part[0]) for part in observations))
+    incidence.extend(*(np.concatenate(column) for column in zip(*observations)), num_poses=len(poses))
+    incidence.remove_landmarks([lm_id for lm_id in incidence.observed_landmark_ids.tolist() if lm_id not in landmarks])
+    incidence.drop_poses_before(state['first_window_index'])
+
+    slam = SLAM.from_state(backend, poses, landmarks, incidence, landmark_factors, state['step'],
+                           state['minimization_interval'], archive_dir)
+    if hasattr(slam.poses, 'archive_until'):
+        slam.poses.archive_until(state['first_window_index'])
+    slam.num_removed_landmarks = state.get('num_removed_landmarks', 0)
+    if state['scheduler'] is not None:
+        from source.algorithms.scheduler import RemovalScheduler
+        options = state['scheduler']
+        scheduler = RemovalScheduler(slam, options['strategy'], options['budget'], options['interval'],
+                                     options['executor'], options['strategy_options'],
+                                     options.get('removal_mode', 'delete'))
+        scheduler.history = options['history']
+        scheduler.reports = options.get('reports', [])
+    return slam
+
+
+def _values_of(values, keys):
+    """Copy the values of some variables, or all of them if keys is None."""
+    if keys is None:
+        return Values(values)
+    subset = Values()
+    for key in keys:
+        if values.exists(key):
+            if is_pose_key(key):
+                subset.insert(key, values.atPose3(key))
+            else:
+                subset.insert(key, values.atPoint3(key))
+    return subset
+
+
+def _pose_rows(poses):
+    """Pack poses into rows of the row-major rotation matrix followed by the translation (N, 12)."""
+    rows = np.empty((len(poses), 12))
+    for row, pose in zip(rows, poses):
+        row[:9] = pose.rotation().matrix().ravel()
+        row[9:] = pose.translation()
+    return rows
+
+
+def _scheduler_state(scheduler):
+    if scheduler is None:
+        return None
+    return {
+        'strategy': scheduler.strategy,
+        'budget': scheduler.budget,
+        'interval': scheduler.interval,
+        'executor': scheduler.executor,
+        'strategy_options': scheduler.strategy_options,
+        'removal_mode': scheduler.removal_mode,
+        'history': list(scheduler.history),
+        'reports': list(scheduler.reports),
+    }
+
+
+def _serialize_factors(batches):
+    """Serialize (indices, graph) batches into (indices, archive) pairs of at most _FACTORS_PER_ARCHIVE factors."""
+    archives = []
+    graph, indices = NonlinearFactorGraph(), []
+    for batch_indices, batch in batches:
+        if batch_indices is None:
+            batch_indices = range(batch.size())
+        for position, index in enumerate(batch_indices):
+            if not batch.exists(position):
+                continue
+            graph.push_back(batch.at(position))
+            indices.append(int(index))
+            if len(indices) == _FACTORS_PER_ARCHIVE:
+                archives.append((np.array(indices, dtype=np.int64), graph.serialize()))
+                graph, indices = NonlinearFactorGraph(), []
+    if indices:
+        archives.append((np.array(indices, dtype=np.int64), graph.serialize()))
+    return archives
+
+
+def _write_atomic(path, data):
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
@@ -0,0 +1,119 @@
+"""
+This module provides the CovarianceService class, which memoizes the marginal covariances queried from a
+SLAM backend within a solver revision.
+"""
+
+# source/slam/covariance.py
+
+from source.slam.utils import POSE_DIM
+
+
+class CovarianceService:
+    """
+    CovarianceService answers marginal and joint marginal covariance queries and memoizes the
+    results within a solver revision.
+
+    Entries are keyed by the variables they cover and stamped with the solver revision they were
+    computed at. By default (strict), every entry is dropped at each revision, so the cache only
+    serves repeated queries between two updates, e.g. the UD and the removal strategies of one
+    step, and answers are always exact. It does not carry entries across updates.
+
+    Keeping the entries of untouched variables across updates would not be exact: an incremental
+    update re-eliminates the cliques of the touched variables and all their ancestors, the root
+    included, and the marginal of any variable depends on every clique on its path to the root.
+    The non-strict mode does it anyway as an approximation for speed: it only drops the entries
+    covering a variable touched by the update (all of them when the backend does not report
+    touched variables), and the kept entries of the other variables lag behind the updated top
+    of the Bayes tree.
+    """
+
+    def __init__(self, backend, strict=True):
+        """
+        Initialize an empty cache over a backend.
+
+        Args:
+            backend: The SLAM inference backend.
+            strict (bool): Whether to drop every cached entry at each revision, or only the
+             entries of the touched variables (approximate).
+        """
+        self.backend = backend
+        self.strict = strict
+        self.revision = 0
+        self.hits = 0
+        self.misses = 0
+        self._marginals = {}
+        self._joints = {}
+
+    def notify_update(self):
+        """Advance the revision and drop the entries the latest backend update may have changed."""
+        self.revision += 1
+        touched = getattr(self.backend, 'touched_keys', None)
+        if self.strict or touched is None:
+            self.clear()
+            return
+        for key in touched & self._marginals.keys():
+            del self._marginals[key]
+        for keys in [keys for keys in self._joints if not touched.isdisjoint(keys)]:
+            del self._joints[keys]
+
+    def clear(self):
+        """Drop every cached entry."""
+        self._marginals.clear()
+        self._joints.clear()
+
+    def marginal_covariance(self, key):
+        """
+        Get the marginal covariance of a variable.
+
+        Args:
+            key (int): Key of the variable.
+
+        Returns:
+            numpy.ndarray: The covariance, (6, 6) in (rotation, translation) order for a pose, (3, 3) for a landmark.
+        """
+        entry = self._marginals.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        covariance = self.backend.marginal_covariance(key)
+        self._marginals[key] = (self.revision, covariance)
+        return covariance
+
+    def joint_covariance(self, keys):
+        """
+        Get the joint marginal covariance of several variables.
+
+        Args:
+            keys (iterable of int): Keys of the variables.
+
+        Returns:
+            numpy.ndarray: The covariance, with the variables' blocks ordered as keys.
+        """
+        keys = tuple(keys)
+        entry = self._joints.get(keys)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        covariance = self.backend.joint_marginal_covariance(keys)
+        self._joints[keys] = (self.revision, covariance)
+        return covariance
+
+    def position_covariance(self, pose_key):
+        """
+        Get the covariance of the position of a pose.
+
+        Args:
+            pose_key (int): Key of the pose.
+
+        Returns:
+            numpy.ndarray: The translation block of the pose's marginal covariance (3, 3).
+        """
+        return self.marginal_covariance(pose_key)[POSE_DIM - 3:, POSE_DIM - 3:]
+
+    def revision_of(self, key):
+        """Get the revision the cached marginal of a variable was computed at, or None if it is not cached."""
+        entry = self._marginals.get(key)
+        return None if entry is None else entry[0]
+
@@ -0,0 +1,321 @@
+"""
+This module provides the ObservationIncidence class, a sparse pose-landmark incidence matrix grown by SLAM.
+"""
+
+# source/slam/incidence.py
+
+import numpy as np
+
+# Upper bound on the number of elements of the dense blocks used by covisibility (32 MB)
+_CHUNK_ELEMENTS = 2 ** 22
+
+
+def _grow(array, size):
+    """Get an array with room for at least size rows, doubling its capacity if needed."""
+    if size <= len(array):
+        return array
+    return np.resize(array, (max(size, 2 * len(array)),) + array.shape[1:])
+
+
+class ObservationIncidence:
+    """
+    ObservationIncidence records which pose observed which landmark, and the measured position
+    of the landmark in the pose frame, as a COO matrix with amortized O(1) appends.
+
+    Entries are appended in pose order, so the COO arrays are already sorted by pose. A CSR index
+    by landmark is built on demand and cached until the next change. Landmarks are mapped to
+    dense columns the first time they are observed.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        Initialize an empty incidence matrix.
+
+        Args:
+            capacity (int): Number of observations to preallocate.
+        """
+        capacity = max(int(capacity), 1)
+        self._poses = np.empty(capacity, dtype=np.int64)
+        self._columns = np.empty(capacity, dtype=np.int64)
+        self._measurements = np.empty((capacity, 3))
+        self._size = 0
+        self._num_poses = 0
+        self._column_of = {}
+        self._column_ids = np.empty(16, dtype=np.int64)
+        self._num_columns = 0
+        self._landmark_index = None
+
+    @property
+    def num_poses(self):
+        """Get the number of poses covered by the matrix."""
+        return self._num_poses
+
+    @property
+    def pose_indices(self):
+        """Get the pose index of every observation, as a view sorted by pose."""
+        return self._poses[:self._size]
+
+    @property
+    def landmark_ids(self):
+        """Get the identifier of the landmark of every observation, aligned with pose_indices."""
+        return self._column_ids[self._columns[:self._size]]
+
+    @property
+    def measurements(self):
+        """Get the measured position of every observation in the pose frame, aligned with pose_indices."""
+        return self._measurements[:self._size]
+
+    @property
+    def observed_landmark_ids(self):
+        """Get the identifiers of the landmarks with at least one observation."""
+        degrees = np.bincount(self._columns[:self._size], minlength=self._num_columns)
+        return self._column_ids[:self._num_columns][degrees > 0]
+
+    def add_observations(self, pose_index, landmark_ids, measurements=None):
+        """
+        Record the landmarks observed from a pose.
+
+        Args:
+            pose_index (int): Index of the observing pose, not lower than any recorded pose.
+            landmark_ids (iterable of int): Identifiers of the observed landmarks.
+            measurements (numpy.ndarray): Measured landmark positions in the pose frame (N, 3),
+             recorded as NaN if None.
+        """
+        if pose_index < self._num_poses - 1:
+            raise ValueError("Observations must be added in pose order.")
+        self._num_poses = max(self._num_poses, pose_index + 1)
+
+        columns = []
+        for lm_id in landmark_ids:
+            column = self._column_of.get(lm_id)
+            if column is None:
+                column = self._num_columns
+                self._column_of[lm_id] = column
+                self._column_ids = _grow(self._column_ids, column + 1)
+                self._column_ids[column] = lm_id
+                self._num_columns += 1
+            columns.append(column)
+        if not columns:
+            return
+
+        end = self._size + len(columns)
+        self._poses = _grow(self._poses, end)
+        self._columns = _grow(self._columns, end)
+        self._measurements = _grow(self._measurements, end)
+        self._poses[self._size:end] = pose_index
+        self._columns[self._size:end] = columns
+        self._measurements[self._size:end] = np.nan if measurements is None else measurements
+        self._size = end
+        self._landmark_index = None
+
+    def extend(self, pose_indices, landmark_ids, measurements, num_poses=None):
+        """
+        Record the observations of several poses at once, e.g. when restoring a checkpoint.
+
+        Args:
+            pose_indices (numpy.ndarray): Index of the observing pose of every observation, sorted,
+             and not lower than any recorded pose.
+            landmark_ids (numpy.ndarray): Identifier of the landmark of every observation.
+            measurements (numpy.ndarray): Measured landmark positions in the pose frame (N, 3).
+            num_poses (int): Number of poses covered afterwards, to count poses without observations.
+        """
+        pose_indices = np.asarray(pose_indices, dtype=np.int64)
+        landmark_ids = np.asarray(landmark_ids, dtype=np.int64)
+        if len(pose_indices):
+            if pose_indices[0] < self._num_poses - 1 or np.any(np.diff(pose_indices) < 0):
+                raise ValueError("Observations must be added in pose order.")
+            # Columns are assigned in order of first observation, as by add_observations
+            unique_ids, first, inverse = np.unique(landmark_ids, return_index=True, return_inverse=True)
+            for lm_id in unique_ids[np.argsort(first)].tolist():
+                if lm_id not in self._column_of:
+                    self._column_of[lm_id] = self._num_columns
+                    self._column_ids = _grow(self._column_ids, self._num_columns + 1)
+                    self._column_ids[self._num_columns] = lm_id
+                    self._num_columns += 1
+            columns = np.fromiter((self._column_of[lm_id] for lm_id in unique_ids.tolist()), dtype=np.int64)
+
+            end = self._size + len(pose_indices)
+            self._poses = _grow(self._poses, end)
+            self._columns = _grow(self._columns, end)
+            self._measurements = _grow(self._measurements, end)
+            self._poses[self._size:end] = pose_indices
+            self._columns[self._size:end] = columns[inverse.reshape(-1)]
+            self._measurements[self._size:end] = measurements
+            self._size = end
+            self._num_poses = max(self._num_poses, int(pose_indices[-1]) + 1)
+            self._landmark_index = None
+        if num_poses is not None:
+            self._num_poses = max(self._num_poses, num_poses)
+
+    def copy(self):
+        """Get a deep copy of the incidence matrix."""
+        incidence = ObservationIncidence(capacity=self._size)
+        incidence._poses[:self._size] = self.pose_indices
+        incidence._columns[:self._size] = self._columns[:self._size]
+        incidence._measurements[:self._size] = self.measurements
+        incidence._size = self._size
+        incidence._num_poses = self._num_poses
+        incidence._column_of = dict(self._column_of)
+        incidence._column_ids = self._column_ids.copy()
+        incidence._num_columns = self._num_columns
+        return incidence
+
+    def remove_landmarks(self, landmark_ids):
+        """
+        Drop every observation of the given landmarks.
+
+        Args:
+            landmark_ids (iterable of int): Identifiers of the landmarks.
+        """
+        columns = [self._column_of[lm_id] for lm_id in landmark_ids if lm_id in self._column_of]
+        if not columns:
+            return
+        keep = ~np.isin(self._columns[:self._size], columns)
+        size = int(np.count_nonzero(keep))
+        self._poses[:size] = self._poses[:self._size][keep]
+        self._columns[:size] = self._columns[:self._size][keep]
+        self._measurements[:size] = self._measurements[:self._size][keep]
+        self._size = size
+        self._landmark_index = None
+
+    def drop_poses_before(self, pose_index):
+        """
+        Drop every observation made from a pose before an index, e.g. poses that left a sliding window.
+
+        Args:
+            pose_index (int): Index of the first pose whose observations are kept.
+        """
+        start = int(np.searchsorted(self._poses[:self._size], pose_index))
+        if start == 0:
+            return
+        size = self._size - start
+        self._poses[:size] = self._poses[start:self._size]
+        self._columns[:size] = self._columns[start:self._size]
+        self._measurements[:size] = self._measurements[start:self._size]
+        self._size = size
+        self._landmark_index = None
+
+    def degrees(self, landmark_ids):
+        """
+        Get the number of observations of each landmark.
+
+        Args:
+            landmark_ids (iterable of int): Identifiers of the landmarks.
+
+        Returns:
+            numpy.ndarray: The degrees, aligned with landmark_ids; zero for unobserved landmarks.
+        """
+        counts = np.bincount(self._columns[:self._size], minlength=self._num_columns + 1)
+        return counts[self._columns_of(landmark_ids)]
+
+    def pose_degrees(self):
+        """
+        Get the number of landmarks observed from each pose.
+
+        Returns:
+            numpy.ndarray: The degrees, indexed by pose.
+        """
+        return np.bincount(self._poses[:self._size], minlength=self._num_poses)
+
+    def observing_poses(self, landmark_id):
+        """
+        Get the poses that observed a landmark.
+
+        Args:
+            landmark_id (int): Identifier of the landmark.
+
+        Returns:
+            numpy.ndarray: The sorted indices of the observing poses.
+        """
+        column = self._column_of.get(landmark_id)
+        if column is None:
+            return np.empty(0, dtype=np.int64)
+        order, indptr = self._by_landmark()
+        return self._poses[order[indptr[column]:indptr[column + 1]]]
+
+    def observed_landmarks(self, pose_index):
+        """
+        Get the landmarks observed from a pose.
+
+        Args:
+            pose_index (int): Index of the pose.
+
+        Returns:
+            numpy.ndarray: The identifiers of the observed landmarks.
+        """
+        poses = self._poses[:self._size]
+        start, end = np.searchsorted(poses, [pose_index, pose_index + 1])
+        return self._column_ids[self._columns[start:end]]
+
+    def landmark_csr(self, landmark_ids):
+        """
+        Get the observing poses of several landmarks in compressed sparse row form.
+
+        Args:
+            landmark_ids (iterable of int): Identifiers of the landmarks.
+
+        Returns:
+            tuple: The row pointers (len(landmark_ids) + 1,) and the pose indices of each row.
+        """
+        columns = self._columns_of(landmark_ids)
+        order, indptr = self._by_landmark()
+        starts = indptr[columns]
+        lengths = indptr[columns + 1] - starts
+        row_pointers = np.concatenate(([0], np.cumsum(lengths)))
+        gather = np.repeat(starts - row_pointers[:-1], lengths) + np.arange(row_pointers[-1])
+        return row_pointers, self._poses[order[gather]]
+
+    def covisibility(self, landmark_ids):
+        """
+        Count the poses that observed each pair of landmarks.
+
+        Args:
+            landmark_ids (iterable of int): Identifiers of the landmarks.
+
+        Returns:
+            numpy.ndarray: Symmetric (K, K) matrix of shared observing poses; the diagonal holds the degrees.
+        """
+        landmark_ids = list(landmark_ids)
+        row_pointers, poses = self.landmark_csr(landmark_ids)
+        rows = np.repeat(np.arange(len(landmark_ids)), np.diff(row_pointers))
+        order = np.argsort(poses, kind='stable')
+        poses, rows = poses[order], rows[order]
+
+        # Accumulate B^T B over bounded blocks of poses of the dense incidence B
+        counts = np.zeros((len(landmark_ids), len(landmark_ids)))
+        chunk = max(1, min(self._num_poses, _CHUNK_ELEMENTS // max(len(landmark_ids), 1)))
+        for start in range(0, self._num_poses, chunk):
+            first, last = np.searchsorted(poses, [start, start + chunk])
+            block = np.zeros((min(chunk, self._num_poses - start), len(landmark_ids)))
+            block[poses[first:last] - start, rows[first:last]] = 1.0
+            counts += block.T @ block
+        return counts.astype(np.int64)
+
+    def covisible_landmarks(self, landmark_id):
+        """
+        Get the landmarks that share at least one observing pose with a landmark.
+
+        Args:
+            landmark_id (int): Identifier of the landmark.
+
+        Returns:
+            numpy.ndarray: The identifiers of the co-visible landmarks, excluding the landmark itself.
+        """
+        poses = self._poses[:self._size]
+        shared = np.isin(poses, self.observing_poses(landmark_id))
+        columns = np.unique(self._columns[:self._size][shared])
+        ids = self._column_ids[columns]
+        return ids[ids != landmark_id]
+
+    def _columns_of(self, landmark_ids):
+        # Unknown landmarks map to the always-empty column past the last one
+        missing = self._num_columns
+        return np.fromiter((self._column_of.get(lm_id, missing) for lm_id in landmark_ids), dtype=np.int64)
+
+    def _by_landmark(self):
+        if self._landmark_index is None:
+            columns = self._columns[:self._size]
+            order = np.argsort(columns, kind='stable')
+            indptr = np.searchsorted(columns[order], np.arange(self._num_columns + 2))
+            self._landmark_index = (order, indptr)
+        return self._landmark_index
@@ -0,0 +1,48 @@
+"""
+This module provides the packed measurement format consumed by the SLAM class.
+"""
+
+# source/slam/measurements.py
+
+import numpy as np
+
+# One landmark observation: the landmark id, its position in the agent frame and the covariance of that position
+MEASUREMENT_DTYPE = np.dtype([('id', np.int64), ('mean', np.float64, (3,)), ('covariance', np.float64, (3, 3))])
+
+
+def empty_measurements(size=0):
+    """
+    Allocate a batch of measurements.
+
+    Args:
+        size (int): Number of measurements.
+
+    Returns:
+        numpy.ndarray: An uninitialized structured array of MEASUREMENT_DTYPE (size,).
+    """
+    return np.empty(size, dtype=MEASUREMENT_DTYPE)
+
+
+def pack_measurements(measurements):
+    """
+    Pack measurements into a structured array.
+
+    Args:
+        measurements (numpy.ndarray or iterable of dict): A structured array of MEASUREMENT_DTYPE,
+         returned as is, or dicts with the landmark id ('id'), the landmark position observed in the
+         agent frame ('mean') and its covariance ('covariance'). Dicts without a mean or a covariance
+         are skipped.
+
+    Returns:
+        numpy.ndarray: The measurements as a structured array of MEASUREMENT_DTYPE (N,).
+    """
+    if isinstance(measurements, np.ndarray) and measurements.dtype == MEASUREMENT_DTYPE:
+        return measurements
+    measurements = [measurement for measurement in measurements
+                    if measurement.get('mean') is not None and measurement.get('covariance') is not None]
+    batch = empty_measurements(len(measurements))
+    if measurements:
+        batch['id'] = [measurement['id'] for measurement in measurements]
+        batch['mean'] = np.reshape([measurement['mean'] for measurement in measurements], (-1, 3))
+        batch['covariance'] = np.reshape([measurement['covariance'] for measurement in measurements], (-1, 3, 3))
+    return batch
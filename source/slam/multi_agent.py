@@ -0,0 +1,295 @@
+"""
+This module provides the MultiAgentSLAM class, which runs one SLAM system per agent over a shared landmark pool.
+"""
+
+# source/slam/multi_agent.py
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import gtsam
+from gtsam import HessianFactor, NonlinearFactorGraph, PriorFactorPoint3
+
+from source.agents.agent import Agent
+from source.landmarks.table import LandmarkTable
+from source.slam.measurements import pack_measurements
+from source.slam.slam import SLAM
+from source.slam.utils import landmark_key, observations_to_world
+from source.utils.profiling import phase, profiled
+
+# Solver of the agent served by a worker process, created by the process initializer
+_RESIDENT_SOLVER = None
+
+
+class AgentSolver:
+    """
+    AgentSolver holds the subgraph of one agent: its SLAM system and the landmark constraints
+    received from the other agents.
+
+    In a process executor, each solver lives in its own worker process and only the step inputs
+    and the results cross the process boundary.
+    """
+
+    def __init__(self, initial_pose, landmarks, options=None):
+        """
+        Create the SLAM system of the agent.
+
+        Args:
+            initial_pose (Pose3): Initial pose of the agent, in the world frame shared by all agents.
+            landmarks (LandmarkTable): Landmark priors.
+            options (dict): Keyword arguments of SLAM, such as backend and minimization_interval.
+        """
+        self.slam = SLAM(initial_pose, landmarks, **(options or {}))
+        self.received_factors = []
+
+    def step(self, control_input, measurements):
+        """
+        Perform a SLAM step of the agent.
+
+        Args:
+            control_input (numpy.ndarray): Control input of the agent (3,).
+            measurements (numpy.ndarray or list of dict): Measurements of the agent, as for SLAM.perform_slam_step.
+
+        Returns:
+            tuple: The new pose, its position covariance, and the identifiers (N,), world positions
+             (N, 3) and world covariances (N, 3, 3) of the fused observations.
+        """
+        observed = pack_measurements(measurements)
+        observed = observed[self.slam.landmarks.contains(observed['id'].tolist())]
+        self.slam.perform_slam_step(control_input, observed)
+        agent = self.slam.agent
+        return (agent.position, agent.position_covariance, observed['id'].copy(),
+                *observations_to_world(agent.position, observed))
+
+    def summarize(self, landmark_ids):
+        """
+        Summarize what the agent's own measurements say about some landmarks.
+
+        The subgraph, without the constraints received from other agents, is linearized at the
+        current estimate and every other variable is eliminated, which leaves the Gaussian
+        marginal of the landmarks in information form. Its mean is one Gauss-Newton step from the
+        estimate, since the estimate is pulled away from the optimum of the subgraph alone by the
+        received constraints. Received constraints are left out so that information is never
+        sent back to where it came from.
+
+        Args:
+            landmark_ids (iterable of int): Identifiers of the landmarks.
+
+        Returns:
+            tuple: The identifiers of the summarized landmarks (K,), their means (K, 3) and their
+             marginal covariances (K, 3, 3). Landmarks without variables in the subgraph are skipped.
+        """
+        active = set(self.slam.active_landmark_ids())
+        landmark_ids = [lm_id for lm_id in landmark_ids if lm_id in active]
+        if not landmark_ids:
+            return np.empty(0, dtype=np.int64), np.empty((0, 3)), np.empty((0, 3, 3))
+
+        graph = self.slam.graph
+        received = set(self.received_factors)
+        local_graph = NonlinearFactorGraph()
+        for index in range(graph.size()):
+            if graph.exists(index) and index not in received:
+                local_graph.push_back(graph.at(index))
+        estimate = self.slam.backend.calculate_estimate()
+        keys = [landmark_key(lm_id) for lm_id in landmark_ids]
+        kept = set(keys)
+        eliminated = [key for key in local_graph.keyVector() if key not in kept]
+        _, remaining = local_graph.linearize(estimate).eliminatePartialMultifrontal(eliminated)
+        marginal = HessianFactor(remaining)
+
+        # Reorder the blocks of the marginal from its key order to the order of landmark_ids
+        offsets = dict(zip(marginal.keys(), range(0, 3 * len(keys), 3)))
+        dims = (np.array([offsets[key] for key in keys])[:, None] + np.arange(3)).reshape(-1)
+        augmented = marginal.augmentedInformation()
+        covariance = np.linalg.inv(augmented[np.ix_(dims, dims)])
+        estimates = np.array([estimate.atPoint3(key) for key in keys]).reshape(-1)
+        means = (estimates + covariance @ augmented[dims, -1]).reshape(-1, 3)
+        blocks = np.arange(len(keys))
+        covariances = covariance.reshape(len(keys), 3, len(keys), 3)[blocks, :, blocks, :]
+        return np.array(landmark_ids, dtype=np.int64), means, 0.5 * (covariances + covariances.transpose(0, 2, 1))
+
+    def receive(self, summaries):
+        """
+        Replace the constraints received from other agents with new summaries.
+
+        Every summarized landmark this agent also observed gets a prior from each sender's
+        marginal. The correlations between landmarks are dropped: the joint marginals are
+        linearized at the senders' estimates, and their stiff directions, the relative geometry
+        of the landmarks, do not line up across agents whose headings drifted differently, so
+        fusing them whole skews the weak directions. The per-landmark marginals keep the
+        drift of the sender in their covariance and fuse robustly.
+
+        Args:
+            summaries (list of tuple): Summaries returned by summarize on the other agents.
+
+        Returns:
+            int: Number of factors added.
+        """
+        active = set(self.slam.active_landmark_ids())
+        new_factors = NonlinearFactorGraph()
+        for landmark_ids, means, covariances in summaries:
+            for lm_id, mean, covariance in zip(landmark_ids.tolist(), means, covariances):
+                if lm_id in active:
+                    new_factors.add(PriorFactorPoint3(landmark_key(lm_id), mean,
+                                                      gtsam.noiseModel.Gaussian.Covariance(covariance)))
+        self.received_factors = self.slam.add_factors(new_factors, self.received_factors)
+        return new_factors.size()
+
+    def poses(self):
+        """Get the smoothed trajectory of the agent."""
+        self.slam.refresh_poses()
+        return list(self.slam.poses)
+
+
+class MultiAgentSLAM:
+    """
+    MultiAgentSLAM runs several agents in the same space, each with its own pose chain and
+    subgraph, and shares their landmark observations.
+
+    Every step, the agents' subgraphs are updated concurrently, one worker per agent. The
+    observations of all agents, moved to the world frame by the estimated poses, are fused into
+    the shared landmark pool. Every merge_interval steps, the agents exchange constraints on the
+    landmarks observed by more than one of them: each agent summarizes its own subgraph as the
+    marginals of those landmarks, and every other agent replaces the priors it received before
+    with new ones built from them. Information reaches the other agents only through these summaries,
+    so it is counted once, up to linearization.
+
+    The gtsam bindings hold the GIL while solving, so the 'process' executor, which keeps each
+    subgraph resident in a worker process, is the one that scales with cores. The 'thread'
+    executor runs the same code in this process, e.g. for debugging.
+
+    All agents share the world frame of their initial poses. Landmark removal is not coordinated
+    between agents.
+    """
+
+    def __init__(self, initial_poses, landmarks, merge_interval=50, executor='process', **slam_options):
+        """
+        Create the agents.
+
+        Args:
+            initial_poses (list of Pose3): Initial pose of every agent, in a shared world frame.
+            landmarks (LandmarkTable or list of Landmark): Landmark priors shared by all agents.
+            merge_interval (int): Number of steps between two exchanges of constraints, never if 0.
+            executor (str): 'process' or 'thread'.
+            **slam_options: Keyword arguments of every agent's SLAM, such as backend.
+        """
+        if executor not in ('thread', 'process'):
+            raise ValueError("Executor must be 'thread' or 'process'.")
+        if isinstance(landmarks, LandmarkTable):
+            table = landmarks.copy()
+        else:
+            table = LandmarkTable(capacity=len(landmarks))
+            for lm in landmarks:
+                table.add(lm.identifier, lm.mean, lm.covariance)
+        self.landmarks = table
+        self.agents = [Agent(position=pose) for pose in initial_poses]
+        self.merge_interval = merge_interval
+        self.executor = executor
+        self.step_count = 0
+        self.num_merges = 0
+        self._observed = [set() for _ in self.agents]
+
+        if executor == 'thread':
+            self._solvers = [AgentSolver(pose, table, slam_options) for pose in initial_poses]
+            self._executors = [ThreadPoolExecutor(max_workers=len(self.agents))]
+        else:
+            self._solvers = None
+            self._executors = [ProcessPoolExecutor(1, initializer=_start_resident_solver,
+                                                   initargs=(pose, table, slam_options))
+                               for pose in initial_poses]
+
+    @property
+    def num_agents(self):
+        """Get the number of agents."""
+        return len(self.agents)
+
+    @profiled('multi_agent.step')
+    def step(self, control_inputs, measurements):
+        """
+        Perform one SLAM step of every agent, in parallel.
+
+        Args:
+            control_inputs (sequence of numpy.ndarray): Control input of every agent.
+            measurements (sequence): Measurements of every agent, as for SLAM.perform_slam_step.
+        """
+        if len(control_inputs) != self.num_agents or len(measurements) != self.num_agents:
+            raise ValueError("Expected one control input and one set of measurements per agent.")
+        with phase('multi_agent.solve'):
+            futures = [self._submit(index, 'step', control_input, measurement)
+                       for index, (control_input, measurement) in enumerate(zip(control_inputs, measurements))]
+            results = [future.result() for future in futures]
+
+        with phase('multi_agent.fuse'):
+            for agent, observed, (pose, covariance, ids, positions, covariances) in zip(
+                    self.agents, self._observed, results):
+                agent.position = pose
+                agent.position_covariance = covariance
+                observed.update(ids.tolist())
+                self.landmarks.fuse(ids, positions, covariances)
+
+        self.step_count += 1
+        if self.merge_interval and self.step_count % self.merge_interval == 0:
+            self.merge()
+
+    def shared_landmark_ids(self):
+        """Get the identifiers of the landmarks observed by more than one agent."""
+        counts = Counter(lm_id for observed in self._observed for lm_id in observed)
+        return sorted(lm_id for lm_id, count in counts.items() if count > 1)
+
+    @profiled('multi_agent.merge')
+    def merge(self):
+        """
+        Exchange constraints on the shared landmarks between the agents.
+
+        Returns:
+            int: Number of constraint factors added over all agents.
+        """
+        shared = set(self.shared_landmark_ids())
+        if not shared:
+            return 0
+        futures = [self._submit(index, 'summarize', sorted(observed & shared))
+                   for index, observed in enumerate(self._observed)]
+        summaries = [future.result() for future in futures]
+        futures = [self._submit(index, 'receive', [summary for other, summary in enumerate(summaries)
+                                                   if other != index and len(summary[0])])
+                   for index in range(self.num_agents)]
+        self.num_merges += 1
+        return sum(future.result() for future in futures)
+
+    def poses(self, index):
+        """
+        Get the smoothed trajectory of an agent.
+
+        Args:
+            index (int): Index of the agent.
+
+        Returns:
+            list of Pose3: The poses of the agent.
+        """
+        return self._submit(index, 'poses').result()
+
+    def close(self):
+        """Stop the workers."""
+        for executor in self._executors:
+            executor.shutdown()
+
+    def _submit(self, index, method, *args):
+        if self._solvers is not None:
+            return self._executors[0].submit(getattr(self._solvers[index], method), *args)
+        return self._executors[index].submit(_call_resident_solver, method, *args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _start_resident_solver(initial_pose, landmarks, options):
+    global _RESIDENT_SOLVER
+    _RESIDENT_SOLVER = AgentSolver(initial_pose, landmarks, options)
+
+
+def _call_resident_solver(method, *args):
+    return getattr(_RESIDENT_SOLVER, method)(*args)
@@ -0,0 +1,164 @@
+"""
+This module provides the PoseHistory class, a trajectory whose old poses are archived to disk.
+"""
+
+# source/slam/pose_history.py
+
+import os
+import tempfile
+
+import numpy as np
+from gtsam import Pose3, Rot3
+
+from source.utils.results_store import GrowableMemmap
+
+
+class PoseHistory:
+    """
+    PoseHistory is a list-like trajectory that keeps only a window of recent poses in memory.
+
+    Poses before the window are archived to a memory-mapped file as 12 numbers each (the
+    row-major rotation matrix and the translation) and read back on access. Indices are absolute,
+    so archived and in-memory poses are addressed the same way.
+    """
+
+    def __init__(self, poses=(), archive_dir=None):
+        """
+        Initialize the trajectory.
+
+        Args:
+            poses (iterable of Pose3): Initial poses.
+            archive_dir (str): Directory of the archive file, or None for a temporary directory
+             owned by the trajectory and deleted by close (or when the trajectory is collected).
+        """
+        self._temporary_dir = None
+        if archive_dir is None:
+            self._temporary_dir = tempfile.TemporaryDirectory(prefix='pose_history_')
+            archive_dir = self._temporary_dir.name
+        os.makedirs(archive_dir, exist_ok=True)
+        self.archive_dir = archive_dir
+        self._archive = GrowableMemmap(os.path.join(archive_dir, 'poses.bin'), 12, np.float64)
+        self._window = list(poses)
+
+    @property
+    def first_window_index(self):
+        """Get the index of the oldest pose held in memory."""
+        return self._archive.length
+
+    @property
+    def num_archived(self):
+        """Get the number of archived poses."""
+        return self._archive.length
+
+    def append(self, pose):
+        """Append a pose to the trajectory."""
+        self._window.append(pose)
+
+    def archive_until(self, index):
+        """
+        Move the poses before an index from memory to the archive.
+
+        Args:
+            index (int): Absolute index of the first pose to keep in memory.
+        """
+        count = min(index, len(self)) - self.first_window_index
+        if count <= 0:
+            return
+        matrices = np.array([pose.matrix() for pose in self._window[:count]]).reshape(-1, 4, 4)
+        self._archive.append(np.concatenate((matrices[:, :3, :3].reshape(-1, 9), matrices[:, :3, 3]), axis=1))
+        del self._window[:count]
+
+    def positions(self):
+        """Get the positions of all poses (N, 3), archived ones included."""
+        archived = self._archive.view()[:, 9:]
+        window = np.array([pose.translation() for pose in self._window]).reshape(-1, 3)
+        return np.concatenate((archived, window))
+
+    def frozen(self):
+        """
+        Get a read-only copy of the trajectory that does not read the archive.
+
+        The window is copied and the archived rows are shared, since they are never modified,
+        so the copy costs O(window) and its archived poses are only built when accessed.
+
+        Returns:
+            FrozenPoses: The copy.
+        """
+        return FrozenPoses(self._archive.view(), self._window)
+
+    def flush(self):
+        """Flush the archive to disk."""
+        self._archive.flush()
+
+    def close(self):
+        """Flush the archive and trim its file, or delete it if it lives in a temporary directory."""
+        self._archive.close()
+        if self._temporary_dir is not None:
+            self._temporary_dir.cleanup()
+            self._temporary_dir = None
+
+    def _index(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Pose index out of range.")
+        return index
+
+    def __len__(self):
+        return self._archive.length + len(self._window)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self._index(index)
+        if index >= self.first_window_index:
+            return self._window[index - self.first_window_index]
+        row = self._archive.view()[index]
+        return Pose3(Rot3(row[:9].reshape(3, 3)), row[9:].reshape((3, 1)))
+
+    def __setitem__(self, index, pose):
+        index = self._index(index)
+        if index < self.first_window_index:
+            raise IndexError("Archived poses are read-only.")
+        self._window[index - self.first_window_index] = pose
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class FrozenPoses:
+    """
+    FrozenPoses is a read-only, list-like copy of a PoseHistory, safe to read from another thread
+    while the trajectory grows.
+    """
+
+    def __init__(self, archived, window):
+        """
+        Initialize the copy.
+
+        Args:
+            archived (numpy.ndarray): The archived rows (N, 12), shared with the archive.
+            window (list of Pose3): The poses held in memory, copied.
+        """
+        self._archived = archived
+        self._window = list(window)
+
+    def __len__(self):
+        return len(self._archived) + len(self._window)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Pose index out of range.")
+        if index >= len(self._archived):
+            return self._window[index - len(self._archived)]
+        row = self._archived[index]
+        return Pose3(Rot3(row[:9].reshape(3, 3)), row[9:].reshape((3, 1)))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
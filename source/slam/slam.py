@@ -2,50 +2,126 @@
 This module provides the SLAM class for managing the simultaneous localization and mapping process using GTSAM.
 """
 
-import gtsam
-
 # source/slam/slam.py
 
 import numpy as np
 import gtsam
-from gtsam import (Values, NonlinearFactorGraph, GaussNewtonOptimizer,
-                   Pose3, PriorFactorPose3, BetweenFactorPose3, Marginals, Rot3)
+from gtsam import (Values, NonlinearFactorGraph, symbolIndex,
+                   Pose3, PriorFactorPose3, BetweenFactorPose3, BearingRangeFactor3D, Rot3)
 from source.agents.agent import Agent
-from source.landmarks.landmark import Landmark
-from source.info_theoretic.utils import compute_information_gain
+from source.landmarks.table import LandmarkTable
+from source.config import REMOVAL_MODES
+from source.slam.backends import make_backend, FixedLagBackend
+from source.slam.covariance import CovarianceService
+from source.slam.incidence import ObservationIncidence
+from source.slam.pose_history import PoseHistory
+from source.slam.sparsification import sparsify_landmark
+from source.slam.measurements import pack_measurements
+from source.slam.utils import (pose_key, landmark_key, is_pose_key, is_landmark_key, bearing_range_sigmas,
+                               transform_from, observations_to_world)
+from source.utils.profiling import phase, profiled
+
 
 class SLAM:
     """
     SLAM class handles the simultaneous localization and mapping process incrementally using GTSAM.
     """
 
-    def __init__(self, initial_pose, landmarks, minimization_interval=10):
+    def __init__(self, initial_pose, landmarks, minimization_interval=10, backend='isam2', archive_dir=None):
         """
         Initialize the SLAM class.
 
         Args:
             initial_pose (Pose3): Initial pose of the agent.
-            landmarks (list of Landmark): List of landmarks.
-            minimization_interval (int): Interval at which to perform landmark minimization.
+            landmarks (list of Landmark or LandmarkTable): Landmark priors, copied into the SLAM's table.
+            minimization_interval (int): Interval, in steps, at which an attached RemovalScheduler
+             performs landmark minimization.
+            backend (str or backend): Inference backend, 'isam2' for incremental solving,
+             'batch' for re-solving the whole graph every step (reference mode), 'fixed_lag'
+             for a sliding window, or a backend instance such as FixedLagBackend(lag=50).
+            archive_dir (str): Directory where a sliding-window backend archives the poses
+             that left the window, a temporary directory if None.
         """
-        self.agent = Agent(position=initial_pose)
-        self._landmarks = {lm.identifier: lm for lm in landmarks}
-        self._poses = [initial_pose]
+        if isinstance(landmarks, LandmarkTable):
+            table = landmarks.copy()
+        else:
+            table = LandmarkTable(capacity=len(landmarks))
+            for lm in landmarks:
+                table.add(lm.identifier, lm.mean, lm.covariance)
+        self._initialize(table, [initial_pose], minimization_interval, backend, archive_dir)
+
+        # Add prior on the first pose
+        prior_graph = NonlinearFactorGraph()
+        prior_estimate = Values()
+        prior_noise = gtsam.noiseModel.Diagonal.Sigmas(np.array([0.1, 0.1, 0.1, 0.1, 0.1, 0.1]))
+        prior_graph.add(PriorFactorPose3(pose_key(0), initial_pose, prior_noise))
+        prior_estimate.insert(pose_key(0), initial_pose)
+        self.backend.update(prior_graph, prior_estimate)
+        self.covariances.notify_update()
+
+    @classmethod
+    def from_state(cls, backend, poses, landmarks, observations, landmark_factors, step_count=0,
+                   minimization_interval=10, archive_dir=None):
+        """
+        Create a SLAM system around an existing solver state, e.g. one restored from a checkpoint.
+
+        Args:
+            backend: The inference backend, already holding the factors and values of the problem.
+            poses (list of Pose3): Estimated trajectory.
+            landmarks (LandmarkTable): Landmark table, used as is.
+            observations (ObservationIncidence): Observations of the trajectory.
+            landmark_factors (dict): Mapping from landmark identifier to the backend indices of its observation factors.
+            step_count (int): Number of steps already performed.
+            minimization_interval (int): Interval at which an attached RemovalScheduler performs landmark minimization.
+            archive_dir (str): Directory where a sliding-window backend archives the poses that left the window.
+
+        Returns:
+            SLAM: The SLAM system.
+        """
+        slam = cls.__new__(cls)
+        slam._initialize(landmarks, poses, minimization_interval, backend, archive_dir)
+        slam.observations = observations
+        slam._landmark_factors = landmark_factors
+        slam.step_count = step_count
+        try:
+            slam.agent.position_covariance = slam.covariances.position_covariance(pose_key(len(poses) - 1))
+        except Exception as e:
+            print(f"Error computing marginal covariance: {e}")
+        return slam
+
+    def _initialize(self, landmarks, poses, minimization_interval, backend, archive_dir):
+        self.agent = Agent(position=poses[-1])
+        self._landmarks = landmarks
+        self._landmark_factors = {}
+        self.observations = ObservationIncidence()
         self.minimization_interval = minimization_interval
         self.step_count = 0
+        self.num_removed_landmarks = 0
+        self.scheduler = None
+        self.checkpointer = None
 
         # Initialize GTSAM structures
-        self.graph = NonlinearFactorGraph()
-        self.initial_estimate = Values()
+        self.backend = make_backend(backend) if isinstance(backend, str) else backend
+        if isinstance(self.backend, FixedLagBackend):
+            self._poses = PoseHistory(poses, archive_dir)
+        else:
+            self._poses = list(poses)
+        self.covariances = CovarianceService(self.backend)
+        self._odometry_noise = gtsam.noiseModel.Diagonal.Sigmas(np.array([0.1, 0.1, 0.1, 0.1, 0.1, 0.1]))
 
-        # Add prior on the first pose
-        prior_noise = gtsam.noiseModel.Diagonal.Sigmas(np.array([0.1, 0.1, 0.1, 0.1, 0.1, 0.1]))
-        self.graph.add(PriorFactorPose3(0, initial_pose, prior_noise))
-        self.initial_estimate.insert(0, initial_pose)
+    @property
+    def graph(self):
+        """Get the factor graph held by the backend."""
+        return self.backend.graph
+
+    @property
+    def initial_estimate(self):
+        """Get the current linearization point held by the backend."""
+        return self.backend.values
 
     @property
     def landmarks(self):
-        """Get the landmarks."""
+        """Get the landmark table."""
         return self._landmarks
 
     @property
@@ -53,46 +129,229 @@ class SLAM:
         """Get the poses."""
         return self._poses
 
+    @profiled('slam.step')
     def perform_slam_step(self, control_input, measurements):
         """
         Perform a single SLAM step.
 
         Args:
             control_input (numpy.ndarray): Control input for the motion model.
-            measurements (list of dict): List of measurements containing landmark id and observations.
+            measurements (numpy.ndarray or list of dict): Packed measurements of MEASUREMENT_DTYPE, or
+             dicts containing landmark id ('id'), the landmark position observed in the agent frame
+             ('mean') and its covariance ('covariance'). Unknown landmarks are ignored.
         """
         if control_input.shape != (3,):
             raise ValueError("control_input must be a 1D array of shape (3,)")
 
+        # Apply the landmark removal computed in the background, between two steps
+        if self.scheduler is not None:
+            with phase('slam.apply_removal'):
+                self.scheduler.on_step_start()
+
         # Predict the next pose using the motion model
-        new_pose_index = len(self.poses)
-        previous_pose = self.poses[-1]
-        delta_pose = Pose3(Rot3(), control_input.reshape((3, 1)))
-        new_pose = previous_pose.compose(delta_pose)
-        self.agent.position = new_pose
-        self._poses.append(new_pose)
-
-        # Add the new pose to the graph
-        odometry_noise = gtsam.noiseModel.Diagonal.Sigmas(np.array([0.1, 0.1, 0.1, 0.1, 0.1, 0.1]))
-        self.graph.add(BetweenFactorPose3(new_pose_index - 1, new_pose_index, delta_pose, odometry_noise))
-        self.initial_estimate.insert(new_pose_index, new_pose)
-
-        # Update landmarks based on measurements
-        for measurement in measurements:
-            lm_id = measurement['id']
-            if lm_id in self._landmarks:
-                lm = self._landmarks[lm_id]
-                observation_mean = measurement.get('mean')
-                observation_covariance = measurement.get('covariance')
-                if observation_mean is not None and observation_covariance is not None:
-                    lm.update_position(Pose3(Rot3(), observation_mean.reshape((3, 1))), observation_covariance)
+        with phase('slam.predict'):
+            new_pose_index = len(self.poses)
+            previous_pose = self.poses[-1]
+            delta_pose = Pose3(Rot3(), control_input.reshape((3, 1)))
+            new_pose = previous_pose.compose(delta_pose)
+            self.agent.position = new_pose
+            self._poses.append(new_pose)
+
+        # Collect only the factors and values created by this step
+        with phase('slam.build_factors'):
+            new_factors = NonlinearFactorGraph()
+            new_values = Values()
+            new_factors.add(BetweenFactorPose3(pose_key(new_pose_index - 1), pose_key(new_pose_index),
+                                               delta_pose, self._odometry_noise))
+            new_values.insert(pose_key(new_pose_index), new_pose)
+
+            # Add an observation factor for every measured landmark
+            observed = pack_measurements(measurements)
+            observed = observed[self._landmarks.contains(observed['id'].tolist())]
+            observed_ids = observed['id'].tolist()
+            means = observed['mean']
+            ranges, bearing_sigmas, range_sigmas = bearing_range_sigmas(means, observed['covariance'])
+            predicted_positions = transform_from(new_pose, means)
+            pose = pose_key(new_pose_index)
+            for i, lm_id in enumerate(observed_ids):
+                noise = gtsam.noiseModel.Diagonal.Sigmas(
+                    np.array([bearing_sigmas[i], bearing_sigmas[i], range_sigmas[i]]))
+                new_factors.add(BearingRangeFactor3D(pose, landmark_key(lm_id), gtsam.Unit3(means[i]),
+                                                     ranges[i], noise))
+                if lm_id not in self._landmark_factors:
+                    self._landmark_factors[lm_id] = []
+                    new_values.insert(landmark_key(lm_id), predicted_positions[i])
+
+        # Solve and replace the predicted pose with its estimate
+        with phase('slam.solve'):
+            factor_indices = self.backend.update(new_factors, new_values)
+            self._after_update(new_factors, factor_indices)
+            for lm_id, factor_index in zip(observed_ids, factor_indices[1:]):
+                self._landmark_factors[lm_id].append(factor_index)
+            self.observations.add_observations(new_pose_index, observed_ids, means)
+            new_pose = self.backend.pose_estimate(pose_key(new_pose_index))
+            self.agent.position = new_pose
+            self._poses[-1] = new_pose
+
+        # Fuse the observations, moved to the world frame by the estimated pose, into the landmark table
+        with phase('slam.update_landmarks'):
+            self._landmarks.fuse(observed['id'], *observations_to_world(new_pose, observed))
 
         # Calculate marginals for the current pose
-        marginals = Marginals(self.graph, self.initial_estimate)
-        try:
-            full_covariance = marginals.marginalCovariance(new_pose_index)
-            # print(f"Full covariance matrix: {full_covariance}")
-            position_covariance = full_covariance[:3, :3]  # Extract the top-left 3x3 submatrix
-            self.agent.position_covariance = position_covariance
-        except Exception as e:
-            print(f"Error computing marginal covariance: {e}")
+        with phase('slam.marginals'):
+            try:
+                self.agent.position_covariance = self.covariances.position_covariance(pose_key(new_pose_index))
+            except Exception as e:
+                print(f"Error computing marginal covariance: {e}")
+
+        self.step_count += 1
+        if self.scheduler is not None:
+            with phase('slam.schedule_removal'):
+                self.scheduler.on_step_end()
+        if self.checkpointer is not None:
+            with phase('slam.checkpoint'):
+                self.checkpointer.on_step_end()
+
+    def active_landmark_ids(self):
+        """Get the identifiers of the landmarks with observation factors in the solver."""
+        return list(self._landmark_factors)
+
+    def refresh_landmarks(self):
+        """
+        Replace the positions of the active landmarks with their current estimates from the backend.
+
+        perform_slam_step keeps the table positions as the fusion of the priors and the
+        observations; this pulls the smoothed estimates of the solver instead.
+        """
+        estimate = self.backend.calculate_estimate()
+        for lm_id in self._landmark_factors:
+            key = landmark_key(lm_id)
+            if lm_id in self._landmarks and estimate.exists(key):
+                self._landmarks.update(lm_id, estimate.atPoint3(key))
+
+    def refresh_poses(self):
+        """
+        Replace every stored pose with its current estimate from the backend.
+
+        Only the latest pose is refreshed by perform_slam_step; this pulls the smoothed
+        estimates of the whole trajectory and costs O(N). With a sliding-window backend, only
+        the poses of the window are refreshed.
+        """
+        estimate = self.backend.calculate_estimate()
+        for i in range(getattr(self._poses, 'first_window_index', 0), len(self._poses)):
+            self._poses[i] = estimate.atPose3(pose_key(i))
+        self.agent.position = self._poses[-1]
+
+    def close(self):
+        """Close the pose archive of a sliding-window backend, deleting it if it is temporary."""
+        if isinstance(self._poses, PoseHistory):
+            self._poses.close()
+
+    def _after_update(self, new_factors, factor_indices, removed_factor_indices=()):
+        """Propagate a backend update to the covariance cache, the retired variables and the checkpointer."""
+        self.covariances.notify_update()
+        self._retire(self.backend.marginalized_keys)
+        if self.checkpointer is not None:
+            self.checkpointer.on_update(new_factors, factor_indices, removed_factor_indices)
+
+    def _retire(self, keys):
+        """
+        Archive the poses and retire the landmarks marginalized by a sliding-window backend.
+
+        Retired landmarks keep their last estimate in the table. If one is observed again, it
+        re-enters the window as a new variable.
+        """
+        if not keys:
+            return
+        pose_indices = [symbolIndex(key) for key in keys if is_pose_key(key)]
+        if pose_indices:
+            self._poses.archive_until(max(pose_indices) + 1)
+            self.observations.drop_poses_before(self._poses.first_window_index)
+        for key in keys:
+            if is_landmark_key(key):
+                self._landmark_factors.pop(symbolIndex(key), None)
+
+    @profiled('slam.remove_landmarks')
+    def remove_landmarks(self, landmark_ids, mode='delete'):
+        """
+        Remove landmarks together with their variables and observation factors from the problem.
+
+        Later observations of a removed landmark are ignored.
+
+        Args:
+            landmark_ids (iterable of int): Identifiers of the landmarks to remove.
+            mode (str): 'delete' to drop the information of the landmarks, or 'sparsify' to
+             marginalize each of them into relative-pose factors along a tree of the poses that
+             observed it (see sparsify_landmark), which keeps most of its information without
+             the dense fill-in of an exact marginal.
+
+        Returns:
+            list of SparsificationReport: The information lost and the fill-in avoided for every
+             sparsified landmark, empty when deleting.
+        """
+        if mode not in REMOVAL_MODES:
+            raise ValueError(f"Unknown removal mode '{mode}', expected one of {REMOVAL_MODES}.")
+        landmark_ids = list(landmark_ids)
+        summary = NonlinearFactorGraph()
+        reports = []
+        if mode == 'sparsify':
+            # Every landmark is summarized against the problem that still holds all of them
+            estimate = self.backend.calculate_estimate()
+            graph = self.graph
+            for lm_id in landmark_ids:
+                if lm_id not in self._landmarks or not self._landmark_factors.get(lm_id):
+                    continue
+                # A sliding-window backend drops the factors of marginalized poses; summarize the rest
+                factors = NonlinearFactorGraph()
+                for index in self._landmark_factors[lm_id]:
+                    if graph.exists(index):
+                        factors.push_back(graph.at(index))
+                try:
+                    factors, report = sparsify_landmark(factors, estimate, lm_id, self.covariances)
+                except Exception as e:
+                    print(f"Error sparsifying landmark {lm_id}, deleting it instead: {e}")
+                    continue
+                summary.push_back(factors)
+                reports.append(report)
+
+        self.observations.remove_landmarks(landmark_ids)
+        factor_indices = []
+        for lm_id in landmark_ids:
+            if lm_id not in self._landmarks:
+                continue
+            self._landmarks.remove(lm_id)
+            self.num_removed_landmarks += 1
+            factor_indices.extend(self._landmark_factors.pop(lm_id, []))
+        if factor_indices or summary.size():
+            new_indices = self.backend.update(summary, Values(), factor_indices)
+            self._after_update(summary if summary.size() else None, new_indices if summary.size() else (),
+                               factor_indices)
+        return reports
+
+    def add_factors(self, new_factors, remove_factor_indices=()):
+        """
+        Add factors from outside the SLAM loop to the problem, e.g. constraints from other agents.
+
+        The factors may only involve variables already in the problem.
+
+        Args:
+            new_factors (NonlinearFactorGraph): Factors to add.
+            remove_factor_indices (iterable of int): Indices of earlier factors to drop, e.g. the
+             ones the new factors replace.
+
+        Returns:
+            list of int: The backend indices of the new factors.
+        """
+        remove_factor_indices = list(remove_factor_indices)
+        factor_indices = self.backend.update(new_factors, Values(), remove_factor_indices)
+        self._after_update(new_factors, factor_indices, remove_factor_indices)
+        return factor_indices
+
+    def remove_landmark(self, landmark_id):
+        """
+        Remove a single landmark from the problem.
+
+        Args:
+            landmark_id (int): Identifier of the landmark to remove.
+        """
+        self.remove_landmarks([landmark_id])
@@ -0,0 +1,191 @@
+"""
+This module provides sparsity-preserving landmark marginalization, which summarizes the information a
+landmark gives its observing poses with relative-pose factors along a Chow-Liu tree.
+"""
+
+# source/slam/sparsification.py
+
+from collections import namedtuple
+
+import numpy as np
+import gtsam
+from gtsam import BetweenFactorPose3, NonlinearFactorGraph
+
+from source.slam.utils import POSE_DIM, LANDMARK_DIM, is_landmark_key
+
+# The outcome of summarizing one landmark: the poses it linked, the factors replacing it, the
+# information it gave the poses and the part of it the summary loses, in nats, and the number of
+# pose pairs a dense marginal would have coupled beyond the summary's edges
+SparsificationReport = namedtuple('SparsificationReport', ['landmark_id', 'num_poses', 'num_factors',
+                                                           'information_gain', 'information_lost',
+                                                           'fill_in_avoided'])
+
+# Information added in the directions a summary factor leaves unconstrained, relative to its
+# largest eigenvalue, so that its noise model is invertible
+_REGULARIZATION = 1e-9
+
+# Unit noise used to read the Jacobians of the relative-pose factors
+_UNIT_NOISE = gtsam.noiseModel.Unit.Create(POSE_DIM)
+
+
+def landmark_observations(factors, values):
+    """
+    Linearize the observations of a landmark as predictions of its position from each pose.
+
+    An observation with whitened residual A dp + B dl predicts the landmark at dl = G dp, with
+    G = -B^-1 A, and information Q = B^T B. The observations of a pose are fused into one.
+
+    Args:
+        factors (NonlinearFactorGraph): The observation factors of the landmark, each connecting one pose to it.
+        values (Values): The linearization point.
+
+    Returns:
+        tuple: The keys of the observing poses (sorted), the prediction Jacobians (m, 3, 6) and
+         the prediction informations (m, 3, 3).
+    """
+    pose_keys = sorted({key for key in factors.keyVector() if not is_landmark_key(key)})
+    index = {key: i for i, key in enumerate(pose_keys)}
+    information = np.zeros((len(pose_keys), LANDMARK_DIM, LANDMARK_DIM))
+    projected = np.zeros((len(pose_keys), LANDMARK_DIM, POSE_DIM))
+    linearized = factors.linearize(values)
+    for i in range(linearized.size()):
+        factor = linearized.at(i)
+        A, _ = factor.jacobian()
+        offset, pose, landmark = 0, None, None
+        for key in factor.keys():
+            if is_landmark_key(key):
+                landmark = A[:, offset:offset + LANDMARK_DIM]
+                offset += LANDMARK_DIM
+            else:
+                pose = (index[key], A[:, offset:offset + POSE_DIM])
+                offset += POSE_DIM
+        information[pose[0]] += landmark.T @ landmark
+        projected[pose[0]] -= landmark.T @ pose[1]
+    return pose_keys, np.linalg.solve(information, projected), information
+
+
+def landmark_information(jacobians, informations):
+    """
+    Marginalize a landmark out of its predictions.
+
+    Args:
+        jacobians (numpy.ndarray): Prediction Jacobians (m, 3, 6) of landmark_observations.
+        informations (numpy.ndarray): Prediction informations (m, 3, 3).
+
+    Returns:
+        numpy.ndarray: The information the landmark gives the poses (6m, 6m).
+    """
+    num_poses = len(jacobians)
+    weighted = informations @ jacobians
+    blocks = np.zeros((num_poses, num_poses, POSE_DIM, POSE_DIM))
+    blocks[np.arange(num_poses), np.arange(num_poses)] = jacobians.transpose(0, 2, 1) @ weighted
+    coupling = weighted.transpose(1, 0, 2).reshape(LANDMARK_DIM, -1)
+    return (blocks.transpose(0, 2, 1, 3).reshape(POSE_DIM * num_poses, -1)
+            - coupling.T @ np.linalg.solve(informations.sum(axis=0), coupling))
+
+
+def _pairwise_mutual_information(covariance, num_poses):
+    """Get the mutual information (m, m) between every pair of poses of a joint covariance."""
+    blocks = covariance.reshape(num_poses, POSE_DIM, num_poses, POSE_DIM).transpose(0, 2, 1, 3)
+    single = np.linalg.slogdet(blocks[np.arange(num_poses), np.arange(num_poses)])[1]
+    first, second = np.triu_indices(num_poses, 1)
+    pairs = np.block([[blocks[first, first], blocks[first, second]],
+                      [blocks[second, first], blocks[second, second]]])
+    information = np.zeros((num_poses, num_poses))
+    information[first, second] = 0.5 * (single[first] + single[second] - np.linalg.slogdet(pairs)[1])
+    return information + information.T
+
+
+def chow_liu_tree(weights, max_degree=None):
+    """
+    Get the maximum spanning tree of a complete graph with Prim's algorithm.
+
+    Args:
+        weights (numpy.ndarray): Symmetric edge weights (m, m).
+        max_degree (int): Maximum number of edges of a node, unbounded if None. The tree is grown
+         greedily, so with a bound it is a good rather than the maximum spanning tree.
+
+    Returns:
+        list of tuple: The m - 1 edges (i, j) of the tree, i already in the tree when j joined.
+    """
+    num_nodes = len(weights)
+    in_tree = np.zeros(num_nodes, dtype=bool)
+    in_tree[0] = True
+    degrees = np.zeros(num_nodes, dtype=np.int64)
+    edges = []
+    for _ in range(num_nodes - 1):
+        open_nodes = in_tree if max_degree is None else in_tree & (degrees < max_degree)
+        candidates = np.where(open_nodes[:, None] & ~in_tree[None, :], weights, -np.inf)
+        i, j = np.unravel_index(np.argmax(candidates), candidates.shape)
+        edges.append((int(i), int(j)))
+        in_tree[j] = True
+        degrees[[i, j]] += 1
+    return edges
+
+
+def sparsify_landmark(factors, values, landmark_id, covariances, max_degree=2):
+    """
+    Marginalize a landmark and summarize the result with relative-pose factors.
+
+    Marginalizing the landmark exactly would leave a dense factor over all m poses that observed
+    it. Instead, every edge (i, j) of a spanning tree of these poses gets a factor stating that
+    poses i and j predict the landmark at the same place. The factors are conservative: each
+    pose splits the information of its prediction evenly between its edges, and each edge
+    behaves as if it had its own copy of the landmark, so the summary never claims more than the
+    landmark gave, and the lost part is reported. Splitting makes high-degree nodes expensive, so
+    the tree is the Chow-Liu tree of the mutual information the landmark adds between pairs of
+    poses, with degrees bounded by max_degree. Each factor is recovered as a measurement of the
+    relative pose of the estimate (nonlinear factor recovery), so it can be relinearized.
+
+    Args:
+        factors (NonlinearFactorGraph): The observation factors of the landmark.
+        values (Values): The current estimate.
+        landmark_id (int): Identifier of the landmark.
+        covariances (CovarianceService): Covariance queries of the problem holding the factors.
+        max_degree (int): Maximum number of summary factors per pose, unbounded if None.
+
+    Returns:
+        tuple: The summary factors (NonlinearFactorGraph) and the SparsificationReport.
+    """
+    summary = NonlinearFactorGraph()
+    pose_keys, jacobians, informations = landmark_observations(factors, values)
+    num_poses = len(pose_keys)
+    if num_poses < 2:
+        # A single observation does not constrain the pose: the landmark only explained it
+        return summary, SparsificationReport(landmark_id, num_poses, 0, 0.0, 0.0, 0)
+
+    # The joint covariance of the poses with and without the landmark
+    information = landmark_information(jacobians, informations)
+    covariance = covariances.joint_covariance(pose_keys)
+    without = np.linalg.inv(np.linalg.inv(0.5 * (covariance + covariance.T)) - information)
+    without = 0.5 * (without + without.T)
+    weights = _pairwise_mutual_information(covariance, num_poses) - _pairwise_mutual_information(without, num_poses)
+    edges = chow_liu_tree(weights, max_degree)
+
+    degrees = np.bincount(np.array(edges).reshape(-1), minlength=num_poses)
+    prediction_covariances = np.linalg.inv(informations)
+    poses = [values.atPose3(key) for key in pose_keys]
+    approximation = np.zeros_like(information)
+    for i, j in edges:
+        # The difference of the two predictions, as a function of the relative pose of i and j
+        edge_information = np.linalg.inv(degrees[i] * prediction_covariances[i]
+                                         + degrees[j] * prediction_covariances[j])
+        difference = np.hstack([jacobians[i], -jacobians[j]])
+        relative = BetweenFactorPose3(pose_keys[i], pose_keys[j], poses[i].between(poses[j]), _UNIT_NOISE)
+        relative_jacobian, _ = relative.linearize(values).jacobian()
+        measured = difference @ np.linalg.pinv(relative_jacobian)
+        factor_information = measured.T @ edge_information @ measured
+        factor_information = 0.5 * (factor_information + factor_information.T)
+        factor_information += _REGULARIZATION * np.linalg.eigvalsh(factor_information)[-1] * np.eye(POSE_DIM)
+        summary.add(BetweenFactorPose3(pose_keys[i], pose_keys[j], poses[i].between(poses[j]),
+                                       gtsam.noiseModel.Gaussian.Information(factor_information)))
+        columns = np.concatenate([POSE_DIM * i + np.arange(POSE_DIM), POSE_DIM * j + np.arange(POSE_DIM)])
+        approximation[np.ix_(columns, columns)] += relative_jacobian.T @ factor_information @ relative_jacobian
+
+    # Gains of the landmark and of its summary over the poses without it
+    identity = np.eye(len(information))
+    gain = 0.5 * np.linalg.slogdet(identity + without @ information)[1]
+    kept = 0.5 * np.linalg.slogdet(identity + without @ approximation)[1]
+    fill_in = num_poses * (num_poses - 1) // 2 - len(edges)
+    return summary, SparsificationReport(landmark_id, num_poses, summary.size(), float(gain), float(gain - kept),
+                                         fill_in)
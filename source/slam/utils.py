@@ -0,0 +1,86 @@
+"""
+This module provides helper functions for building the SLAM factor graph.
+"""
+
+# source/slam/utils.py
+
+import numpy as np
+import gtsam
+
+POSE_DIM = 6
+LANDMARK_DIM = 3
+
+
+def pose_key(index):
+    """
+    Get the factor graph key of a pose.
+
+    Args:
+        index (int): Index of the pose in the trajectory.
+
+    Returns:
+        int: The gtsam key of the pose variable.
+    """
+    return gtsam.symbol('x', index)
+
+
+def landmark_key(identifier):
+    """
+    Get the factor graph key of a landmark.
+
+    Args:
+        identifier (int): Identifier of the landmark.
+
+    Returns:
+        int: The gtsam key of the landmark variable.
+    """
+    return gtsam.symbol('l', identifier)
+
+
+def is_pose_key(key):
+    """Check whether a factor graph key belongs to a pose."""
+    return gtsam.symbolChr(key) == ord('x')
+
+
+def is_landmark_key(key):
+    """Check whether a factor graph key belongs to a landmark."""
+    return gtsam.symbolChr(key) == ord('l')
+
+
+def transform_from(pose, points):
+    """Transform points (N, 3) from the frame of a pose to the world frame."""
+    return points @ pose.rotation().matrix().T + pose.translation()
+
+
+def observations_to_world(pose, measurements):
+    """
+    Move landmark observations from the frame of a pose to the world frame.
+
+    Args:
+        pose (Pose3): Pose of the observing agent.
+        measurements (numpy.ndarray): Packed measurements of MEASUREMENT_DTYPE (N,).
+
+    Returns:
+        tuple: The observed positions (N, 3) and their covariances (N, 3, 3) in the world frame.
+    """
+    rotation = pose.rotation().matrix()
+    return transform_from(pose, measurements['mean']), rotation @ measurements['covariance'] @ rotation.T
+
+
+def bearing_range_sigmas(relative_positions, covariances):
+    """
+    Compute the ranges and noise levels of a batch of bearing-range measurements.
+
+    The Cartesian covariances are approximated by isotropic ones, whose standard deviation
+    is used for the range and, divided by the range, for the bearing.
+
+    Args:
+        relative_positions (numpy.ndarray): Positions of the landmarks in the agent frame (N, 3).
+        covariances (numpy.ndarray): Covariances of the observed positions (N, 3, 3).
+
+    Returns:
+        tuple: The ranges, the bearing standard deviations and the range standard deviations (N,).
+    """
+    ranges = np.linalg.norm(relative_positions, axis=-1)
+    sigmas = np.sqrt(np.trace(covariances, axis1=-2, axis2=-1) / 3.0)
+    return ranges, sigmas / np.maximum(ranges, sigmas), sigmas
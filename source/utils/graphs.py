@@ -1,20 +1,27 @@
-import seaborn as sns
-import matplotlib.pyplot as plt
-import pandas as pd
+"""
+This module provides functions for plotting the evaluation metrics.
+"""
 
-import seaborn as sns
-import matplotlib.pyplot as plt
-import pandas as pd
+# source/utils/graphs.py
 
+import os
 
-def plot_metrics(results):
+
+def plot_metrics(results, output_dir=None):
     """
     Plot the evaluation metrics against the number of landmarks removed.
 
     Args:
         results (dict): Dictionary where keys are algorithm names and values are dictionaries with keys:
                         'landmarks_removed', 'ate_values', 'are_values', and 'ud_values'.
+        output_dir (str): Directory where the figures are saved as ate.png, are.png and ud.png,
+                          or None to show them.
     """
+    # Plotting pulls in seaborn, pandas and matplotlib, which are slow to import and only needed here
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+
     sns.set(style="whitegrid")
 
     # Create separate figures for each metric
@@ -54,4 +61,10 @@ def plot_metrics(results):
     ax_ud.set_ylabel('UD')
     ax_ud.legend()
 
-    plt.show()
+    if output_dir is None:
+        plt.show()
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    for name, fig in (('ate', fig_ate), ('are', fig_are), ('ud', fig_ud)):
+        fig.savefig(os.path.join(output_dir, f'{name}.png'))
+        plt.close(fig)
@@ -0,0 +1,293 @@
+"""
+This module provides opt-in instrumentation of named phases, with aggregated histograms and Chrome trace export.
+
+Instrumented code wraps its phases in `with phase('name'):` or decorates functions with
+`@profiled('name')`. Both cost one global check while profiling is disabled. Enable it with:
+
+    profiler = enable_profiling()
+    ...
+    print(profiler.summary_table())
+    profiler.export_chrome_trace('trace.json')  # open in chrome://tracing or ui.perfetto.dev
+    disable_profiling()
+"""
+
+# source/utils/profiling.py
+
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+_profiler = None
+
+
+class _NullPhase:
+    """A reusable phase that does nothing, returned while profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._profiler.record(self._name, self._start, time.perf_counter_ns())
+        return False
+
+
+# Histogram bins of the phase durations: 10 per decade from 100 ns to 1000 s, plus one below and one above
+_BINS_PER_DECADE = 10
+_FIRST_DECADE = 2
+_NUM_DECADES = 10
+_BIN_EDGES = np.logspace(_FIRST_DECADE - 9, _FIRST_DECADE + _NUM_DECADES - 9,
+                         _BINS_PER_DECADE * _NUM_DECADES + 1)
+
+
+def _bin_index(duration):
+    """Get the histogram bin of a duration in nanoseconds, 0 and the last one collecting the outliers."""
+    if duration <= 0:
+        return 0
+    index = int((math.log10(duration) - _FIRST_DECADE) * _BINS_PER_DECADE) + 1
+    return min(max(index, 0), _BINS_PER_DECADE * _NUM_DECADES + 1)
+
+
+class _PhaseStats:
+    """Aggregated durations of a phase: count, sum, extremes and log-spaced histogram, in nanoseconds."""
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'bins')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = 0
+        self.bins = [0] * (len(_BIN_EDGES) + 1)
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        if self.minimum is None or duration < self.minimum:
+            self.minimum = duration
+        if duration > self.maximum:
+            self.maximum = duration
+        self.bins[_bin_index(duration)] += 1
+
+    def percentile(self, q):
+        """Estimate a percentile in nanoseconds, interpolating geometrically inside its bin."""
+        rank = q / 100.0 * self.count
+        cumulative = np.cumsum(self.bins)
+        index = min(int(np.searchsorted(cumulative, rank)), len(self.bins) - 1)
+        lower = _BIN_EDGES[index - 1] * 1e9 if index > 0 else self.minimum
+        upper = _BIN_EDGES[index] * 1e9 if index < len(_BIN_EDGES) else self.maximum
+        before = cumulative[index - 1] if index > 0 else 0
+        fraction = (rank - before) / self.bins[index] if self.bins[index] else 0.0
+        value = lower * (upper / lower) ** fraction if lower > 0 else upper * fraction
+        return min(max(value, self.minimum), self.maximum)
+
+
+class Profiler:
+    """
+    Profiler aggregates the durations of named phases.
+
+    Every phase keeps its count, total, minimum, maximum and a histogram over fixed log-spaced
+    bins, so the summary has constant memory however long the run. Trace events, which also
+    keep the start time and the thread, are kept in a ring buffer of the latest max_events.
+    """
+
+    def __init__(self, max_events=1_000_000):
+        """
+        Initialize an empty profiler.
+
+        Args:
+            max_events (int): Maximum number of trace events to keep, the oldest being dropped first.
+        """
+        self.max_events = max_events
+        self._stats = {}
+        self._events = deque(maxlen=max_events)
+        self._dropped_events = 0
+        self._origin = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def record(self, name, start, end):
+        """
+        Record one run of a phase.
+
+        Args:
+            name (str): Name of the phase.
+            start (int): Start time from time.perf_counter_ns.
+            end (int): End time from time.perf_counter_ns.
+        """
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _PhaseStats()
+            stats.add(end - start)
+            if len(self._events) == self.max_events:
+                self._dropped_events += 1
+            self._events.append((name, start, end - start, threading.get_ident()))
+
+    @property
+    def phases(self):
+        """Get the names of the recorded phases."""
+        return list(self._stats)
+
+    def histogram(self, name):
+        """
+        Get the histogram of the durations of a phase.
+
+        Args:
+            name (str): Name of the phase.
+
+        Returns:
+            tuple: The counts and the bin edges in seconds, logarithmic from 100 ns to 1000 s.
+             Durations outside the edges are counted in the first and the last bin.
+        """
+        stats = self._stats.get(name) or _PhaseStats()
+        counts = np.array(stats.bins[1:-1], dtype=np.int64)
+        counts[0] += stats.bins[0]
+        counts[-1] += stats.bins[-1]
+        return counts, _BIN_EDGES.copy()
+
+    def summary(self):
+        """
+        Get statistics of every phase.
+
+        Returns:
+            dict: Mapping from phase name to its count, total, mean, min, p50, p95 and max, in
+             seconds. The percentiles are estimated from the histogram.
+        """
+        summary = {}
+        for name, stats in self._stats.items():
+            summary[name] = {
+                'count': stats.count,
+                'total': stats.total * 1e-9,
+                'mean': stats.total / stats.count * 1e-9,
+                'min': stats.minimum * 1e-9,
+                'p50': stats.percentile(50) * 1e-9,
+                'p95': stats.percentile(95) * 1e-9,
+                'max': stats.maximum * 1e-9,
+            }
+        return summary
+
+    def summary_table(self):
+        """Get the summary as a text table sorted by total time."""
+        rows = sorted(self.summary().items(), key=lambda item: -item[1]['total'])
+        lines = [f"{'phase':<40} {'count':>8} {'total s':>10} {'mean ms':>10} {'p50 ms':>10} "
+                 f"{'p95 ms':>10} {'max ms':>10}"]
+        for name, stats in rows:
+            lines.append(f"{name:<40} {stats['count']:>8} {stats['total']:>10.3f} {stats['mean'] * 1e3:>10.3f} "
+                         f"{stats['p50'] * 1e3:>10.3f} {stats['p95'] * 1e3:>10.3f} {stats['max'] * 1e3:>10.3f}")
+        if self._dropped_events:
+            lines.append(f"({self._dropped_events} oldest trace events dropped past max_events)")
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        """
+        Get the trace in the Chrome trace event format, also read by Perfetto.
+
+        Returns:
+            dict: The trace, with one complete ('X') event per phase run kept in the ring buffer.
+        """
+        pid = os.getpid()
+        with self._lock:
+            recorded = list(self._events)
+        events = [{'name': name, 'cat': name.split('.', 1)[0], 'ph': 'X', 'pid': pid, 'tid': thread,
+                   'ts': (start - self._origin) / 1e3, 'dur': duration / 1e3}
+                  for name, start, duration, thread in recorded]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        """Write the Chrome trace to a JSON file."""
+        with open(path, 'w') as file:
+            json.dump(self.chrome_trace(), file)
+
+    def reset(self):
+        """Discard all recorded phases."""
+        with self._lock:
+            self._stats = {}
+            self._events = deque(maxlen=self.max_events)
+            self._dropped_events = 0
+
+
+def enable_profiling(profiler=None):
+    """
+    Start recording the instrumented phases.
+
+    Args:
+        profiler (Profiler): Profiler to record into, a new one if None.
+
+    Returns:
+        Profiler: The active profiler.
+    """
+    global _profiler
+    _profiler = profiler or Profiler()
+    return _profiler
+
+
+def disable_profiling():
+    """
+    Stop recording the instrumented phases.
+
+    Returns:
+        Profiler: The profiler that was active, or None.
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def get_profiler():
+    """Get the active profiler, or None when profiling is disabled."""
+    return _profiler
+
+
+def phase(name):
+    """
+    Get a context manager timing a named phase into the active profiler.
+
+    Args:
+        name (str): Name of the phase, dotted by component (e.g. 'slam.solve').
+    """
+    if _profiler is None:
+        return _NULL_PHASE
+    return _Phase(_profiler, name)
+
+
+def profiled(name):
+    """
+    Decorate a function so that each call is timed as a named phase.
+
+    Args:
+        name (str): Name of the phase.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = _profiler
+            if profiler is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.record(name, start, time.perf_counter_ns())
+        return wrapper
+    return decorator
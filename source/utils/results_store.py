@@ -0,0 +1,241 @@
+"""
+This module provides the ResultsStore class, an append-only store for per-step SLAM results.
+
+A store is a directory holding three growable memory-mapped arrays and a small JSON manifest:
+- metrics.bin: one row per step (landmarks removed, ATE, ARE, UD).
+- pose_counts.bin: the number of poses known at each step.
+- positions.bin: the estimated positions, appended only when new poses are added.
+- manifest.json: the array lengths and free-form attributes.
+"""
+
+# source/utils/results_store.py
+
+import json
+import os
+
+import numpy as np
+
+METRIC_COLUMNS = ('landmarks_removed', 'ate_values', 'are_values', 'ud_values')
+
+
+class GrowableMemmap:
+    """
+    A row-appendable array backed by a raw binary file, grown by doubling its capacity.
+    """
+
+    def __init__(self, path, columns, dtype, length=0, capacity=1024, writable=True):
+        self.path = path
+        self.columns = columns
+        self.dtype = np.dtype(dtype)
+        self.length = length
+        self._writable = writable
+        if writable:
+            capacity = max(capacity, length, 1)
+            if not os.path.exists(path) or os.path.getsize(path) < self._nbytes(capacity):
+                with open(path, 'ab') as file:
+                    file.truncate(self._nbytes(capacity))
+            self._capacity = os.path.getsize(path) // self._nbytes(1)
+            self._array = np.memmap(path, dtype=self.dtype, mode='r+', shape=(self._capacity, columns))
+        else:
+            self._capacity = length
+            self._array = (np.memmap(path, dtype=self.dtype, mode='r', shape=(length, columns))
+                           if length else np.empty((0, columns), dtype=self.dtype))
+
+    def _nbytes(self, rows):
+        return rows * self.columns * self.dtype.itemsize
+
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=self.dtype).reshape(-1, self.columns)
+        end = self.length + len(rows)
+        if end > self._capacity:
+            self._array.flush()
+            del self._array
+            self._capacity = max(end, 2 * self._capacity)
+            with open(self.path, 'r+b') as file:
+                file.truncate(self._nbytes(self._capacity))
+            self._array = np.memmap(self.path, dtype=self.dtype, mode='r+', shape=(self._capacity, self.columns))
+        self._array[self.length:end] = rows
+        self.length = end
+
+    def view(self):
+        return self._array[:self.length]
+
+    def truncate(self, length):
+        self.length = min(self.length, length)
+
+    def flush(self):
+        if self._writable:
+            self._array.flush()
+
+    def close(self):
+        self.flush()
+        if self._writable:
+            del self._array
+            # Drop the unused capacity so the file holds exactly the written rows
+            with open(self.path, 'r+b') as file:
+                file.truncate(self._nbytes(self.length))
+            self._array = None
+
+
+class ResultsStore:
+    """
+    ResultsStore appends per-step metrics and newly added poses to memory-mapped files.
+
+    Disk usage is linear in the number of steps and poses, and a run produces a fixed number of
+    files. The trajectory of any step is a view of the first poses of the position array.
+    """
+
+    def __init__(self, directory, mode='w', capacity=1024, flush_interval=1000):
+        """
+        Open a results store.
+
+        Args:
+            directory (str): Directory of the store, created if needed.
+            mode (str): 'w' to create a new store, 'a' to append to an existing one,
+             'r' to read an existing one.
+            capacity (int): Number of rows to preallocate when creating the files.
+            flush_interval (int): Number of steps between manifest writes.
+        """
+        if mode not in ('w', 'a', 'r'):
+            raise ValueError("Mode must be 'w', 'a' or 'r'.")
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._writable = mode != 'r'
+        manifest = {'num_steps': 0, 'num_positions': 0, 'attributes': {}}
+
+        if mode == 'w':
+            os.makedirs(directory, exist_ok=True)
+            for name in ('metrics.bin', 'pose_counts.bin', 'positions.bin'):
+                if os.path.exists(os.path.join(directory, name)):
+                    os.remove(os.path.join(directory, name))
+        else:
+            with open(self._manifest_path) as file:
+                manifest = json.load(file)
+
+        self.attributes = manifest['attributes']
+        self._metrics = GrowableMemmap(os.path.join(directory, 'metrics.bin'), len(METRIC_COLUMNS), np.float64,
+                                        manifest['num_steps'], capacity, self._writable)
+        self._pose_counts = GrowableMemmap(os.path.join(directory, 'pose_counts.bin'), 1, np.int64,
+                                            manifest['num_steps'], capacity, self._writable)
+        self._positions = GrowableMemmap(os.path.join(directory, 'positions.bin'), 3, np.float64,
+                                          manifest['num_positions'], capacity, self._writable)
+        if mode == 'w':
+            self._write_manifest()
+
+    @classmethod
+    def open(cls, directory):
+        """Open an existing store for reading."""
+        return cls(directory, mode='r')
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    @property
+    def num_steps(self):
+        """Get the number of recorded steps."""
+        return self._metrics.length
+
+    @property
+    def num_poses(self):
+        """Get the number of recorded poses."""
+        return self._positions.length
+
+    @property
+    def positions(self):
+        """Get all recorded positions as an (N, 3) view."""
+        return self._positions.view()
+
+    @property
+    def metrics(self):
+        """Get all recorded metrics as a (steps, 4) view, with columns METRIC_COLUMNS."""
+        return self._metrics.view()
+
+    def append(self, metrics, new_positions=()):
+        """
+        Record one step.
+
+        Args:
+            metrics (sequence of float): Landmarks removed, ATE, ARE and UD of the step.
+            new_positions (numpy.ndarray): Positions of the poses added since the previous step (K, 3).
+        """
+        if not self._writable:
+            raise ValueError("The results store is read-only.")
+        self._metrics.append(metrics)
+        if len(new_positions):
+            self._positions.append(new_positions)
+        self._pose_counts.append(self._positions.length)
+        if self.flush_interval and self.num_steps % self.flush_interval == 0:
+            self.flush()
+
+    def truncate(self, num_steps):
+        """
+        Drop the steps recorded after the first num_steps, e.g. to resume a run from a checkpoint.
+
+        Args:
+            num_steps (int): Number of steps to keep.
+        """
+        if not self._writable:
+            raise ValueError("The results store is read-only.")
+        num_steps = min(num_steps, self.num_steps)
+        self._metrics.truncate(num_steps)
+        self._pose_counts.truncate(num_steps)
+        self._positions.truncate(int(self._pose_counts.view()[num_steps - 1, 0]) if num_steps else 0)
+        self._write_manifest()
+
+    def trajectory(self, step):
+        """
+        Get the estimated trajectory recorded at a step.
+
+        Args:
+            step (int): Index of the step.
+
+        Returns:
+            numpy.ndarray: View of the positions known at that step (N, 3).
+        """
+        return self._positions.view()[:self._pose_counts.view()[step, 0]]
+
+    def as_results(self):
+        """
+        Get the metrics in the format used by plot_metrics for a single algorithm.
+
+        Returns:
+            dict: Mapping from metric name to its per-step values.
+        """
+        metrics = self.metrics
+        return {name: metrics[:, i] for i, name in enumerate(METRIC_COLUMNS)}
+
+    def flush(self):
+        """Flush the arrays and write the manifest."""
+        if self._writable:
+            self._metrics.flush()
+            self._pose_counts.flush()
+            self._positions.flush()
+            self._write_manifest()
+
+    def close(self):
+        """Flush the store and trim the files to their contents."""
+        if self._writable:
+            self._write_manifest()
+            self._metrics.close()
+            self._pose_counts.close()
+            self._positions.close()
+            self._writable = False
+
+    def _write_manifest(self):
+        manifest = {
+            'metric_columns': list(METRIC_COLUMNS),
+            'num_steps': self._metrics.length,
+            'num_positions': self._positions.length,
+            'attributes': self.attributes,
+        }
+        temporary_path = self._manifest_path + '.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(manifest, file)
+        os.replace(temporary_path, self._manifest_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,27 @@
+"""
+Shared fixtures of the tests: small SLAM problems built from generated scenarios.
+"""
+
+# tests/conftest.py
+
+import pytest
+
+
+def run_scenario(num_landmarks=8, num_steps=30, seed=0, backend='isam2', **scenario_options):
+    """Run SLAM over a generated scenario and return the system and the scenario."""
+    from source.scenarios.generator import ScenarioGenerator
+    from source.slam.slam import SLAM
+
+    options = {'measurement_noise': 0.05, 'odometry_noise': 0.02, **scenario_options}
+    scenario = ScenarioGenerator(num_landmarks, num_steps, seed=seed, **options)
+    slam = SLAM(scenario.initial_pose, scenario.landmarks(), backend=backend)
+    for control_input, measurements in zip(scenario.control_inputs, scenario.measurements()):
+        slam.perform_slam_step(control_input, measurements)
+    return slam, scenario
+
+
+@pytest.fixture(scope='module')
+def small_problem():
+    """A solved SLAM problem: the factor graph, its estimate and the active landmark identifiers."""
+    slam, _ = run_scenario()
+    return slam.graph, slam.backend.calculate_estimate(), slam.active_landmark_ids()
@@ -0,0 +1,55 @@
+"""
+Tests of checkpointing: a run restored from a checkpoint and resumed ends where an uninterrupted run does.
+"""
+
+# tests/test_checkpoint.py
+
+import numpy as np
+import pytest
+
+from source.config import BACKEND_NAMES
+from source.run import run_slam
+from source.scenarios.generator import ScenarioGenerator
+from source.slam.checkpoint import Checkpointer, restore_slam
+from source.slam.slam import SLAM
+
+NUM_STEPS = 40
+RESUME_STEP = 20
+
+
+def _run(slam, scenario, results_dir, resume=False):
+    return run_slam(slam, scenario.control_inputs, scenario.measurements(), scenario.ground_truth_poses,
+                    NUM_STEPS, results_dir, final_recompute=True, resume=resume)
+
+
+@pytest.mark.parametrize('backend', BACKEND_NAMES)
+def test_resume_matches_uninterrupted_run(tmp_path, backend):
+    scenario = ScenarioGenerator(10, NUM_STEPS, seed=3, measurement_noise=0.05, odometry_noise=0.02)
+    uninterrupted = SLAM(scenario.initial_pose, scenario.landmarks(), backend=backend)
+    expected = _run(uninterrupted, scenario, str(tmp_path / 'uninterrupted'))
+
+    # Run to the end with checkpoints, then go back to one taken half-way as if the run had stopped there
+    checkpoint_dir, results_dir = str(tmp_path / 'checkpoints'), str(tmp_path / 'results')
+    slam = SLAM(scenario.initial_pose, scenario.landmarks(), backend=backend)
+    checkpointer = Checkpointer(slam, checkpoint_dir, interval=10)
+    try:
+        _run(slam, scenario, results_dir)
+    finally:
+        checkpointer.close()
+        slam.close()
+
+    restored = restore_slam(checkpoint_dir, step=RESUME_STEP)
+    assert restored.step_count == RESUME_STEP
+    checkpointer = Checkpointer(restored, checkpoint_dir, interval=10)
+    try:
+        resumed = _run(restored, scenario, results_dir, resume=True)
+    finally:
+        checkpointer.close()
+
+    assert len(resumed['ate_values']) == len(expected['ate_values'])
+    for name in ('ate_values', 'are_values', 'ud_values', 'final_ate', 'final_are'):
+        np.testing.assert_allclose(resumed[name], expected[name], rtol=1e-6, atol=1e-9, err_msg=name)
+    np.testing.assert_allclose([pose.translation() for pose in restored.poses],
+                               [pose.translation() for pose in uninterrupted.poses], atol=1e-6)
+    restored.close()
+    uninterrupted.close()
@@ -0,0 +1,59 @@
+"""
+Tests of the bitset k-cover against a plain set-based greedy cover.
+"""
+
+# tests/test_coverage.py
+
+import numpy as np
+import pytest
+
+from source.info_theoretic.coverage import k_cover_algorithm
+from source.landmarks.landmark import Landmark
+from source.slam.incidence import ObservationIncidence
+
+
+def _random_incidence(rng, num_poses=150, num_landmarks=40):
+    """Observe random pose intervals, with duplicated landmarks for ties and a never observed one."""
+    starts = rng.integers(0, num_poses - 20, num_landmarks)
+    observed = [set(range(start, start + length)) for start, length in zip(starts, rng.integers(1, 20, num_landmarks))]
+    observed[5] = set(observed[3])
+    observed[9] = set(observed[3])
+    observed[-1] = set()
+    observations = ObservationIncidence()
+    for pose in range(num_poses):
+        observations.add_observations(pose, [lm_id for lm_id, poses in enumerate(observed) if pose in poses])
+    landmarks = [Landmark(np.zeros(3), np.eye(3), lm_id) for lm_id in range(num_landmarks)]
+    return landmarks, observations, observed
+
+
+def _set_cover(observed, k):
+    """Select the landmark covering the most poses still covered fewer than k times, the first one on ties."""
+    coverage = {}
+    selected = []
+    while True:
+        gains = [-1 if lm_id in selected else sum(coverage.get(pose, 0) < k for pose in poses)
+                 for lm_id, poses in enumerate(observed)]
+        best = int(np.argmax(gains))
+        if gains[best] <= 0:
+            break
+        selected.append(best)
+        for pose in observed[best]:
+            coverage[pose] = coverage.get(pose, 0) + 1
+    remaining = sorted((lm_id for lm_id in range(len(observed)) if lm_id not in selected),
+                       key=lambda lm_id: -len(observed[lm_id]))
+    return selected, remaining
+
+
+@pytest.mark.parametrize('k', [1, 2, 3])
+@pytest.mark.parametrize('seed', [0, 1])
+def test_matches_set_cover(k, seed):
+    landmarks, observations, observed = _random_incidence(np.random.default_rng(seed))
+    selected, remaining = _set_cover(observed, k)
+    order = [lm.identifier for lm in k_cover_algorithm(landmarks, observations, k)]
+    assert order == selected + remaining
+
+    # Selection stops once every pose is covered k times, or by all of its observers
+    for pose in range(observations.num_poses):
+        observers = sum(pose in poses for poses in observed)
+        assert sum(pose in observed[lm_id] for lm_id in order[:len(selected)]) >= min(k, observers)
+    assert [lm_id for lm_id in order if lm_id in (3, 5, 9)] == [3, 5, 9]
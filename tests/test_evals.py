@@ -0,0 +1,87 @@
+"""
+Tests of the trajectory metrics: incremental accumulation against the batch functions.
+"""
+
+# tests/test_evals.py
+
+import numpy as np
+from gtsam import Pose3, Rot3
+
+from source.info_theoretic.evals import (MetricAccumulator, align_trajectories, compute_are, compute_ate,
+                                         evaluate_trajectories, pose_arrays)
+
+
+def _random_poses(rng, num_poses, scale=1.0):
+    return [Pose3(Rot3.Expmap(scale * rng.normal(size=3)), scale * rng.normal(size=(3, 1))) for _ in range(num_poses)]
+
+
+def _batch_metrics(estimated_poses, ground_truth_poses):
+    estimated_positions, estimated_rotations = pose_arrays(estimated_poses)
+    ground_truth_positions, ground_truth_rotations = pose_arrays(ground_truth_poses)
+    return (compute_ate(estimated_positions, ground_truth_positions),
+            compute_are(estimated_rotations, ground_truth_rotations))
+
+
+def test_accumulator_matches_batch_metrics():
+    rng = np.random.default_rng(0)
+    ground_truth = _random_poses(rng, 40, scale=3.0)
+    estimated = [pose.compose(noise) for pose, noise in zip(ground_truth, _random_poses(rng, 40, scale=0.1))]
+    metrics = MetricAccumulator(capacity=4)
+    for index in range(len(ground_truth)):
+        metrics.update(index, estimated[index], ground_truth[index])
+        ate, are = _batch_metrics(estimated[:index + 1], ground_truth[:index + 1])
+        np.testing.assert_allclose([metrics.ate, metrics.are], [ate, are], rtol=1e-9)
+
+        # Replace the estimate of an earlier pose, as after a loop closure
+        if index % 7 == 6:
+            earlier = int(rng.integers(0, index))
+            estimated[earlier] = estimated[earlier].compose(_random_poses(rng, 1, scale=0.2)[0])
+            metrics.update(earlier, estimated[earlier], ground_truth[earlier])
+            ate, are = _batch_metrics(estimated[:index + 1], ground_truth[:index + 1])
+            np.testing.assert_allclose([metrics.ate, metrics.are], [ate, are], rtol=1e-9)
+    assert len(metrics) == len(ground_truth)
+
+
+def test_recompute_matches_batch_metrics():
+    rng = np.random.default_rng(1)
+    ground_truth = _random_poses(rng, 25, scale=2.0)
+    estimated = [pose.compose(noise) for pose, noise in zip(ground_truth, _random_poses(rng, 25, scale=0.1))]
+    metrics = MetricAccumulator()
+    metrics.update(0, Pose3(), ground_truth[0])
+    ate, are = metrics.recompute(estimated, ground_truth)
+    np.testing.assert_allclose([ate, are], _batch_metrics(estimated, ground_truth), rtol=1e-12)
+    np.testing.assert_allclose([metrics.ate, metrics.are], [ate, are], rtol=1e-12)
+
+    # The running sums continue from the recomputed errors
+    extra = _random_poses(rng, 1)[0]
+    metrics.update(len(estimated), extra, ground_truth[0])
+    np.testing.assert_allclose([metrics.ate, metrics.are],
+                               _batch_metrics(estimated + [extra], ground_truth + [ground_truth[0]]), rtol=1e-9)
+
+
+def test_alignment_recovers_known_transform():
+    rng = np.random.default_rng(2)
+    ground_truth = rng.normal(size=(2, 30, 3)) * [3.0, 2.0, 1.0]
+    rotations = np.array([Rot3.Expmap(rng.normal(size=3)).matrix() for _ in range(2)])
+    translations = rng.normal(size=(2, 3)) * 5.0
+    scales = np.array([1.0, 2.5])
+    estimated = scales[:, None, None] * np.einsum('kij,knj->kni', rotations, ground_truth) + translations[:, None]
+
+    # The alignment inverts the transform applied to the ground truth
+    aligned_rotations, aligned_translations, aligned_scales = align_trajectories(estimated, ground_truth,
+                                                                                 with_scale=True)
+    np.testing.assert_allclose(aligned_rotations, rotations.transpose(0, 2, 1), atol=1e-9)
+    np.testing.assert_allclose(aligned_scales, 1.0 / scales, rtol=1e-9)
+    np.testing.assert_allclose(aligned_translations,
+                               -np.einsum('kji,kj->ki', rotations, translations) / scales[:, None], atol=1e-9)
+
+    results = evaluate_trajectories(estimated, ground_truth, align='sim3')
+    np.testing.assert_allclose(results['ate'], 0.0, atol=1e-9)
+    assert np.all(evaluate_trajectories(estimated, ground_truth)['ate'] > 1.0)
+
+    # A rigid alignment recovers the rotation and translation of the unscaled run, ignoring padding
+    padded = estimated.copy()
+    padded[0, 20:] = 100.0
+    results = evaluate_trajectories(padded[:1], ground_truth[:1], align='se3', lengths=[20])
+    np.testing.assert_allclose(results['alignment'][0][0], rotations[0].T, atol=1e-9)
+    np.testing.assert_allclose(results['ate'], 0.0, atol=1e-9)
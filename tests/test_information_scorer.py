@@ -0,0 +1,58 @@
+"""
+Tests of InformationScorer against the exact information gains of compute_information_gain.
+"""
+
+# tests/test_information_scorer.py
+
+import gtsam
+import numpy as np
+
+from source.info_theoretic.utils import InformationScorer, compute_information_gain
+from source.slam.utils import landmark_key
+
+
+def _without_landmark(graph, values, landmark_id):
+    """Copy a problem without the factors and the variable of a landmark."""
+    key = landmark_key(landmark_id)
+    reduced = gtsam.NonlinearFactorGraph()
+    for i in range(graph.size()):
+        if graph.exists(i) and key not in graph.at(i).keys():
+            reduced.push_back(graph.at(i))
+    reduced_values = gtsam.Values(values)
+    reduced_values.erase(key)
+    return reduced, reduced_values
+
+
+def test_gains_match_exact(small_problem):
+    graph, values, landmark_ids = small_problem
+    gains = InformationScorer(graph, values).gains()
+    assert sorted(gains) == sorted(landmark_ids)
+    for lm_id, gain in gains.items():
+        assert gain > 0
+        np.testing.assert_allclose(gain, compute_information_gain(graph, values, lm_id, 'exact'), rtol=1e-8)
+
+
+def test_gains_match_exact_after_remove(small_problem):
+    graph, values, landmark_ids = small_problem
+    scorer = InformationScorer(graph, values)
+    for removed in landmark_ids[:2]:
+        scorer.remove(removed)
+        graph, values = _without_landmark(graph, values, removed)
+    assert sorted(scorer.landmark_ids) == sorted(landmark_ids[2:])
+    for lm_id, gain in scorer.gains().items():
+        np.testing.assert_allclose(gain, compute_information_gain(graph, values, lm_id, 'exact'), rtol=1e-8)
+
+
+def test_priors_are_folded_in_and_other_landmark_factors_skipped(small_problem):
+    graph, values, landmark_ids = small_problem
+    graph = gtsam.NonlinearFactorGraph(graph)
+    prior, first, second = landmark_ids[:3]
+    noise = gtsam.noiseModel.Isotropic.Sigma(3, 0.5)
+    graph.add(gtsam.PriorFactorPoint3(landmark_key(prior), values.atPoint3(landmark_key(prior)), noise))
+    graph.add(gtsam.BetweenFactorPoint3(landmark_key(first), landmark_key(second),
+                                        values.atPoint3(landmark_key(second)) - values.atPoint3(landmark_key(first)),
+                                        noise))
+    gains = InformationScorer(graph, values).gains()
+    assert sorted(gains) == sorted(set(landmark_ids) - {first, second})
+    for lm_id, gain in gains.items():
+        np.testing.assert_allclose(gain, compute_information_gain(graph, values, lm_id, 'exact'), rtol=1e-8)
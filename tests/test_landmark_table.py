@@ -0,0 +1,75 @@
+"""
+Tests of LandmarkTable: swap-delete keeps the identifier-to-row index, and fusion is exact.
+"""
+
+# tests/test_landmark_table.py
+
+import numpy as np
+import pytest
+
+from source.landmarks.table import LandmarkTable
+
+
+def _check_against(table, expected):
+    """Check that a table holds exactly the landmarks of a dict of (position, covariance)."""
+    assert len(table) == len(expected)
+    assert sorted(table.keys()) == sorted(expected)
+    assert sorted(table.ids.tolist()) == sorted(expected)
+    for identifier, (position, covariance) in expected.items():
+        row = table.row(identifier)
+        assert table.ids[row] == identifier
+        np.testing.assert_array_equal(table.positions[row], position)
+        np.testing.assert_array_equal(table[identifier].mean, position)
+        np.testing.assert_array_equal(table[identifier].covariance, covariance)
+
+
+def test_swap_delete_keeps_rows():
+    rng = np.random.default_rng(0)
+    table = LandmarkTable(capacity=2)
+    expected = {}
+    next_identifier = 100
+    for _ in range(300):
+        if expected and rng.random() < 0.45:
+            identifier = int(rng.choice(list(expected)))
+            if rng.random() < 0.5:
+                table.remove(identifier)
+            else:
+                del table[identifier]
+            del expected[identifier]
+        else:
+            position = rng.normal(size=3)
+            covariance = np.diag(rng.uniform(0.1, 1.0, size=3))
+            table.add(next_identifier, position, covariance)
+            expected[next_identifier] = (position, covariance)
+            next_identifier += 1
+        _check_against(table, expected)
+    with pytest.raises(KeyError):
+        table[99]
+
+
+def test_remove_last_and_only_rows():
+    table = LandmarkTable.from_arrays([1, 2, 3], np.eye(3), np.eye(3))
+    table.remove(3)
+    table.remove(1)
+    _check_against(table, {2: (np.eye(3)[1], np.eye(3))})
+    table.remove(2)
+    assert len(table) == 0 and list(table) == []
+
+
+def test_fuse_matches_information_form():
+    rng = np.random.default_rng(1)
+    table = LandmarkTable.from_arrays([5, 7], rng.normal(size=(2, 3)), 2.0 * np.eye(3))
+    prior = {identifier: (table[identifier].mean.copy(), table[identifier].covariance.copy()) for identifier in (5, 7)}
+    identifiers = np.array([7, 5, 7])
+    positions = rng.normal(size=(3, 3))
+    covariances = np.array([np.diag(rng.uniform(0.1, 1.0, size=3)) for _ in range(3)])
+    table.fuse(identifiers, positions, covariances)
+    for identifier, (mean, covariance) in prior.items():
+        information = np.linalg.inv(covariance)
+        vector = information @ mean
+        for observed, position, observed_covariance in zip(identifiers, positions, covariances):
+            if observed == identifier:
+                information += np.linalg.inv(observed_covariance)
+                vector += np.linalg.inv(observed_covariance) @ position
+        np.testing.assert_allclose(table[identifier].covariance, np.linalg.inv(information), atol=1e-12)
+        np.testing.assert_allclose(table[identifier].mean, np.linalg.solve(information, vector), atol=1e-12)
@@ -0,0 +1,61 @@
+"""
+Tests of the lazy-greedy removal engine against plain greedy removal.
+"""
+
+# tests/test_lazy_greedy.py
+
+import numpy as np
+import pytest
+
+from source.algorithms.landmark_removal import LandmarkRemoval
+from source.algorithms.lazy_greedy import lazy_greedy_removal
+from source.info_theoretic.utils import InformationScorer
+from tests.conftest import run_scenario
+
+
+@pytest.fixture(scope='module')
+def ranging_problem():
+    """A problem with a limited sensor range, so that landmarks have different degrees and gains."""
+    slam, _ = run_scenario(num_landmarks=12, num_steps=40, seed=1, sensor_range=4.0)
+    return slam.graph, slam.backend.calculate_estimate()
+
+
+def _plain_greedy(scorer, max_removals):
+    """Remove the landmark of least gain, re-scoring every candidate after each removal."""
+    removals = []
+    for _ in range(max_removals):
+        gains = scorer.gains()
+        lm_id = min(gains, key=gains.get)
+        scorer.remove(lm_id)
+        removals.append((lm_id, gains[lm_id]))
+    return removals
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+def test_matches_plain_greedy(ranging_problem, lazy):
+    graph, values = ranging_problem
+    num_landmarks = len(InformationScorer(graph, values).landmark_ids)
+    max_removals = num_landmarks - 1
+    expected = _plain_greedy(InformationScorer(graph, values), max_removals)
+    removals = lazy_greedy_removal(InformationScorer(graph, values), max_removals=max_removals, lazy=lazy)
+    assert [lm_id for lm_id, _ in removals] == [lm_id for lm_id, _ in expected]
+    np.testing.assert_allclose([gain for _, gain in removals], [gain for _, gain in expected], rtol=1e-9)
+
+
+def test_stops_at_information_budget(ranging_problem):
+    graph, values = ranging_problem
+    expected = _plain_greedy(InformationScorer(graph, values), 3)
+    budget = sum(gain for _, gain in expected[:2]) + 0.5 * expected[2][1]
+    removals = lazy_greedy_removal(InformationScorer(graph, values), max_information_loss=budget)
+    assert [lm_id for lm_id, _ in removals] == [lm_id for lm_id, _ in expected[:2]]
+
+
+def test_least_informative_removal_ranks_every_landmark():
+    slam, _ = run_scenario(num_landmarks=12, num_steps=40, seed=1, sensor_range=4.0)
+    graph, values = slam.graph, slam.backend.calculate_estimate()
+    expected = _plain_greedy(InformationScorer(graph, values), 3)
+    remover = LandmarkRemoval(slam.landmarks.values(), slam.poses, graph, values, slam.observations)
+    ranked = remover.least_informative_removal(max_removals=3)
+    assert sorted(lm.identifier for lm in ranked) == sorted(lm.identifier for lm in slam.landmarks.values())
+    assert [lm.identifier for lm in ranked[:3]] == [lm_id for lm_id, _ in expected]
+    assert len(remover.removal_gains) == 3
@@ -0,0 +1,61 @@
+"""
+Tests of ResultsStore: data written, grown past its capacity and reopened reads back unchanged.
+"""
+
+# tests/test_results_store.py
+
+import numpy as np
+import pytest
+
+from source.utils.results_store import METRIC_COLUMNS, ResultsStore
+
+
+def _write_steps(store, rng, num_steps):
+    """Append steps adding 0 to 2 poses each and return what was written."""
+    metrics, positions, counts = [], [], []
+    for _ in range(num_steps):
+        step_metrics = rng.normal(size=len(METRIC_COLUMNS))
+        new_positions = rng.normal(size=(rng.integers(0, 3), 3))
+        store.append(step_metrics, new_positions)
+        metrics.append(step_metrics)
+        positions.extend(new_positions)
+        counts.append(len(positions))
+    return metrics, positions, counts
+
+
+def test_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    store = ResultsStore(str(tmp_path), capacity=4, flush_interval=7)
+    metrics, positions, counts = _write_steps(store, rng, 50)
+    store.attributes['final_ate'] = 0.25
+    store.close()
+
+    reopened = ResultsStore.open(str(tmp_path))
+    assert reopened.num_steps == 50 and reopened.num_poses == len(positions)
+    np.testing.assert_array_equal(reopened.metrics, np.array(metrics))
+    np.testing.assert_array_equal(reopened.positions, np.array(positions))
+    for step in (0, 17, 49):
+        np.testing.assert_array_equal(reopened.trajectory(step), np.array(positions[:counts[step]]).reshape(-1, 3))
+    results = reopened.as_results()
+    for i, name in enumerate(METRIC_COLUMNS):
+        np.testing.assert_array_equal(results[name], np.array(metrics)[:, i])
+    assert reopened.attributes == {'final_ate': 0.25}
+    with pytest.raises(ValueError):
+        reopened.append(metrics[0])
+
+
+def test_truncate_and_append(tmp_path):
+    rng = np.random.default_rng(1)
+    store = ResultsStore(str(tmp_path), capacity=2)
+    metrics, positions, counts = _write_steps(store, rng, 20)
+    store.close()
+
+    store = ResultsStore(str(tmp_path), mode='a')
+    store.truncate(12)
+    more_metrics, more_positions, _ = _write_steps(store, rng, 5)
+    store.close()
+
+    reopened = ResultsStore.open(str(tmp_path))
+    np.testing.assert_array_equal(reopened.metrics, np.array(metrics[:12] + more_metrics))
+    np.testing.assert_array_equal(reopened.positions,
+                                  np.array(positions[:counts[11]] + list(more_positions)).reshape(-1, 3))
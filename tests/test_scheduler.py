@@ -0,0 +1,43 @@
+"""
+Tests of RemovalScheduler snapshots: only the inputs of the strategy are copied, at the step boundary.
+"""
+
+# tests/test_scheduler.py
+
+import numpy as np
+import pytest
+
+from source.algorithms.landmark_removal import LandmarkRemoval
+from source.algorithms.scheduler import RemovalScheduler, compute_removals
+from source.slam.backends import FixedLagBackend
+from tests.conftest import run_scenario
+
+
+@pytest.mark.parametrize('strategy', LandmarkRemoval.get_algorithm_names())
+def test_snapshot_copies_strategy_inputs(strategy):
+    slam, _ = run_scenario(num_landmarks=10, num_steps=20, sensor_range=4.0)
+    scheduler = RemovalScheduler(slam, strategy, budget=5)
+    try:
+        snapshot = scheduler.snapshot()
+        assert (snapshot.graph is None) == (strategy != 'least_informative_removal')
+        assert (snapshot.poses is None) == (strategy != 'least_reprojection_error_removal')
+        removed_ids, _ = compute_removals(snapshot, strategy, 3)
+        assert len(removed_ids) == 3 and set(removed_ids) <= set(snapshot.active_ids)
+    finally:
+        scheduler.close()
+        slam.close()
+
+
+def test_sliding_window_poses_are_frozen():
+    slam, scenario = run_scenario(num_landmarks=10, num_steps=30, sensor_range=4.0, backend=FixedLagBackend(lag=5))
+    scheduler = RemovalScheduler(slam, 'least_reprojection_error_removal', budget=5)
+    try:
+        assert slam.poses.num_archived > 0
+        snapshot = scheduler.snapshot()
+        expected = [pose.translation() for pose in slam.poses]
+        slam.perform_slam_step(scenario.control_inputs[0], next(iter(scenario.measurements())))
+        assert len(snapshot.poses) == len(expected) == len(slam.poses) - 1
+        np.testing.assert_array_equal([pose.translation() for pose in snapshot.poses], expected)
+    finally:
+        scheduler.close()
+        slam.close()
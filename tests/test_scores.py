@@ -0,0 +1,43 @@
+"""
+Tests of the vectorized per-landmark scores against per-observation loops.
+"""
+
+# tests/test_scores.py
+
+import numpy as np
+import pytest
+
+from source.info_theoretic.scores import compute_reprojection_error
+from source.landmarks.landmark import Landmark
+from tests.conftest import run_scenario
+
+
+def _loop_reprojection_error(landmarks, poses, observations):
+    """Average the reprojection errors of the observations of each landmark one at a time."""
+    errors = {}
+    for lm in landmarks:
+        observed = [(pose_index, measurement) for pose_index, lm_id, measurement
+                    in zip(observations.pose_indices, observations.landmark_ids, observations.measurements)
+                    if lm_id == lm.identifier]
+        errors[lm.identifier] = np.mean([np.linalg.norm(poses[pose_index].transformTo(lm.mean) - measurement)
+                                         for pose_index, measurement in observed]) if observed else 0.0
+    return errors
+
+
+@pytest.mark.parametrize('chunk_size', [None, 7])
+def test_reprojection_error_matches_loop(chunk_size):
+    slam, _ = run_scenario(num_landmarks=12, num_steps=25, sensor_range=4.0)
+    slam.refresh_landmarks()
+    landmarks = list(slam.landmarks.values()) + [Landmark(np.ones(3), np.eye(3), 1000)]
+    observations = slam.observations
+    assert len(observations.pose_indices) > 2 * 7
+    assert 1000 not in observations.landmark_ids
+
+    errors = compute_reprojection_error(landmarks, slam.poses, observations, chunk_size=chunk_size)
+    expected = _loop_reprojection_error(landmarks, slam.poses, observations)
+    assert sorted(errors) == sorted(expected)
+    for lm_id, error in expected.items():
+        np.testing.assert_allclose(errors[lm_id], error, rtol=1e-10, atol=1e-12)
+    assert errors[1000] == 0.0
+    assert any(error > 0 for error in errors.values())
+    slam.close()
@@ -0,0 +1,92 @@
+"""
+Tests of sparsity-preserving landmark marginalization: the summaries are trees that never claim more
+information than the landmarks gave.
+"""
+
+# tests/test_sparsification.py
+
+import itertools
+
+import numpy as np
+from gtsam import NonlinearFactorGraph
+
+from source.slam.backends import FixedLagBackend
+from source.slam.sparsification import chow_liu_tree, sparsify_landmark
+from tests.conftest import run_scenario
+
+
+def _observation_factors(slam, landmark_id):
+    factors = NonlinearFactorGraph()
+    for index in slam._landmark_factors[landmark_id]:
+        factors.push_back(slam.graph.at(index))
+    return factors
+
+
+def test_summary_is_conservative_tree():
+    slam, _ = run_scenario(num_landmarks=10, num_steps=30)
+    estimate = slam.backend.calculate_estimate()
+    reports = []
+    for landmark_id in slam.active_landmark_ids():
+        summary, report = sparsify_landmark(_observation_factors(slam, landmark_id), estimate, landmark_id,
+                                            slam.covariances)
+        assert summary.size() == report.num_factors == max(report.num_poses - 1, 0)
+        assert report.fill_in_avoided == report.num_poses * (report.num_poses - 1) // 2 - report.num_factors
+        assert -1e-9 <= report.information_lost <= report.information_gain + 1e-9
+        reports.append(report)
+    assert any(report.information_gain - report.information_lost > 0 for report in reports)
+    slam.close()
+
+
+def test_chow_liu_tree_is_maximum_spanning_tree():
+    rng = np.random.default_rng(0)
+    weights = rng.random((6, 6))
+    weights = weights + weights.T
+
+    def total(edges):
+        return sum(weights[i, j] for i, j in edges)
+
+    # Every spanning tree of 6 nodes is a set of 5 edges that reaches all of them from node 0
+    best = 0.0
+    for edges in itertools.combinations(itertools.combinations(range(6), 2), 5):
+        reached = {0}
+        for _ in edges:
+            reached |= {n for i, j in edges if reached & {i, j} for n in (i, j)}
+        if len(reached) == 6:
+            best = max(best, total(edges))
+    tree = chow_liu_tree(weights)
+    assert len(tree) == 5
+    assert np.isclose(total(tree), best)
+
+    bounded = chow_liu_tree(weights, max_degree=2)
+    assert len({j for _, j in bounded} | {0}) == 6
+    assert np.bincount(np.array(bounded).reshape(-1), minlength=6).max() <= 2
+
+
+def test_sparsify_removal_keeps_problem_solvable():
+    slam, _ = run_scenario(num_landmarks=10, num_steps=30)
+    landmark_ids = slam.active_landmark_ids()[:3]
+    reports = slam.remove_landmarks(landmark_ids, mode='sparsify')
+    assert len(reports) == 3
+    assert not set(landmark_ids) & set(slam.active_landmark_ids())
+    assert slam.num_removed_landmarks == 3
+    estimate = slam.backend.calculate_estimate()
+    assert all(np.all(np.isfinite(pose.translation())) for pose in slam.poses)
+    assert estimate.size() > 0
+    slam.close()
+
+
+def test_sparsify_skips_factors_marginalized_by_sliding_window():
+    slam, _ = run_scenario(num_landmarks=40, num_steps=60, seed=2, sensor_range=5.0, odometry_noise=0.05,
+                           backend=FixedLagBackend(lag=10))
+    graph = slam.graph
+    partial = [lm_id for lm_id in slam.active_landmark_ids()
+               if not all(graph.exists(index) for index in slam._landmark_factors[lm_id])
+               and sum(graph.exists(index) for index in slam._landmark_factors[lm_id]) >= 2]
+    assert partial
+    reports = slam.remove_landmarks(partial, mode='sparsify')
+    assert [report.landmark_id for report in reports] == partial
+    for report in reports:
+        assert report.num_factors == report.num_poses - 1
+        assert -1e-9 <= report.information_lost <= report.information_gain + 1e-9
+    assert all(np.all(np.isfinite(pose.translation())) for pose in slam.poses[slam.poses.first_window_index:])
+    slam.close()